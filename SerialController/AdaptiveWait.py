@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Optional
+
+import numpy as np
+from loguru import logger
+
+ADAPTIVE_WAIT_PATH = os.path.join(os.path.dirname(__file__), "profiles", "default", "adaptive_waits.json")
+# 遷移ごとに保持する直近の所要時間の数
+MAX_SAMPLES = 200
+
+
+class TransitionLog:
+    """
+    名前つきの画面遷移ごとに、実際にかかった時間(秒)を記録する。
+
+    直近`max_samples`回分を保持し、`save()`でJSONファイルに保存する(次回起動時に読み込む)。
+    コマンド終了時(`PythonCommand.do_safe`)に変更があれば保存される。
+
+    Args:
+        path (str): 保存先のファイル
+        max_samples (int): 遷移ごとに保持する所要時間の数
+    """
+
+    def __init__(self, path: str = ADAPTIVE_WAIT_PATH, max_samples: int = MAX_SAMPLES):
+        self.path = path
+        self.max_samples = max_samples
+        self._samples: dict[str, deque[float]] = {}
+        self._calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+
+    def _load(self) -> None:
+        # ロックを取得した状態で呼ぶ
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Adaptive wait log cannot be loaded: {self.path} ({e})")
+            return
+        for name, samples in data.get("transitions", {}).items():
+            self._samples[name] = deque((float(s) for s in samples), maxlen=self.max_samples)
+        logger.debug(f"Adaptive wait log loaded: {self.path} ({len(self._samples)} transitions)")
+
+    def record(self, name: str, seconds: float) -> None:
+        """遷移にかかった時間を記録する"""
+        with self._lock:
+            self._load()
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(float(seconds))
+            self._dirty = True
+
+    def samples(self, name: str) -> list[float]:
+        """記録されている所要時間(古い順)を返す"""
+        with self._lock:
+            self._load()
+            return list(self._samples.get(name, ()))
+
+    def count(self, name: str) -> int:
+        """記録されている所要時間の数を返す"""
+        with self._lock:
+            self._load()
+            return len(self._samples.get(name, ()))
+
+    def quantile(self, name: str, p: float) -> Optional[float]:
+        """
+        所要時間の分位点を返す(記録がない場合はNone)。
+
+        補間はせず、記録された値のうち分位点以上で最小の値を返す(短めに見積もらないため)。
+        """
+        samples = self.samples(name)
+        if not samples:
+            return None
+        return float(np.quantile(samples, p, method="higher"))
+
+    def next_call(self, name: str) -> int:
+        """遷移を待つ回数を数える(起動してからの通し番号を返す)"""
+        with self._lock:
+            count = self._calls.get(name, 0) + 1
+            self._calls[name] = count
+            return count
+
+    def clear(self, name: Optional[str] = None) -> None:
+        """記録を消去する。`name`を省略した場合はすべての遷移"""
+        with self._lock:
+            self._load()
+            if name is None:
+                self._samples.clear()
+            else:
+                self._samples.pop(name, None)
+            self._dirty = True
+
+    def save(self) -> bool:
+        """
+        変更があればファイルに保存する。
+
+        Returns:
+            bool: 保存した場合はTrue
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            data = {"transitions": {name: list(samples) for name, samples in self._samples.items()}}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Adaptive wait log cannot be saved: {self.path} ({e})")
+            with self._lock:
+                self._dirty = True
+            return False
+        logger.debug(f"Adaptive wait log saved: {self.path}")
+        return True
+
+
+transition_log = TransitionLog()
+
+
+class Adaptive:
+    """
+    記録された遷移の所要時間から決める待機時間。`press(..., wait=...)`や`wait()`に渡す。
+
+    `min_samples`回分の記録が揃うまでは`default`だけ待ち、揃った後は所要時間の`p`分位点に
+    `margin`を足した時間(ただし`default`以下)だけ待つ。`default`には従来の固定の待機時間を指定する。
+
+    画像認識を使うコマンド(`ImageProcPythonCommand`)では、記録が揃うまでと、その後も`observe_every`回に1回は
+    実際に遷移を観測して所要時間を記録する(遷移が終わった時点で次へ進む。最長`default`)。
+    `until`を指定した場合は遷移先の画面が見つかるまで、指定しない場合は画面が変化してから止まるまでを遷移とする。
+    `press_a_and_wait_for_screen`など画面を待つ処理で記録した所要時間も、同じ名前で使える。
+
+    Args:
+        name (str): 遷移の名前
+        p (float): 待機時間に使う分位点(0.0〜1.0)。大きいほど安全側
+        default (float): 記録が揃うまでの待機時間・待機時間の上限(秒)
+        margin (float): 分位点に足す余裕(秒)
+        min_samples (int): 分位点を使い始める記録の数
+        observe_every (int): 記録が揃った後に遷移を観測する間隔(回)。0の場合は観測しない
+        until (TemplateMatcher | Callable[[CapturedFrame], Any] | None): 遷移先の画面の判定
+        settle_frames (int): `until`を指定しない場合に、止まったとみなす連続フレーム数
+        log (TransitionLog | None): 記録先。Noneの場合は`transition_log`
+
+    Example:
+        self.press(Button.A, wait=Adaptive("trade_confirm", p=0.99, default=1.5))
+    """
+
+    def __init__(
+        self,
+        name: str,
+        p: float = 0.99,
+        default: float = 1.0,
+        margin: float = 0.05,
+        min_samples: int = 20,
+        observe_every: int = 10,
+        until: Optional[Callable[[Any], Any]] = None,
+        settle_frames: int = 5,
+        log: Optional[TransitionLog] = None,
+    ):
+        self.name = name
+        self.p = p
+        self.default = float(default)
+        self.margin = margin
+        self.min_samples = min_samples
+        self.observe_every = observe_every
+        self.until = until
+        self.settle_frames = settle_frames
+        self.log = transition_log if log is None else log
+
+    def __repr__(self) -> str:
+        return f"<Adaptive {self.name} p={self.p} wait={float(self):.3f}s samples={self.log.count(self.name)}>"
+
+    def __float__(self) -> float:
+        if self.log.count(self.name) < self.min_samples:
+            return self.default
+        q = self.log.quantile(self.name, self.p)
+        if q is None:
+            return self.default
+        return min(self.default, q + self.margin)
+
+    def should_observe(self) -> bool:
+        """今回の待機で遷移を観測するか(呼ぶたびに回数を数える)"""
+        calls = self.log.next_call(self.name)
+        if self.log.count(self.name) < self.min_samples:
+            return True
+        return self.observe_every > 0 and calls % self.observe_every == 0
+
+    def record(self, seconds: float) -> None:
+        """観測した所要時間を記録する"""
+        self.log.record(self.name, seconds)
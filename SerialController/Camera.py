@@ -3,14 +3,9 @@
 
 # import collections
 import multiprocessing
-from multiprocessing import shared_memory, Value
-import multiprocessing.managers
-from multiprocessing.sharedctypes import Synchronized
 import queue
 import threading
 import time
-from time import sleep
-import traceback
 from typing import Any
 import cv2
 import datetime
@@ -20,7 +15,6 @@ import os
 import numpy as np  # noqa: F401
 from logging import getLogger, DEBUG, NullHandler
 from loguru import logger
-from icecream import ic
 from video_capture_wrapper import VideoCaptureWrapper
 
 # import signal
@@ -70,126 +64,443 @@ def _get_save_filespec(filename: str) -> str:
         return os.path.join(CAPTURE_DIR, filename)
 
 
-class CameraController:
+CAMERA_BACKENDS = ("thread", "process")
+"""
+カメラ画像の取得方式。
+
+- thread: メインプロセスのスレッドで`cv2.VideoCapture`を読み込む
+- process: 子プロセスで読み込み・デコードを行い、共有メモリ経由で受け取る(`VideoCaptureWrapper`)
+"""
+
+
+RING_SIZE = 8
+"""
+リングバッファのスロット数。
+
+`readFrame()`が返すビューは、キャプチャスレッドが`RING_SIZE`フレーム分進むと上書きされる。
+(45fpsで約180ms) それ以上保持する場合は`.copy()`すること。
+"""
+
+
+class FrameExpiredError(RuntimeError):
+    """フレームのスロットが新しいフレームで上書きされた後に派生画像を要求した"""
+
+
+class CapturedFrame:
+    """
+    リングバッファに格納された1フレーム分の情報。
+
+    グレースケール・HSV・RGBや縮小画像などの派生画像は、初めて要求されたときに計算して
+    フレームごとに保持する。同じフレームを参照する利用者(画像認識・プレビュー・通知など)は
+    同じ変換結果を共有するため、フレームあたりの色変換は1回で済む。
+    計算済みの派生画像は読み取り専用で、スロットが上書きされた後も有効。
+    スロットが上書きされた後(`RING_SIZE`フレーム以上前のフレーム)に未計算の派生画像を要求すると
+    `FrameExpiredError`を送出する(上書きされた画像から変換した結果を返さないため)。
+
+    テンプレートマッチングなどの判定結果も`cache_result()`でフレームごとに保持できる。
+    新しいフレームは別のオブジェクトになるため、キャッシュはフレームが変わると自動的に無効になる。
+
+    Attributes:
+        seq (int): フレームの通し番号。カメラを開いてから単調増加する。
+        timestamp (float): フレームを取得した時刻(`time.perf_counter()`)
+        image (np.ndarray): BGR画像の読み取り専用ビュー
+    """
+
     def __init__(
         self,
-        finish_flag: Synchronized,
-        camera_process_status: Synchronized,
-        fps: Synchronized,
-        cameraId: int = 0,
-        capture_size: tuple = (1280, 720),
+        seq: int,
+        timestamp: float,
+        image: np.ndarray,
+        slot_seqs: list[int] | None = None,
+        slot: int = 0,
     ):
-        self.camera: cv2.VideoCapture | None = None
-
-        self.cameraId = cameraId
-        self.fps = fps
-        self.capture_size = capture_size
-
-        self.shared_memory = shared_memory.SharedMemory(name="camera_image")
-        self.image: np.ndarray = np.ndarray(
-            (720, 1280, 3), dtype=np.uint8, buffer=self.shared_memory.buf
-        )
-        ic(self.shared_memory.size)
+        self.seq = seq
+        self.timestamp = timestamp
+        self.image = image
+        # リングバッファの各スロットが保持しているフレームの通し番号(Noneの場合は上書きされない画像)
+        self._slot_seqs = slot_seqs
+        self._slot = slot
+        self._derived: dict[tuple[str, int], np.ndarray] = {}
+        self._derived_lock = threading.RLock()
+        self._results: dict[Any, Any] = {}
+
+    def __repr__(self) -> str:
+        return f"<CapturedFrame seq={self.seq} shape={self.image.shape}>"
+
+    def is_valid(self) -> bool:
+        """`image`がまだこのフレームの画像か(スロットが上書きされていないか)"""
+        return self._slot_seqs is None or self._slot_seqs[self._slot] == self.seq
+
+    def _check_valid(self) -> None:
+        if not self.is_valid():
+            raise FrameExpiredError(f"Frame {self.seq} has been overwritten in the ring buffer")
+
+    def _get_derived(self, kind: str, level: int) -> np.ndarray:
+        key = (kind, level)
+        derived = self._derived.get(key)
+        if derived is not None:
+            return derived
+        with self._derived_lock:
+            derived = self._derived.get(key)
+            if derived is None:
+                self._check_valid()
+                if kind == "bgr":
+                    # 1段階上の画像を半分に縮小する
+                    src = self.bgr(level - 1)
+                    derived = cv2.resize(
+                        src,
+                        (max(1, src.shape[1] // 2), max(1, src.shape[0] // 2)),
+                        interpolation=cv2.INTER_AREA,
+                    )
+                else:
+                    derived = cv2.cvtColor(self.bgr(level), _DERIVED_CONVERSIONS[kind])
+                # 変換中に上書きが始まった場合も検出する(スロットは書き込み前に無効化される)
+                self._check_valid()
+                derived.flags.writeable = False
+                self._derived[key] = derived
+            return derived
+
+    def bgr(self, level: int = 0) -> np.ndarray:
+        """
+        BGR画像を返す。
+
+        Args:
+            level (int): 縮小段階。`level`ごとに縦横1/2になる(0は元画像、1は1/2、2は1/4)
+
+        Returns:
+            np.ndarray: 読み取り専用のBGR画像
+        """
+        if level <= 0:
+            return self.image
+        return self._get_derived("bgr", level)
+
+    def gray(self, level: int = 0) -> np.ndarray:
+        """グレースケール画像を返す。`level`は`bgr()`と同じ"""
+        return self._get_derived("gray", level)
+
+    def hsv(self, level: int = 0) -> np.ndarray:
+        """HSV画像を返す。`level`は`bgr()`と同じ"""
+        return self._get_derived("hsv", level)
+
+    def rgb(self, level: int = 0) -> np.ndarray:
+        """RGB画像を返す。`level`は`bgr()`と同じ"""
+        return self._get_derived("rgb", level)
+
+    def roi(self, x0: int, y0: int, x1: int, y1: int, kind: str = "bgr") -> np.ndarray:
+        """
+        指定範囲を切り出した画像を返す。
+
+        `kind`の画像がすでにキャッシュされていればそれを切り出し、なければ範囲内だけを変換する
+        (範囲の変換結果はキャッシュしない)。
+
+        Args:
+            x0, y0, x1, y1 (int): 切り出す範囲 [x0, x1) x [y0, y1)
+            kind (str): "bgr", "gray", "hsv", "rgb" のいずれか
+
+        Returns:
+            np.ndarray: 切り出した画像
+        """
+        if kind == "bgr":
+            return self.image[y0:y1, x0:x1]
+        height, width = self.image.shape[:2]
+        if x0 <= 0 and y0 <= 0 and x1 >= width and y1 >= height:
+            # 全体を使う場合は変換結果をキャッシュする
+            return self._get_derived(kind, 0)
+        derived = self._derived.get((kind, 0))
+        if derived is not None:
+            return derived[y0:y1, x0:x1]
+        self._check_valid()
+        converted = cv2.cvtColor(self.image[y0:y1, x0:x1], _DERIVED_CONVERSIONS[kind])
+        self._check_valid()
+        return converted
+
+    def cached_result(self, key: Any) -> Any:
+        """`cache_result()`で保持した判定結果を返す。ない場合はNone"""
+        return self._results.get(key)
+
+    def cache_result(self, key: Any, result: Any) -> None:
+        """
+        このフレームに対する判定結果を保持する。
+
+        Args:
+            key (Any): 判定の種類と条件を表すハッシュ可能な値
+            result (Any): 判定結果(Noneは`cached_result()`で未保持と区別できないため使わない)
+        """
+        self._results[key] = result
+
+
+_DERIVED_CONVERSIONS = {
+    "gray": cv2.COLOR_BGR2GRAY,
+    "hsv": cv2.COLOR_BGR2HSV,
+    "rgb": cv2.COLOR_BGR2RGB,
+}
+
+
+class FrameRingBuffer:
+    """
+    事前に確保したスロットを循環させてカメラ画像を保持するリングバッファ。
 
-        self.finish_flag = finish_flag
-        self.camera_process_status = camera_process_status
+    書き込みはキャプチャスレッドのみが行う。`acquire()`で次のスロットを受け取り、
+    `VideoCapture.read()`で直接デコードしてから`publish()`で公開する。
+    読み出し側には`writeable=False`のビューを渡すため、フレームごとのコピーが発生しない。
+    """
 
-        self.openCamera()
-        self.processCamera()
+    def __init__(self, size: int = RING_SIZE):
+        self._size = max(2, int(size))
+        self._slots: list[np.ndarray] = []
+        self._views: list[np.ndarray] = []
+        # 各スロットが保持しているフレームの通し番号(書き込み中は-1)
+        self._slot_seqs: list[int] = []
+        self._seq = 0
+        self._latest: CapturedFrame | None = None
+        self._cond = threading.Condition()
+
+    @property
+    def seq(self) -> int:
+        """最後に公開したフレームの通し番号(未公開なら0)"""
+        return self._seq
+
+    def _allocate(self, shape: tuple, dtype: Any) -> None:
+        self._slots = [np.empty(shape, dtype=dtype) for _ in range(self._size)]
+        # 再確保前のフレームは古いリストを参照し続ける(古いスロットはもう書き込まれない)
+        self._slot_seqs = [-1] * self._size
+        self._views = []
+        for slot in self._slots:
+            view = slot.view()
+            view.flags.writeable = False
+            self._views.append(view)
+        logger.debug(f"Frame ring buffer allocated: {self._size} x {shape}")
+
+    def acquire(self) -> np.ndarray | None:
+        """
+        次に書き込むスロットを返す。
+
+        Returns:
+            np.ndarray | None: 書き込み先のスロット。まだ確保されていない場合はNone
+        """
+        if not self._slots:
+            return None
+        index = (self._seq + 1) % self._size
+        # 書き込みを始める前に、スロットを参照している古いフレームを無効化する
+        self._slot_seqs[index] = -1
+        return self._slots[index]
+
+    def publish(self, frame: np.ndarray) -> CapturedFrame:
+        """
+        フレームを公開する。
+
+        `frame`が`acquire()`で受け取ったスロットそのものであればコピーしない。
+        それ以外の配列が渡された場合はスロットへコピーする(サイズが変わった場合は再確保する)。
+
+        Returns:
+            CapturedFrame: 公開したフレーム
+        """
+        seq = self._seq + 1
+        index = seq % self._size
+        if not self._slots or self._slots[0].shape != frame.shape or self._slots[0].dtype != frame.dtype:
+            self._allocate(frame.shape, frame.dtype)
+        slot = self._slots[index]
+        if not np.may_share_memory(frame, slot):
+            self._slot_seqs[index] = -1
+            np.copyto(slot, frame)
+        self._slot_seqs[index] = seq
+
+        captured = CapturedFrame(seq, time.perf_counter(), self._views[index], self._slot_seqs, index)
+        with self._cond:
+            self._seq = seq
+            self._latest = captured
+            self._cond.notify_all()
+        return captured
+
+    def latest(self) -> CapturedFrame | None:
+        """最新のフレームを返す。まだ取得していない場合はNone"""
+        with self._cond:
+            return self._latest
+
+    def wait_after(self, seq: int, timeout: float | None = None) -> CapturedFrame | None:
+        """
+        通し番号が`seq`より新しいフレームが公開されるまで待機する。
+
+        すでに新しいフレームがある場合は待たずに最新フレームを返す。
+        途中のフレームは読み飛ばされる。
+
+        Args:
+            seq (int): 最後に処理したフレームの通し番号
+            timeout (float | None): 最大待機時間(秒)。Noneの場合は無制限
+
+        Returns:
+            CapturedFrame | None: 新しいフレーム。タイムアウトした場合はNone
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._latest is not None and self._latest.seq > seq, timeout
+            )
+            if self._latest is not None and self._latest.seq > seq:
+                return self._latest
+            return None
 
-    def openCamera(self) -> None:
-        if self.camera and self.camera.isOpened():
-            logger.debug("Camera is already opened")
-            return
 
-        if os.name == "nt":
-            logger.debug("NT OS")
-            self.camera = cv2.VideoCapture(self.cameraId, cv2.CAP_DSHOW)  # type: ignore
-        else:
-            logger.debug("Not NT OS")
-            self.camera = cv2.VideoCapture(self.cameraId)  # type: ignore
+MOTION_LEVEL = 2
+"""動き検出に使う縮小段階(`CapturedFrame.gray(MOTION_LEVEL)`、2は1/4)"""
 
-        if not self.camera.isOpened():
-            print(f"Camera ID {self.cameraId} cannot open.")
-            logger.error(f"Camera ID {self.cameraId} cannot open.")
-            self.camera_process_status.value = False
-            return
-        else:
-            print(f"Camera ID {self.cameraId} opened successfully.")
-            logger.debug(f"Camera ID {self.cameraId} opened successfully.")
-            self.camera_process_status.value = True
+MOTION_PIXEL_THRESHOLD = 15
+"""動いたとみなす画素値の差(縮小したグレースケール画像)"""
 
-            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, self.capture_size[0])
-            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, self.capture_size[1])
 
-    def isOpened(self) -> bool:
-        if not self.camera:
-            return False
-        else:
-            return self.camera.isOpened()
-
-    def processCamera(self) -> None:
-        while not self.finish_flag.value:
-            try:
-                if self.camera is not None and self.camera.isOpened():
-                    ret, frame = self.camera.read()
-                    if ret:
-                        self.image[:] = frame
-                sleep(1 / self.fps.value)
-            except Exception:
-                logger.error("Camera Process Error")
-                logger.error(traceback.format_exc())
-        self.closeCamera()
-
-    def closeCamera(self) -> None:
-        self.finish_flag.value = True
-        if self.camera is not None and self.camera.isOpened():
-            self.camera.release()
-            self.camera = None
+class MotionSample:
+    """
+    `MotionDetector`が1フレームごとに公開する動きの情報。
 
+    Attributes:
+        seq (int): フレームの通し番号
+        timestamp (float): フレームを取得した時刻(`time.perf_counter()`)
+        energy (float): 画面全体の動きの量(動いた画素の割合 0.0〜1.0)
+        diff (np.ndarray): 直近3フレームの差分(2つのフレーム間差分の小さい方)。縮小画像の大きさ
+    """
 
-class CustomQueue(queue.Queue):
-    def __init__(self, maxsize: int = 1):
-        super().__init__(maxsize=maxsize)
-        self.last_frame: Any = None  # 最新フレーム
+    def __init__(self, seq: int, timestamp: float, diff: np.ndarray, scale: int):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.diff = diff
+        self._scale = scale
+        self.energy = self.roi_energy()
+
+    def __repr__(self) -> str:
+        return f"<MotionSample seq={self.seq} energy={self.energy:.4f}>"
+
+    def roi_energy(self, roi: list = [], pixel_threshold: int = MOTION_PIXEL_THRESHOLD) -> float:
+        """
+        範囲内の動きの量(差分が`pixel_threshold`を超えた画素の割合)を返す。
+
+        Args:
+            roi (list): 範囲 [x軸始点, y軸始点, x軸終点, y軸終点](元の画像の座標)。空の場合は画面全体
+            pixel_threshold (int): 動いたとみなす画素値の差
+
+        Returns:
+            float: 動いた画素の割合(0.0〜1.0)
+        """
+        diff = self.diff
+        if len(roi) == 4:
+            s = self._scale
+            x0, y0 = roi[0] // s, roi[1] // s
+            x1, y1 = max(x0 + 1, -(-roi[2] // s)), max(y0 + 1, -(-roi[3] // s))
+            diff = diff[y0:y1, x0:x1]
+        if diff.size == 0:
+            return 0.0
+        return cv2.countNonZero(cv2.threshold(diff, pixel_threshold, 255, cv2.THRESH_BINARY)[1]) / diff.size
+
+
+class MotionDetector:
+    """
+    キャプチャスレッドから毎フレーム渡される画像で、画面の動きの量を求める。
 
-    def put(self, frame: Any, block: bool = True, timeout: float | None = None) -> None:
-        if self.full():
-            try:
-                self.get_nowait()  # キューが満杯なら古いフレームを取り出す
-            except Exception as e:
-                logger.error(e)
-        super().put(frame, block, timeout)
-        self.last_frame = frame
+    縮小したグレースケール画像(`CapturedFrame.gray(MOTION_LEVEL)`)の直近3フレームを保持し、
+    `getInterframeDiff`と同じく2つのフレーム間差分の両方で変化した画素を動きとする。
+    縮小画像はフレームにキャッシュされるため、粗密探索など同じ画像を使う処理とも共有される。
+    """
 
-    def get(self, block: bool = True, timeout: float | None = None) -> Any:
-        if not self.empty():
-            return super().get(block, timeout)
-        return self.last_frame  # キューが空なら最新フレームを返す
+    def __init__(self, level: int = MOTION_LEVEL):
+        self.level = level
+        self._frames: list[np.ndarray] = []
+        self._latest: MotionSample | None = None
+        self._cond = threading.Condition()
+
+    def reset(self) -> None:
+        """
+        保持しているフレームを破棄する(カメラを開き直した場合など)。
+
+        最新の動きの情報は残すため、`wait_after`の通し番号はカメラを開き直しても戻らない。
+        """
+        with self._cond:
+            self._frames = []
+
+    def update(self, frame: CapturedFrame) -> MotionSample | None:
+        """
+        新しいフレームを追加する(キャプチャスレッドから呼ばれる)。
+
+        Returns:
+            MotionSample | None: 公開した動きの情報。フレームが3つ揃うまではNone
+        """
+        small = frame.gray(self.level)
+        frames = self._frames
+        if frames and frames[-1].shape != small.shape:
+            frames = []
+        frames = (frames + [small])[-3:]
+        self._frames = frames
+        if len(frames) < 3:
+            return None
+        diff = cv2.min(cv2.absdiff(frames[0], frames[1]), cv2.absdiff(frames[1], frames[2]))
+        sample = MotionSample(frame.seq, frame.timestamp, diff, 1 << self.level)
+        with self._cond:
+            self._latest = sample
+            self._cond.notify_all()
+        return sample
+
+    @property
+    def energy(self) -> float:
+        """最新フレームの画面全体の動きの量。まだ求めていない場合は0.0"""
+        latest = self.latest()
+        return latest.energy if latest is not None else 0.0
+
+    def latest(self) -> MotionSample | None:
+        """最新の動きの情報を返す。まだ求めていない場合はNone"""
+        with self._cond:
+            return self._latest
+
+    def wait_after(self, seq: int, timeout: float | None = None) -> MotionSample | None:
+        """
+        通し番号が`seq`より新しいフレームの動きの情報が公開されるまで待機する(`FrameRingBuffer.wait_after`と同じ)。
+
+        Returns:
+            MotionSample | None: 動きの情報。タイムアウトした場合はNone
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._latest is not None and self._latest.seq > seq, timeout
+            )
+            if self._latest is not None and self._latest.seq > seq:
+                return self._latest
+            return None
 
 
 class Camera:
-    def __init__(self, fps: int = 45):
+    def __init__(self, fps: int = 45, backend: str = "thread"):
         self.camera: VideoCaptureWrapper | cv2.VideoCapture | None = None
         self.fps = int(fps)
+        self.backend = backend if backend in CAMERA_BACKENDS else "thread"
         self.capture_size = (1280, 720)
         self.capture_dir = "Captures"
-        self.frame_queue: CustomQueue = CustomQueue()
+        self.frame_buffer: FrameRingBuffer = FrameRingBuffer()
+        self.motion: MotionDetector = MotionDetector()
         self._recording_queue: queue.Queue | None = None  # VideoRecorder が設定する録画用キュー
+        self._stop_event = threading.Event()
+        self.thread: threading.Thread | None = None
 
     def openCamera(self, cameraId: int) -> None:
-        self.frame_queue = CustomQueue()
         if self.camera is not None and self.camera.isOpened():
             logger.debug("Camera is already opened")
             self.destroy()
-
-        if os.name == "nt":
-            logger.debug("NT OS")
-            self.camera = cv2.VideoCapture(cameraId)
-            # self.camera = VideoCaptureWrapper(cameraId, cv2.CAP_DSHOW) # マルチプロセスにする場合
+        # 古いキャプチャスレッドを止めてから、バッファと動き検出を使い続ける
+        # (通し番号を0に戻すと、開き直す前の通し番号で待機している処理が戻らなくなるため)
+        self.motion.reset()
+
+        if self.backend == "process":
+            # 読み込み・デコードを子プロセスで行う
+            props = {
+                cv2.CAP_PROP_FRAME_WIDTH: self.capture_size[0],
+                cv2.CAP_PROP_FRAME_HEIGHT: self.capture_size[1],
+            }
+            if os.name == "nt":
+                logger.debug("NT OS")
+                self.camera = VideoCaptureWrapper(cameraId, cv2.CAP_DSHOW, props=props)
+            else:
+                logger.debug("Not NT OS")
+                self.camera = VideoCaptureWrapper(cameraId, props=props)
         else:
-            logger.debug("Not NT OS")
-            # self.camera = VideoCaptureWrapper(cameraId) # マルチプロセスにする場合
+            if os.name == "nt":
+                logger.debug("NT OS")
+            else:
+                logger.debug("Not NT OS")
             self.camera = cv2.VideoCapture(cameraId)
 
         if not self.camera.isOpened():
@@ -218,20 +529,51 @@ class Camera:
         return False
 
     def readFrame(self) -> cv2.Mat | None:
+        """
+        最新フレームの読み取り専用ビューを返す。
+
+        画像を書き換える場合は呼び出し側で`.copy()`すること。
+
+        Returns:
+            cv2.Mat | None: BGR画像。フレームがない場合はNone
+        """
+        frame = self.latest_frame()
+        if frame is None:
+            return None
+        return frame.image
+
+    def latest_frame(self) -> CapturedFrame | None:
+        """
+        最新フレームを通し番号・取得時刻つきで返す。
+
+        Returns:
+            CapturedFrame | None: カメラが開いていない、またはフレームがない場合はNone
+        """
         if isinstance(self.camera, VideoCaptureWrapper) or isinstance(
             self.camera, cv2.VideoCapture
         ):
-            if self.frame_queue:
-                frame = self.frame_queue.get()
-                if frame is None:
-                    return None
-                return frame.copy()
-            else:
-                logger.debug("Frame queue is empty")
-                return None
+            return self.frame_buffer.latest()
         else:
             return None
 
+    def read_frame_after(
+        self, seq: int, timeout: float | None = None
+    ) -> CapturedFrame | None:
+        """
+        通し番号が`seq`より新しいフレームを待って返す。
+
+        キャプチャスレッドがフレームを公開した時点で起床するため、
+        固定時間のポーリングと違って同じフレームを二度処理することがない。
+
+        Args:
+            seq (int): 最後に処理したフレームの通し番号(`CapturedFrame.seq`)
+            timeout (float | None): 最大待機時間(秒)。Noneの場合は無制限
+
+        Returns:
+            CapturedFrame | None: 新しいフレーム。タイムアウトした場合はNone
+        """
+        return self.frame_buffer.wait_after(seq, timeout)
+
     def saveCapture(
         self,
         filename: str | None = None,
@@ -287,9 +629,6 @@ class Camera:
 
     def destroy(self) -> None:
         if self.camera is not None and self.camera.isOpened():
-            self.camera.release()
-            self.camera = None
-
             self.camera_thread_stop()
             logger.debug("Camera destroyed")
 
@@ -298,6 +637,7 @@ class Camera:
             logger.error("Camera is not opened")
             return
         logger.debug("Camera thread starting")
+        self._stop_event = threading.Event()
         self.thread = threading.Thread(target=self.camera_update, name="CameraThread")
         self.thread.start()
 
@@ -306,176 +646,48 @@ class Camera:
             logger.error("Camera is not opened")
             return
         logger.debug("Camera thread stopping")
-        self.thread.join()
+        # スレッドを止めてからカメラを解放する(read()中に解放しないため)
+        self._stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
         self.camera.release()
         self.camera = None
         logger.debug("Camera thread stopped")
 
     def camera_update(self) -> None:
-        if self.camera is None:
+        camera = self.camera
+        if camera is None:
             logger.error("Camera is not opened")
             return
         logger.debug("Camera update thread started")
-        while self.camera.isOpened():
+        while not self._stop_event.is_set() and camera.isOpened():
             start_time = time.perf_counter()  # camera.read() 開始時刻を記録
-            _, frame = self.camera.read()
-            self.frame_queue.put(frame)
+            slot = self.frame_buffer.acquire()
+            if slot is None:
+                ret, frame = camera.read()
+            else:
+                ret, frame = camera.read(slot)  # スロットへ直接デコードする
+            if ret and frame is not None:
+                captured = self.frame_buffer.publish(frame)
+            else:
+                # 読み出しに失敗した場合は直前のフレームを公開したままにする(通し番号は進めない)
+                captured = None
+            if captured is not None:
+                self.motion.update(captured)
             # --- [録画] 録画用キューへノンブロッキングで供給 ---
             rq = self._recording_queue  # GIL により参照読み取りはアトミック
-            if rq is not None and frame is not None:
+            if rq is not None and captured is not None:
                 try:
-                    rq.put_nowait(frame)
+                    # スロットは上書きされるため、録画用にはコピーを渡す
+                    rq.put_nowait(captured.image.copy())
                 except queue.Full:
                     pass  # キュー満杯の場合はフレームをドロップ（メインループ優先）
             # --------------------------------------------------
             read_time = time.perf_counter() - start_time  # read() の実経過時間
             sleep_time = max(0.0, (1.0 / self.fps) - read_time)  # 残り時間だけ sleep
-            sleep(sleep_time)
-            if self.camera is None:
-                break
-
-
-# カメラの読み込み処理をマルチプロセス化する
-# WIP
-class CameraQueue:
-    # using shared memory
-    def __init__(self, fps: int, cameraId: int, capture_size: tuple = (1280, 720)):
-        logger.debug("CameraQueue initializing")
-        self.cameraId = cameraId
-        self.capture_size = capture_size
-        self._fps = int(fps)
-
-        self.manager = multiprocessing.Manager()
-
-        self.capture_dir = "Captures"
-
-        self.init_shared_memory()
-
-        self.openCamera(self.cameraId)
-        self.startCamera()
-        logger.debug("init CameraQueue")
-
-    def init_shared_memory(self) -> None:
-        self.shm = shared_memory.SharedMemory(
-            create=True, size=int(np.prod((720, 1280, 3))), name="camera_image"
-        )
-        self.image_bgr: np.ndarray = np.ndarray(
-            (720, 1280, 3), dtype=np.uint8, buffer=self.shm.buf
-        )
-
-        self.fps: Synchronized = Value("i", self._fps)
-        self.finish_flag: Synchronized = Value("b", False)
-        self.camera_process_status: Synchronized = Value("b", False)
-        self.camera_process: multiprocessing.Process | None = None
-
-    def openCamera(self, camera_id: int) -> None:
-        self.cameraId = camera_id
-
-        if self.camera_process is not None and self.camera_process.is_alive():
-            logger.debug("Camera is already opened")
-            self.finish_flag.value = True
-            self.camera_process.join()
-            # self.camera_process.terminate()
-            self.camera_process = None
-
-        # try:
-        #     self.init_shared_memory()
-        # except Exception:
-        #     logger.error("Shared Memory Error")
-        #     pass
-
-        self.camera_process = multiprocessing.Process(
-            target=CameraController,
-            args=(
-                self.finish_flag,
-                self.camera_process_status,
-                self.fps,
-                self.cameraId,
-                self.capture_size,
-            ),
-            name="CameraController",
-        )
-
-    def startCamera(self) -> None:
-        if self.camera_process is None:
-            logger.error("Camera Process is not initialized")
-            return
-        self.camera_process.start()
-
-    def isOpened(self) -> bool:
-        if self.camera_process_status.value:
-            return True
-        else:
-            return False
-
-    def readFrame(self) -> cv2.Mat | None:
-        logger.debug("Reading Frame")
-        return self.image_bgr
-
-    def saveCapture(
-        self,
-        filename: str | None = None,
-        crop: list | None = None,
-        crop_ax: list | None = None,
-        img: cv2.Mat | None = None,
-    ) -> None:
-        if crop_ax is None:
-            crop_ax = [0, 0, 1280, 720]
-        else:
-            pass
-            # print(crop_ax)
-
-        dt_now = datetime.datetime.now()
-        if filename is None or filename == "":
-            filename = dt_now.strftime("%Y-%m-%d_%H-%M-%S") + ".png"
-        else:
-            filename = filename + ".png"
-
-        if crop is None:
-            image = self.image_bgr
-        elif crop == 1 or crop == "1":
-            image = self.image_bgr[crop_ax[1] : crop_ax[3], crop_ax[0] : crop_ax[2]]
-        elif crop == 2 or crop == "2":
-            image = self.image_bgr[
-                crop_ax[1] : crop_ax[1] + crop_ax[3],
-                crop_ax[0] : crop_ax[0] + crop_ax[2],
-            ]
-        elif img is not None:
-            image = img
-        else:
-            image = self.image_bgr
-
-        save_path = _get_save_filespec(filename)
-
-        if not os.path.exists(os.path.dirname(save_path)) or not os.path.isdir(
-            os.path.dirname(save_path)
-        ):
-            # 保存先ディレクトリが存在しないか、同名のファイルが存在する場合（existsはファイルとフォルダを区別しない）
-            os.makedirs(os.path.dirname(save_path))
-            logger.debug("Created Capture folder")
-
-        try:
-            imwrite(save_path, image)
-            logger.debug(f"Capture succeeded: {save_path}")
-            print("capture succeeded: " + save_path)
-        except cv2.error as e:
-            print("Capture Failed")
-            logger.error(f"Capture Failed :{e}")
-
-    def destroy(self) -> None:
-        if self.isOpened() and self.camera_process is not None:
-            # self.camera_process.terminate()
-            self.finish_flag.value = True
-            self.camera_process = None
-            logger.debug("Camera destroyed")
+            self._stop_event.wait(sleep_time)
 
 
 if __name__ == "__main__":
-    c = Camera(60)
+    c = Camera(60, backend="process")
     c.openCamera(2)
-
-    # c.finish_flag.value = True
-    # if c.camera_process is not None:
-    #     c.camera_process.terminate
-    # c.shm.close()
-    # c.shm.unlink()
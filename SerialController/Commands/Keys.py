@@ -6,10 +6,13 @@ from typing import TYPE_CHECKING
 import math
 import time
 from collections import OrderedDict
+from functools import lru_cache
 from enum import Enum, IntEnum, IntFlag, auto
-import queue
 from logging import getLogger, DEBUG, NullHandler
 
+from .SerialProtocol import encodeFrame
+from .SerialWriter import PRIORITY_URGENT
+
 if TYPE_CHECKING:
     from Commands.Sender import Sender
 
@@ -70,86 +73,219 @@ max = 255
 
 
 # serial format
+# 送信内容の状態は1つの整数にまとめる(ビット位置)
+# btn(16) | hat(4) | lx(8) | ly(8) | rx(8) | ry(8) | sx(16) | sy(8)
+_HAT_SHIFT = 16
+_LX_SHIFT = 20
+_LY_SHIFT = 28
+_RX_SHIFT = 36
+_RY_SHIFT = 44
+_SX_SHIFT = 52
+_SY_SHIFT = 68
+_BTN_HAT_MASK = (1 << _LX_SHIFT) - 1
+_L_MASK = 0xFFFF << _LX_SHIFT
+_R_MASK = 0xFFFF << _RX_SHIFT
+_TOUCH_MASK = 0xFFFFFF << _SX_SHIFT
+# encodeRowのキャッシュのキーで、スティックを送るかどうかを表すビット(タッチスクリーンの位置を使う)
+_L_CHANGED = 1 << _SX_SHIFT
+_R_CHANGED = 1 << (_SX_SHIFT + 1)
+_NEUTRAL_STATE = (Hat.CENTER << _HAT_SHIFT | center << _LX_SHIFT | center << _LY_SHIFT
+                  | center << _RX_SHIFT | center << _RY_SHIFT)
+# エンコードした結果をキャッシュする状態の数(超えたら消去する)
+ENCODE_CACHE_SIZE = 1024
+
+
+def _encodeRow(key: int) -> bytes:
+    space = ' '
+    send_btn = (key & 0xFFFF) << 2
+    str_L = ''
+    str_R = ''
+    if key & _L_CHANGED:
+        send_btn |= 0x2
+        str_L = space + format(key >> _LX_SHIFT & 0xFF, 'x') + space + format(key >> _LY_SHIFT & 0xFF, 'x')
+    if key & _R_CHANGED:
+        send_btn |= 0x1
+        str_R = space + format(key >> _RX_SHIFT & 0xFF, 'x') + space + format(key >> _RY_SHIFT & 0xFF, 'x')
+    str_Hat = str(key >> _HAT_SHIFT & 0xF)
+    return (format(send_btn, '#06x') + space + str_Hat + str_L + str_R + '\r\n').encode('utf-8')
+
+
+def _encodeList(state: int) -> bytes:
+    """
+    For Qingpi
+    """
+    header = 0xAB   # fixed value
+    send_touch_x = state >> _SX_SHIFT & 0xFFFF
+    return bytes([
+        header,
+        state & 0xFF,
+        (state >> 8) & 0xFF,
+        state >> _HAT_SHIFT & 0xF,
+        state >> _LX_SHIFT & 0xFF,
+        state >> _LY_SHIFT & 0xFF,
+        center,
+        center,
+        send_touch_x & 0xFF,
+        (send_touch_x >> 8) & 0xFF,
+        state >> _SY_SHIFT & 0xFF,
+    ])
+
+
 class SendFormat:
-    def __init__(self):
+    """
+    送信内容(ボタン・ハット・スティック・タッチスクリーン)の状態。
 
-        self._logger = getLogger(__name__)
-        self._logger.addHandler(NullHandler())
-        self._logger.setLevel(DEBUG)
-        self._logger.propagate = True
-
-        # This format structure needs to be the same as the one written in Joystick.c
-        self.format = OrderedDict([
-            ('btn', 0),  # send bit array for buttons
-            ('hat', Hat.CENTER),
-            ('lx', center),
-            ('ly', center),
-            ('rx', center),
-            ('ry', center),
-            ('sx', 0),
-            ('sy', 0),
-        ])
+    状態は1つの整数(`state`)で持ち、エンコードしたバイト列を状態ごとにキャッシュする。
+    連打のように同じ状態を繰り返し送る場合は、文字列を組み立てずにキャッシュから返す。
+    """
+
+    # This format structure needs to be the same as the one written in Joystick.c
+    __slots__ = ('state', 'L_stick_changed', 'R_stick_changed', 'Hat_pos', 'coalesce_key')
+    _row_cache: dict[int, bytes] = {}
+    _list_cache: dict[int, bytes] = {}
+    _binary_cache: dict[int, bytes] = {}
+
+    def __init__(self):
+        self.state = _NEUTRAL_STATE
 
         self.L_stick_changed = False
         self.R_stick_changed = False
         self.Hat_pos = Hat.CENTER
+        # 最後にエンコードしたフレームを、まだ送られていなければ置き換えてよい次のフレームを表すキー
+        # (ボタン・ハットと送るスティックが同じで、スティックの位置だけが違うフレームは同じキーになる)
+        self.coalesce_key = None
+
+    @property
+    def format(self) -> OrderedDict:
+        """状態を各値に分けたもの(読み取り専用のコピー)"""
+        state = self.state
+        return OrderedDict([
+            ('btn', state & 0xFFFF),  # send bit array for buttons
+            ('hat', Hat(state >> _HAT_SHIFT & 0xF)),
+            ('lx', state >> _LX_SHIFT & 0xFF),
+            ('ly', state >> _LY_SHIFT & 0xFF),
+            ('rx', state >> _RX_SHIFT & 0xFF),
+            ('ry', state >> _RY_SHIFT & 0xFF),
+            ('sx', state >> _SX_SHIFT & 0xFFFF),
+            ('sy', state >> _SY_SHIFT & 0xFF),
+        ])
+
+    def _setByte(self, shift: int, value: int):
+        self.state = self.state & ~(0xFF << shift) | (value & 0xFF) << shift
+
+    def setInputs(self, btns: list, touchscreen: bool = False):
+        """
+        ボタン・ハット・スティック(`touchscreen`がTrueの場合はタッチスクリーンも)をまとめて設定する。
+        setButton, setHat, setAnyDirection, setTouchscreenを続けて呼ぶのと同じ
+        """
+        hat = None
+        touch = None
+        for btn in btns:
+            t = type(btn)
+            if t is Button:
+                self.state |= int(btn)
+            elif t is Direction:
+                self._setDirection(btn)
+            elif t is Hat:
+                if hat is None:
+                    hat = btn
+            elif t is Touchscreen:
+                if touch is None:
+                    touch = btn
+        self.setHat([hat] if hat is not None else [])
+        if touchscreen and touch is not None:
+            self.setTouchscreen([touch])
+
+    def unsetInputs(self, btns: list, unset_hat: bool = True):
+        """
+        ボタンを離し、スティックを戻す(`unset_hat`がTrueの場合はハットも)。
+        unsetButton, unsetHat, unsetDirectionを続けて呼ぶのと同じ
+        """
+        btn_bits = 0
+        tilts = 0
+        for btn in btns:
+            t = type(btn)
+            if t is Button:
+                btn_bits |= int(btn)
+            elif t is Direction:
+                tilts |= btn.tilt_axes
+        self.state &= ~btn_bits
+        if unset_hat:
+            self.unsetHat()
+        if tilts:
+            self._unsetAxes(tilts)
 
     def setButton(self, btns):
         for btn in btns:
-            self.format['btn'] |= btn
+            self.state |= int(btn)
 
     def unsetButton(self, btns):
         for btn in btns:
-            self.format['btn'] &= ~btn
+            self.state &= ~int(btn)
 
     def resetAllButtons(self):
-        self.format['btn'] = 0
+        self.state &= ~0xFFFF
 
     def setHat(self, btns):
         # self._logger.debug(btns)
         if not btns:
-            self.format['hat'] = self.Hat_pos
+            hat = self.Hat_pos
         else:
             self.Hat_pos = btns[0]
-            self.format['hat'] = btns[0]  # takes only first element
+            hat = btns[0]  # takes only first element
+        self.state = self.state & ~(0xF << _HAT_SHIFT) | int(hat) << _HAT_SHIFT
 
     def unsetHat(self):
         # if self.Hat_pos is not Hat.CENTER:
         self.Hat_pos = Hat.CENTER
-        self.format['hat'] = self.Hat_pos
+        self.state = self.state & ~(0xF << _HAT_SHIFT) | Hat.CENTER << _HAT_SHIFT
+
+    def _setDirection(self, dir):
+        # NOTE: y axis directs under
+        stick = dir.x | (255 - dir.y) << 8
+        if dir.stick == Stick.LEFT:
+            if (self.state >> _LX_SHIFT & 0xFFFF) != stick:
+                self.L_stick_changed = True
+            self.state = self.state & ~_L_MASK | stick << _LX_SHIFT
+        elif dir.stick == Stick.RIGHT:
+            if (self.state >> _RX_SHIFT & 0xFFFF) != stick:
+                self.R_stick_changed = True
+            self.state = self.state & ~_R_MASK | stick << _RX_SHIFT
 
     def setAnyDirection(self, dirs):
         for dir in dirs:
-            if dir.stick == Stick.LEFT:
-                if self.format['lx'] != dir.x or self.format['ly'] != 255 - dir.y:
-                    self.L_stick_changed = True
+            self._setDirection(dir)
 
-                self.format['lx'] = dir.x
-                self.format['ly'] = 255 - dir.y  # NOTE: y axis directs under
-            elif dir.stick == Stick.RIGHT:
-                if self.format['rx'] != dir.x or self.format['ry'] != 255 - dir.y:
-                    self.R_stick_changed = True
-
-                self.format['rx'] = dir.x
-                self.format['ry'] = 255 - dir.y
+    def _unsetAxes(self, tilts: int):
+        # tilts: Direction.tilt_axes を合わせたもの(LY, LX, RY, RXの順のビット)
+        if tilts & 0x1:
+            self._setByte(_LY_SHIFT, center)
+            self._setByte(_LX_SHIFT, self.fixOtherAxis(self.state >> _LX_SHIFT & 0xFF))
+            self.L_stick_changed = True
+        if tilts & 0x2:
+            self._setByte(_LX_SHIFT, center)
+            self._setByte(_LY_SHIFT, self.fixOtherAxis(self.state >> _LY_SHIFT & 0xFF))
+            self.L_stick_changed = True
+        if tilts & 0x4:
+            self._setByte(_RY_SHIFT, center)
+            self._setByte(_RX_SHIFT, self.fixOtherAxis(self.state >> _RX_SHIFT & 0xFF))
+            self.R_stick_changed = True
+        if tilts & 0x8:
+            self._setByte(_RX_SHIFT, center)
+            self._setByte(_RY_SHIFT, self.fixOtherAxis(self.state >> _RY_SHIFT & 0xFF))
+            self.R_stick_changed = True
 
     def unsetDirection(self, dirs):
+        tilts = 0
         if Tilt.UP in dirs or Tilt.DOWN in dirs:
-            self.format['ly'] = center
-            self.format['lx'] = self.fixOtherAxis(self.format['lx'])
-            self.L_stick_changed = True
+            tilts |= 0x1
         if Tilt.RIGHT in dirs or Tilt.LEFT in dirs:
-            self.format['lx'] = center
-            self.format['ly'] = self.fixOtherAxis(self.format['ly'])
-            self.L_stick_changed = True
+            tilts |= 0x2
         if Tilt.R_UP in dirs or Tilt.R_DOWN in dirs:
-            self.format['ry'] = center
-            self.format['rx'] = self.fixOtherAxis(self.format['rx'])
-            self.R_stick_changed = True
+            tilts |= 0x4
         if Tilt.R_RIGHT in dirs or Tilt.R_LEFT in dirs:
-            self.format['rx'] = center
-            self.format['ry'] = self.fixOtherAxis(self.format['ry'])
-            self.R_stick_changed = True
+            tilts |= 0x8
+        self._unsetAxes(tilts)
 
     # Use this to fix an either tilt to max when the other axis sets to 0
     def fixOtherAxis(self, fix_target):
@@ -159,10 +295,7 @@ class SendFormat:
             return 0 if fix_target < center else 255
 
     def resetAllDirections(self):
-        self.format['lx'] = center
-        self.format['ly'] = center
-        self.format['rx'] = center
-        self.format['ry'] = center
+        self.state = self.state & ~(_L_MASK | _R_MASK) | (_NEUTRAL_STATE & (_L_MASK | _R_MASK))
         self.L_stick_changed = True
         self.R_stick_changed = True
         self.Hat_pos = Hat.CENTER
@@ -171,106 +304,145 @@ class SendFormat:
         if not dirs:
             pass
         else:
-            self.format['sx'] = dirs[0].x   # takes only first element
-            self.format['sy'] = dirs[0].y   # takes only first element
+            # takes only first element
+            self.state = self.state & ~_TOUCH_MASK | (int(dirs[0].x) & 0xFFFF) << _SX_SHIFT \
+                | (int(dirs[0].y) & 0xFF) << _SY_SHIFT
 
     def unsetTouchscreen(self):
-        self.format['sx'] = 0
-        self.format['sy'] = 0
+        self.state &= ~_TOUCH_MASK
 
-    def convert2str(self):
-        str_format = ''
-        str_L = ''
-        str_R = ''
-        str_Hat = ''
-        space = ' '
-
-        # set bits array with stick flags
-        send_btn = int(self.format['btn']) << 2
-        # send_btn |= 0x3
+    def encodeRow(self) -> bytes:
+        """
+        Arduino向けの1行(改行を含む)をエンコードする。スティックは変化があったものだけ送る
+        """
+        state = self.state
+        key = state & _BTN_HAT_MASK
         if self.L_stick_changed:
-            send_btn |= 0x2
-            str_L = format(self.format['lx'], 'x') + space + format(self.format['ly'], 'x')
+            key |= state & _L_MASK | _L_CHANGED
         if self.R_stick_changed:
-            send_btn |= 0x1
-            str_R = format(self.format['rx'], 'x') + space + format(self.format['ry'], 'x')
-        # if self.Hat_changed:
-        str_Hat = str(int(self.format['hat']))
-        # format(send_btn, 'x') + \
-        # print(hex(send_btn))
-        str_format = format(send_btn, '#06x') + \
-            (space + str_Hat) + \
-            (space + str_L if self.L_stick_changed else '') + \
-            (space + str_R if self.R_stick_changed else '')
+            key |= state & _R_MASK | _R_CHANGED
+        self.L_stick_changed = False
+        self.R_stick_changed = False
+        self.coalesce_key = key & (_BTN_HAT_MASK | _L_CHANGED | _R_CHANGED)
+
+        cache = SendFormat._row_cache
+        data = cache.get(key)
+        if data is None:
+            if len(cache) >= ENCODE_CACHE_SIZE:
+                cache.clear()
+            data = cache[key] = _encodeRow(key)
+        return data
 
+    def encodeBinary(self) -> bytes:
+        """
+        Arduino向けのバイナリのフレーム(SerialProtocol)をエンコードする。スティックは常に送る
+        """
+        key = self.state & ~_TOUCH_MASK
         self.L_stick_changed = False
         self.R_stick_changed = False
+        self.coalesce_key = key & _BTN_HAT_MASK
+
+        cache = SendFormat._binary_cache
+        data = cache.get(key)
+        if data is None:
+            if len(cache) >= ENCODE_CACHE_SIZE:
+                cache.clear()
+            data = cache[key] = encodeFrame(key & 0xFFFF, key >> _HAT_SHIFT & 0xF,
+                                            key >> _LX_SHIFT & 0xFF, key >> _LY_SHIFT & 0xFF,
+                                            key >> _RX_SHIFT & 0xFF, key >> _RY_SHIFT & 0xFF)
+        return data
+
+    def encodeList(self) -> bytes:
+        """
+        For Qingpi
+        """
+        key = self.state & ~_R_MASK
+        self.coalesce_key = key & ~_L_MASK
+        cache = SendFormat._list_cache
+        data = cache.get(key)
+        if data is None:
+            if len(cache) >= ENCODE_CACHE_SIZE:
+                cache.clear()
+            data = cache[key] = _encodeList(key)
+        return data
 
-        # print(str_format)
-        return str_format  # the last space is not needed
+    def convert2str(self):
+        return self.encodeRow()[:-2].decode('utf-8')  # the last space is not needed
 
     def convert2list(self):
         """
-        For Qingpi 
+        For Qingpi
         """
-        header = 0xAB   # fixed value
-        send_btn = int(self.format['btn'])
-        send_hat = int(self.format['hat'])
-        send_lstick_x = self.format['lx']
-        send_lstick_y = self.format['ly']
-        send_touch_x = int(self.format['sx'])
-        send_touch_y = int(self.format['sy'])
-
-        state = [
-            header,
-            send_btn & 0xFF,
-            (send_btn >> 8) & 0xFF,
-            send_hat,
-            send_lstick_x,
-            send_lstick_y,
-            center,
-            center,
-            send_touch_x & 0xFF,
-            (send_touch_x >> 8) & 0xFF,
-            send_touch_y
-        ]
-
-        return state
+        return list(self.encodeList())
+
+
+# スティックの角度・倒す量から位置を求めた結果を保持する数(同じ角度のDirectionは計算を省く)
+ANGLE_TABLE_SIZE = 4096
+
+
+@lru_cache(maxsize=ANGLE_TABLE_SIZE)
+def _stickPosition(angle, magnification, isDegree):
+    angle = math.radians(angle) if isDegree else angle
+
+    # We set stick X and Y from 0 to 255, so they are calculated as below.
+    # X = 127.5*cos(theta) + 127.5
+    # Y = 127.5*sin(theta) + 127.5
+    return (math.ceil(127.5 * math.cos(angle) * magnification + 127.5),
+            math.floor(127.5 * math.sin(angle) * magnification + 127.5))
 
 
 # This class handle L stick and R stick at any angles
 class Direction:
-    def __init__(self, stick, angle, magnification=1.0, isDegree=True, showName=None):
+    """
+    スティックの向き。作成後は変更できない(同じ値のDirectionは区別せずに使える)
+    """
 
-        self._logger = getLogger(__name__)
-        self._logger.addHandler(NullHandler())
-        self._logger.setLevel(DEBUG)
-        self._logger.propagate = True
+    __slots__ = ('stick', 'angle_for_show', 'showName', 'mag', 'x', 'y', 'tilt_axes')
 
-        self.stick = stick
-        self.angle_for_show = angle
-        self.showName = showName
+    def __init__(self, stick, angle, magnification=1.0, isDegree=True, showName=None):
         if magnification > 1.0:
-            self.mag = 1.0
+            mag = 1.0
         elif magnification < 0:
-            self.mag = 0.0
+            mag = 0.0
         else:
-            self.mag = magnification
+            mag = magnification
 
         if isinstance(angle, tuple):
             # assuming (X, Y)
-            self.x = angle[0]
-            self.y = angle[1]
-            self.showName = '(' + str(self.x) + ', ' + str(self.y) + ')'
-            print('押し込み量', self.showName)
+            x = angle[0]
+            y = angle[1]
+            showName = '(' + str(x) + ', ' + str(y) + ')'
+            print('押し込み量', showName)
         else:
-            angle = math.radians(angle) if isDegree else angle
+            x, y = _stickPosition(angle, mag, isDegree)
+
+        # 傾いている軸(getTiltingをビットで表したもの。SendFormat.unsetInputsで使う)
+        tilt_axes = (0x1 if y != center - 1 else 0) | (0x2 if x != center else 0)
+        if stick == Stick.RIGHT:
+            tilt_axes <<= 2
+        elif stick != Stick.LEFT:
+            tilt_axes = 0
+
+        _set = object.__setattr__
+        _set(self, 'stick', stick)
+        _set(self, 'angle_for_show', angle)
+        _set(self, 'showName', showName)
+        _set(self, 'mag', mag)
+        _set(self, 'x', x)
+        _set(self, 'y', y)
+        _set(self, 'tilt_axes', tilt_axes)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Direction is immutable (cannot set '{name}')")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Direction is immutable (cannot delete '{name}')")
 
-            # We set stick X and Y from 0 to 255, so they are calculated as below.
-            # X = 127.5*cos(theta) + 127.5
-            # Y = 127.5*sin(theta) + 127.5
-            self.x = math.ceil(127.5 * math.cos(angle) * self.mag + 127.5)
-            self.y = math.floor(127.5 * math.sin(angle) * self.mag + 127.5)
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __repr__(self):
         if self.showName:
@@ -287,6 +459,9 @@ class Direction:
         else:
             return False
 
+    def __hash__(self):
+        return hash((self.stick, self.angle_for_show))
+
     def getTilting(self):
         tilting = []
         if self.stick == Stick.LEFT:
@@ -339,15 +514,30 @@ Direction.R_UP_LEFT = Direction(Stick.RIGHT, 135, showName='UP_LEFT')
 
 
 class Touchscreen:
+    """
+    タッチスクリーンの位置(Qingpi)。作成後は変更できない
+    """
+
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
+        object.__setattr__(self, 'x', x)
+        object.__setattr__(self, 'y', y)
 
-        self._logger = getLogger(__name__)
-        self._logger.addHandler(NullHandler())
-        self._logger.setLevel(DEBUG)
-        self._logger.propagate = True
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Touchscreen is immutable (cannot set '{name}')")
 
-        self.x = x
-        self.y = y
+    def __delattr__(self, name):
+        raise AttributeError(f"Touchscreen is immutable (cannot delete '{name}')")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return "<Touchscreen, ({}, {})>".format(self.x, self.y)
 
 # handles serial input to Joystick.c
 
@@ -355,14 +545,13 @@ class Touchscreen:
 class KeyPress:
     flag_qingpi = False
 
-    def __init__(self, ser: Sender):
+    # インスタンスごとにハンドラを追加しないよう、クラスで1つだけ用意する
+    _logger = getLogger(__name__)
+    _logger.addHandler(NullHandler())
+    _logger.setLevel(DEBUG)
+    _logger.propagate = True
 
-        self._logger = getLogger(__name__)
-        self._logger.addHandler(NullHandler())
-        self._logger.setLevel(DEBUG)
-        self._logger.propagate = True
-
-        self.q = queue.Queue()
+    def __init__(self, ser: Sender):
         self.ser = ser
         self.format = SendFormat()
         self.holdButton = []
@@ -381,7 +570,6 @@ class KeyPress:
         self.was_neutral = True
 
     def input(self, btns: Button | Hat | Stick | Direction, ifPrint=True):
-        self._pushing = dict(self.format.format)
         if not isinstance(btns, list):
             btns = [btns]
 
@@ -389,45 +577,38 @@ class KeyPress:
             if not btn in btns:
                 btns.append(btn)
 
-        self.format.setButton([btn for btn in btns if type(btn) is Button])
-        self.format.setHat([btn for btn in btns if type(btn) is Hat])
-        self.format.setAnyDirection([btn for btn in btns if type(btn) is Direction])
-        if self.flag_qingpi:
-            self.format.setTouchscreen([btn for btn in btns if type(btn) is Touchscreen])
-            self.ser.writeList(self.format.convert2list())
-        else:
-            self.ser.writeRow(self.format.convert2str())
+        # 状態を更新し、エンコード済みのバイト列をそのまま送る
+        # スティックの位置だけが変わる入力は、前の入力がまだ送られていなければ置き換える
+        self.format.setInputs(btns, touchscreen=self.flag_qingpi)
+        data = self.encode()
+        self.ser.writeBytes(data, coalesce=self.format.coalesce_key)
         self.input_time_0 = time.perf_counter()
 
         # self._logger.debug(f": {list(map(str,self.format.format.values()))}")
 
     def inputEnd(self, btns: Button | Hat | Stick | Direction, ifPrint=True, unset_hat=True, unset_Touchscreen=True):
         # self._logger.debug(f"input end: {btns}")
-        self.pushing2 = dict(self.format.format)
-
         self.ed = time.perf_counter()
         if not isinstance(btns, list):
             btns = [btns]
         # self._logger.debug(btns)
 
-        # get tilting direction from angles
-        tilts = []
-        for dir in [btn for btn in btns if type(btn) is Direction]:
-            tiltings = dir.getTilting()
-            for tilting in tiltings:
-                tilts.append(tilting)
-        # self._logger.debug(tilts)
-
-        self.format.unsetButton([btn for btn in btns if type(btn) is Button])
-        if unset_hat:
-            self.format.unsetHat()
-        self.format.unsetDirection(tilts)
+        # ボタンを離し、傾いている軸(Direction.tilt_axes)を戻す
+        self.format.unsetInputs(btns, unset_hat=unset_hat)
         if self.flag_qingpi:
-            if unset_Touchscreen or (True in [btn for btn in btns if type(btn) is Touchscreen]):
+            if unset_Touchscreen:
                 self.format.unsetTouchscreen()
-            self.ser.writeList(self.format.convert2list())
-        else:
-            self.ser.writeRow(self.format.convert2str())
+        self.ser.writeBytes(self.encode())
+
+    def encode(self) -> bytes:
+        """
+        現在の状態を送信するバイト列にする(Qingpi, バイナリのフレーム, ASCIIの行のいずれか)
+        """
+        if self.flag_qingpi:
+            return self.format.encodeList()
+        if self.ser.binary_protocol:
+            return self.format.encodeBinary()
+        return self.format.encodeRow()
 
     def hold(self, btns: Button | Hat | Stick | Direction):
         if not isinstance(btns, list):
@@ -476,7 +657,8 @@ class KeyPress:
         if self.flag_qingpi:
             pass
         else:
-            self.ser.writeRow('end')
+            # まだ送られていない入力は捨てて、すぐに送る
+            self.ser.writeRow('end', priority=PRIORITY_URGENT)
 
     def serialcommand_direct_send(self, serialcommands: list, waittime: list):
         for wtime, row in zip(waittime, serialcommands):
@@ -6,22 +6,38 @@ from typing import Optional
 import cv2
 import threading
 from abc import abstractmethod
-from time import sleep
 import random
 import time
 
 # from logging import getLogger, DEBUG, NullHandler
 from deprecated import deprecated
 from loguru import logger
-from os import path
 import tkinter as tk
 import tkinter.ttk as ttk
 
 import Settings
+from AdaptiveWait import Adaptive, transition_log
+from Camera import MOTION_PIXEL_THRESHOLD
+from PrecisionTimer import PrecisionTimer
+from ImageProcessing import getInterframeDiff as _getInterframeDiff
+from TemplateMatcher import (
+    TEMPLATE_PATH,  # noqa: F401
+    WINDOW_MARGIN,  # noqa: F401
+    BinaryTemplateMatcher,  # noqa: F401
+    TemplateMatcher,
+    get_matcher,
+    match_all,
+    get_source_image,
+    get_template_filespec as _get_template_filespec,
+    preload_templates,
+)
+from TemplateStore import template_store
 from LineNotify import Line_Notify
 from DiscordNotify import Discord_Notify
 from Commands import CommandBase
 from .Keys import Button, Direction, KeyPress
+from .SerialMetrics import appendSummary
+from .Sequence import Sequence, SequenceRun
 
 import traceback
 
@@ -35,6 +51,9 @@ class StopThread(Exception):
 
 # Python command
 class PythonCommand(CommandBase.Command):
+    # コマンドで使うテンプレート(名前: TemplateMatcher)。コマンド開始時にまとめて読み込む
+    TEMPLATES: dict = {}
+
     def __init__(self):
         super(PythonCommand, self).__init__()
         self.keys = None
@@ -42,6 +61,10 @@ class PythonCommand(CommandBase.Command):
         self.alive: bool = True
         self.postProcess = None
         self.message_dialogue = None
+        # wait/short_waitで使う中断できる待機(停止要求ですぐに戻る)
+        self.timer = PrecisionTimer()
+        # 再生中のSequence
+        self.sequence_run: Optional[SequenceRun] = None
 
         self.traceback_limit = 5
 
@@ -61,9 +84,12 @@ class PythonCommand(CommandBase.Command):
 
         if self.keys is None:
             self.keys = KeyPress(ser)
+        # このスレッドからの書き込みをコマンド名で集計する
+        ser.metrics.begin(getattr(self, "NAME", type(self).__name__))
 
         try:
             if self.alive:
+                self.preload_templates()
                 self.do()
                 self.finish()
         except StopThread:
@@ -81,10 +107,35 @@ class PythonCommand(CommandBase.Command):
             self.finish()
             self.keys.end()
             self.alive = False
+        finally:
+            # 観測した遷移の所要時間を保存する(Adaptive)
+            transition_log.save()
+            logger.debug(f"Wait timing: {self.timer.stats()}")
+            logger.debug(f"Serial writer: {ser.writer.stats()}")
+            # 送りかけの書き込みを集計に含めてから、コマンド1回分の統計を保存する
+            ser.writer.flush(timeout=1.0)
+            metrics = ser.metrics.end()
+            if metrics is not None:
+                summary = metrics.summary(getattr(ser.ser, "baudrate", None))
+                logger.debug(f"Serial metrics: {summary}")
+                appendSummary(summary)
+
+    def preload_templates(self):
+        """
+        `TEMPLATES`に宣言されたテンプレートを読み込み・検証する。
+
+        親クラスで宣言されたテンプレートも含む。読み込めないテンプレートがあれば
+        最初のボタン操作の前に例外を送出する。
+        """
+        templates = {}
+        for cls in reversed(type(self).__mro__):
+            templates.update(cls.__dict__.get("TEMPLATES", {}))
+        preload_templates(templates)
 
     def start(self, ser, postProcess=None):
         self.alive = True
         self.postProcess = postProcess
+        self.timer.reset()
 
         if not self.thread:
             self.thread = threading.Thread(target=self.do_safe, args=(ser,))
@@ -96,6 +147,10 @@ class PythonCommand(CommandBase.Command):
     def sendStopRequest(self):
         if self.checkIfAlive():  # try if we can stop now
             self.alive = False
+            # 待機中であればすぐに戻す
+            self.timer.cancel()
+            if self.sequence_run is not None:
+                self.sequence_run.cancel()
             print("-- sent a stop request. --")
             logger.info("Sending stop request")
 
@@ -129,20 +184,49 @@ class PythonCommand(CommandBase.Command):
         self.checkIfAlive()
 
     # do nothing at wait time(s)
+    # 以前は回転待ちでしたが、waitと同じく期限の直前まではスリープします
     def short_wait(self, wait):
-        current_time = time.perf_counter()
-        while time.perf_counter() < current_time + wait:
-            pass
+        self.timer.sleep(float(wait))
         self.checkIfAlive()
 
     # do nothing at wait time(s)
+    # waitにはAdaptive(記録された遷移の所要時間から決める待機時間)も指定できます
+    # 期限の直前(校正した数百マイクロ秒)まではスリープし、残りだけ回転待ちします。停止要求があればすぐに戻ります
     def wait(self, wait):
-        if float(wait) > 0.1:
-            sleep(wait)
-        else:
-            current_time = time.perf_counter()
-            while time.perf_counter() < current_time + wait:
-                pass
+        self.timer.sleep(float(wait))
+        self.checkIfAlive()
+
+    def playSequence(self, sequence: Sequence, block: bool = True) -> SequenceRun:
+        """
+        ボタン操作の並び(Sequence)を専用のスレッドで再生する。
+
+        各フレームは開始時刻からの予定時刻に送られるため、`press()`を続けて呼ぶよりも時間のずれが積み重ならない。
+        停止要求があれば再生を中断し、すべてのボタンを離す。
+
+        Args:
+            sequence (Sequence): 再生するシーケンス
+            block (bool): Trueの場合は再生が終わるまで待つ。Falseの場合はすぐに戻るので、
+                画像認識などを行った後に`waitSequence()`で終わるのを待つ(その間はボタン操作をしないこと)
+
+        Returns:
+            SequenceRun: 再生中のシーケンス(`stats()`で送信時刻の誤差を取得できる)
+        """
+        self.waitSequence()
+        self.sequence_run = sequence.compile(self.keys).play(self.keys)
+        if block:
+            self.waitSequence()
+        return self.sequence_run
+
+    def waitSequence(self):
+        """`playSequence(block=False)`で再生を始めたシーケンスが終わるまで待つ"""
+        run = self.sequence_run
+        if run is None:
+            return
+        while not run.wait(0.05):
+            if not self.alive:
+                run.cancel()
+        run.wait()
+        self.sequence_run = None
         self.checkIfAlive()
 
     def checkIfAlive(self):
@@ -183,49 +267,52 @@ class PythonCommand(CommandBase.Command):
 
     # Controls the system time and get every-other-day bonus without any punishments
     def timeLeap(self, is_go_back=True):
-        self.press(Button.HOME, wait=1)
-        self.press(Direction.DOWN)
-        self.press(Direction.RIGHT)
-        self.press(Direction.RIGHT)
-        self.press(Direction.RIGHT)
-        self.press(Direction.RIGHT)
-        self.press(Direction.RIGHT)
-        self.press(Button.A, wait=1.5)  # System Settings
-        self.press(Direction.DOWN, duration=2, wait=0.5)
-
-        self.press(Button.A, wait=0.3)  # System Settings > System
-        self.press(Direction.DOWN)
-        self.press(Direction.DOWN)
-        self.press(Direction.DOWN)
-        self.press(Direction.DOWN, wait=0.3)
-        self.press(Button.A, wait=0.2)  # Date and Time
-        self.press(Direction.DOWN, duration=0.7, wait=0.2)
+        # 一連の操作をまとめて送る(1回ごとの処理時間で時間がずれないように)
+        seq = Sequence()
+        seq.press(Button.HOME, wait=1)
+        seq.press(Direction.DOWN)
+        seq.press(Direction.RIGHT)
+        seq.press(Direction.RIGHT)
+        seq.press(Direction.RIGHT)
+        seq.press(Direction.RIGHT)
+        seq.press(Direction.RIGHT)
+        seq.press(Button.A, wait=1.5)  # System Settings
+        seq.press(Direction.DOWN, duration=2, wait=0.5)
+
+        seq.press(Button.A, wait=0.3)  # System Settings > System
+        seq.press(Direction.DOWN)
+        seq.press(Direction.DOWN)
+        seq.press(Direction.DOWN)
+        seq.press(Direction.DOWN, wait=0.3)
+        seq.press(Button.A, wait=0.2)  # Date and Time
+        seq.press(Direction.DOWN, duration=0.7, wait=0.2)
 
         # increment and decrement
         if is_go_back:
-            self.press(Button.A, wait=0.2)
-            self.press(Direction.UP, wait=0.2)  # Increment a year
-            self.press(Direction.RIGHT, duration=1.5)
-            self.press(Button.A, wait=0.5)
+            seq.press(Button.A, wait=0.2)
+            seq.press(Direction.UP, wait=0.2)  # Increment a year
+            seq.press(Direction.RIGHT, duration=1.5)
+            seq.press(Button.A, wait=0.5)
 
-            self.press(Button.A, wait=0.2)
-            self.press(Direction.LEFT, duration=1.5)
-            self.press(Direction.DOWN, wait=0.2)  # Decrement a year
-            self.press(Direction.RIGHT, duration=1.5)
-            self.press(Button.A, wait=0.5)
+            seq.press(Button.A, wait=0.2)
+            seq.press(Direction.LEFT, duration=1.5)
+            seq.press(Direction.DOWN, wait=0.2)  # Decrement a year
+            seq.press(Direction.RIGHT, duration=1.5)
+            seq.press(Button.A, wait=0.5)
 
         # use only increment
         # for use of faster time leap
         else:
-            self.press(Button.A, wait=0.2)
-            self.press(Direction.RIGHT)
-            self.press(Direction.RIGHT)
-            self.press(Direction.UP, wait=0.2)  # increment a day
-            self.press(Direction.RIGHT, duration=1)
-            self.press(Button.A, wait=0.5)
+            seq.press(Button.A, wait=0.2)
+            seq.press(Direction.RIGHT)
+            seq.press(Direction.RIGHT)
+            seq.press(Direction.UP, wait=0.2)  # increment a day
+            seq.press(Direction.RIGHT, duration=1)
+            seq.press(Button.A, wait=0.5)
 
-        self.press(Button.HOME, wait=1)
-        self.press(Button.HOME, wait=1)
+        seq.press(Button.HOME, wait=1)
+        seq.press(Button.HOME, wait=1)
+        self.playSequence(seq)
 
     @deprecated(reason="Use discord instead")
     def LINE_text(self, txt="", token="token"):
@@ -301,6 +388,7 @@ class PythonCommand(CommandBase.Command):
                     + str(Settings.GuiSettings().com_port.get())
                     + " connected successfully"
                 )
+                self.keys.ser.negotiateProtocol(Settings.GuiSettings().serial_protocol.get())
                 # self.keyPress = None (ここでNoneはNGなはず)
 
 
@@ -540,22 +628,8 @@ class PokeConDialogue(object):
         self.isOK = False
 
 
-TEMPLATE_PATH = "./Template/"
-
-
-def _get_template_filespec(template_path: str) -> str:
-    """
-    テンプレート画像ファイルのパスを取得する。
-    入力が絶対パスの場合は、`TEMPLATE_PATH`につなげずに返す。
-    Args:
-        template_path (str): 画像パス
-    Returns:
-        str: _description_
-    """
-    if path.isabs(template_path):
-        return template_path
-    else:
-        return path.join(TEMPLATE_PATH, template_path)
+# read_frame_after()で停止要求を確認する間隔(秒)
+FRAME_WAIT_SLICE = 0.1
 
 
 class ImageProcPythonCommand(PythonCommand):
@@ -581,10 +655,195 @@ class ImageProcPythonCommand(PythonCommand):
         # self.Line = Line_Notify(self.camera)
         self.Discord = Discord_Notify(camera=self.camera)
 
+    def wait(self, wait):
+        # Adaptiveは、記録が揃うまでと一定回数ごとに実際の遷移を観測して所要時間を記録する
+        if isinstance(wait, Adaptive) and wait.should_observe():
+            self.observe_transition(wait)
+            return
+        super().wait(wait)
+
+    def observe_transition(self, adaptive):
+        """
+        遷移が終わるまで(最長`adaptive.default`秒)待機し、かかった時間を記録する。
+
+        `adaptive.until`を指定した場合は遷移先の画面が見つかるまで、
+        指定しない場合は画面が変化してから止まるまでを遷移とする。
+        `default`秒以内に終わらなかった場合は`default`を記録する(待機時間が短くならないようにする)。
+
+        Args:
+            adaptive (Adaptive): 対象の遷移
+
+        Returns:
+            float: 記録した時間(秒)
+        """
+        start = time.perf_counter()
+        until = adaptive.until
+        if until is None:
+            found = self.wait_until_settled(
+                quiet_frames=adaptive.settle_frames, timeout=adaptive.default, require_motion=True
+            )
+        elif isinstance(until, TemplateMatcher):
+            found = self.wait_until(lambda frame: until.match(frame)[0], timeout=adaptive.default)
+        else:
+            found = self.wait_until(until, timeout=adaptive.default)
+        elapsed = time.perf_counter() - start if found else adaptive.default
+        adaptive.record(elapsed)
+        return elapsed
+
+    def read_frame_after(self, seq=None, timeout=None):
+        """
+        通し番号が`seq`より新しいフレームが取得されるまで待機して返す。
+
+        待機中も停止要求を確認するため、コマンドの停止が遅れることはない。
+
+        Args:
+            seq (int | None): 最後に処理したフレームの通し番号。Noneの場合は現在の最新フレームの次を待つ
+            timeout (float | None): 最大待機時間(秒)。Noneの場合は無制限
+
+        Returns:
+            CapturedFrame | None: 新しいフレーム。タイムアウトした場合はNone
+        """
+        if seq is None:
+            latest = self.camera.latest_frame()
+            seq = latest.seq if latest is not None else 0
+
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            self.checkIfAlive()
+            if deadline is None:
+                slice_ = FRAME_WAIT_SLICE
+            else:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                slice_ = min(FRAME_WAIT_SLICE, remaining)
+            frame = self.camera.read_frame_after(seq, slice_)
+            if frame is not None:
+                return frame
+
+    def wait_until(self, predicate, timeout=None):
+        """
+        新しいフレームが取得されるたびに`predicate`を評価し、真になるまで待機する。
+
+        最初に現在の最新フレームで評価し、以降はキャプチャスレッドがフレームを公開した時点で評価する。
+        評価が間に合わなかったフレームは読み飛ばすため、同じフレームを二度評価することはない。
+
+        Args:
+            predicate (Callable[[CapturedFrame], Any]): フレームを受け取り判定結果を返す関数
+            timeout (float | None): 最大待機時間(秒)。Noneの場合は無制限
+
+        Returns:
+            Any: `predicate`が返した真の値。タイムアウトした場合はNone
+
+        Example:
+            self.wait_until(lambda f: self.isContainTemplate("sample.png", frame=f), timeout=10)
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        frame = self.camera.latest_frame()
+        seq = 0
+        while True:
+            if frame is not None:
+                seq = frame.seq
+                result = predicate(frame)
+                if result:
+                    return result
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+            frame = self.read_frame_after(seq, remaining)
+
+    def wait_until_settled(
+        self,
+        roi=[],
+        quiet_frames=10,
+        timeout=None,
+        threshold=0.002,
+        pixel_threshold=MOTION_PIXEL_THRESHOLD,
+        require_motion=False,
+    ):
+        """
+        画面(または範囲内)の動きが止まるまで待機する。
+
+        キャプチャスレッドが毎フレーム求める動きの量(`Camera.MotionDetector`)を見て、
+        動いた画素の割合が`threshold`以下のフレームが`quiet_frames`回続いた時点で戻る。
+        演出の終わりを待つ固定時間の`wait()`の代わりに使う。
+
+        Args:
+            roi (list): 範囲 [x軸始点, y軸始点, x軸終点, y軸終点]。空の場合は画面全体
+            quiet_frames (int): 止まったとみなす連続フレーム数(45fpsで45フレームが約1秒)
+            timeout (float | None): 最大待機時間(秒)。Noneの場合は無制限
+            threshold (float): 止まっているとみなす動いた画素の割合の上限
+            pixel_threshold (int): 動いたとみなす画素値の差
+            require_motion (bool): 一度動きがあってから止まるのを待つか(ボタン操作の直後など)
+
+        Returns:
+            bool: 動きが止まった場合はTrue、タイムアウトした場合はFalse
+
+        Example:
+            self.press(Button.A)
+            self.wait_until_settled(quiet_frames=45, timeout=15, require_motion=True)  # 以前は self.wait(15)
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        latest = self.camera.motion.latest()
+        seq = latest.seq if latest is not None else 0
+        quiet = 0
+        moved = not require_motion
+        while True:
+            self.checkIfAlive()
+            if deadline is None:
+                slice_ = FRAME_WAIT_SLICE
+            else:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return False
+                slice_ = min(FRAME_WAIT_SLICE, remaining)
+            sample = self.camera.motion.wait_after(seq, slice_)
+            if sample is None:
+                continue
+            # 評価が間に合わなかったフレームは読み飛ばす
+            seq = sample.seq
+            if sample.roi_energy(roi, pixel_threshold) <= threshold:
+                quiet += 1
+                if moved and quiet >= quiet_frames:
+                    return True
+            else:
+                quiet = 0
+                moved = True
+
+    def _get_source_image(self, frame=None, use_gray=True, crop=[], min_size=None):
+        """
+        画像認識の対象画像を返す。
+
+        `frame`が指定されていればそれを、なければ最新フレームを使う。
+        トリミングを先に行い、グレースケール化はトリミング後の範囲だけに対して行う。
+        ただし、`CapturedFrame`のグレースケール画像がすでにキャッシュされていればそれを切り出す。
+
+        Args:
+            frame (CapturedFrame | np.ndarray | None): 対象フレーム(BGR)
+            use_gray (bool): グレースケール画像を返すか
+            crop (list): トリミング範囲 [x軸始点, y軸始点, x軸終点, y軸終点]
+            min_size (tuple | None): (幅, 高さ) トリミング範囲がこれより小さい場合は広げる(テンプレートのサイズ)
+
+        Returns:
+            tuple[np.ndarray, tuple[int, int]]: 対象画像、元画像における対象画像の左上座標
+        """
+        if frame is None:
+            frame = self._get_latest_frame()
+        return get_source_image(frame, use_gray, crop, min_size)
+
+    def _get_latest_frame(self):
+        frame = self.camera.latest_frame()
+        if frame is None:
+            return self.camera.readFrame()
+        return frame
+
     # Judge if current screenshot contains an image using template matching
     # It's recommended that you use gray_scale option unless the template color wouldn't be cared for performace
     # 現在のスクリーンショットと指定した画像のテンプレートマッチングを行います
     # 色の違いを考慮しないのであればパフォーマンスの点からuse_grayをTrueにしてグレースケール画像を使うことを推奨します
+    # cropを指定せず画面全体を探す場合は、pyramid_level=1 または 2 で縮小画像から候補を探す粗密探索にすると速くなります
     def isContainTemplate(
         self,
         template_path,
@@ -596,52 +855,133 @@ class ImageProcPythonCommand(PythonCommand):
         ms=2000,
         crop=[],
         mask_path=None,
+        frame=None,
+        pyramid_level=0,
     ):
-        src = self.camera.readFrame()
-        src = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY) if use_gray else src
+        # TemplateMatcherが渡された場合はその設定(閾値を含む)を使う
+        if isinstance(template_path, TemplateMatcher):
+            matcher = template_path
+            threshold = matcher.threshold
+        else:
+            matcher = get_matcher(template_path, use_gray, crop, mask_path, pyramid_level)
 
-        if len(crop) == 4:
-            src = src[crop[1] : crop[3], crop[0] : crop[2]]
+        if frame is None:
+            frame = self._get_latest_frame()
+        matched, top_left, max_val = matcher.match(frame, threshold)
 
-        template = cv2.imread(
-            _get_template_filespec(template_path),
-            cv2.IMREAD_GRAYSCALE if use_gray else cv2.IMREAD_COLOR,
+        if show_value:
+            print(matcher.template_path + " ZNCC value: " + str(max_val))
+
+        # print(f"max_val: {max_val}, threshold: {threshold}")
+        self._show_match_rect(
+            matcher, top_left, matched, show_position, show_only_true_rect, ms
         )
+        return matched
 
-        # mask用画像読み込み
-        if mask_path == None:
-            mask = None
-            method = cv2.TM_CCOEFF_NORMED
+    def _show_match_rect(
+        self, matcher, top_left, matched, show_position=True, show_only_true_rect=True, ms=2000
+    ):
+        if self.gui is None or not show_position:
+            return
+        if not matched and show_only_true_rect:
+            return
+        bottom_right = (top_left[0] + matcher.width + 1, top_left[1] + matcher.height + 1)
+        tag = str(time.perf_counter()) + str(random.random())
+        # self.gui.delete("ImageRecRect")
+        self.gui.ImgRect(
+            *top_left,
+            *bottom_right,
+            outline="blue" if matched else "red",
+            tag=tag,
+            ms=ms,
+        )
+
+    def wait_any(
+        self,
+        matchers,
+        timeout=None,
+        parallel=False,
+        show_value=False,
+        show_position=True,
+        ms=2000,
+    ):
+        """
+        複数のテンプレートのいずれかが見つかるまで待機する。
+
+        新しいフレームが取得されるたびに、すべてのテンプレートを同じフレームで判定する。
+        複数見つかった場合は`matchers`の順で先にあるものを返す。
+
+        Args:
+            matchers (list[TemplateMatcher] | dict[str, TemplateMatcher]): 判定するテンプレート
+            timeout (float | None): 最大待機時間(秒)。Noneの場合は無制限
+            parallel (bool): スレッドプールで並列に判定するか
+            show_value (bool): 各テンプレートの類似度を表示するか
+            show_position (bool): 見つかった位置をプレビューに表示するか
+            ms (int): 位置を表示する時間(ミリ秒)
+
+        Returns:
+            tuple | None: (見つかったテンプレートのインデックスまたはキー, 左上座標, 類似度)。
+                タイムアウトした場合はNone
+
+        Example:
+            found = self.wait_any({"ok": ok_matcher, "error": error_matcher}, timeout=20)
+            if found is not None and found[0] == "error":
+                ...
+        """
+        if isinstance(matchers, dict):
+            items = list(matchers.items())
         else:
-            mask = cv2.imread(_get_template_filespec(mask_path), 0)
-            method = cv2.TM_CCORR_NORMED
+            items = list(enumerate(matchers))
+        for _, matcher in items:
+            matcher.compile()
 
-        w, h = template.shape[1], template.shape[0]
+        def check(frame):
+            results = match_all([matcher for _, matcher in items], frame, parallel)
+            if show_value:
+                for (_, matcher), (_, _, score) in zip(items, results):
+                    print(matcher.template_path + " ZNCC value: " + str(score))
+            for (key, matcher), (matched, top_left, score) in zip(items, results):
+                if matched:
+                    self._show_match_rect(matcher, top_left, True, show_position, ms=ms)
+                    return key, top_left, score
+            return None
+
+        return self.wait_until(check, timeout)
+
+    # 現在のスクリーンショット内でテンプレートと一致する位置を全て探します
+    # アイテムやタマゴ、アイコンの数を数える場合に、isContainTemplateを繰り返し呼ぶ代わりに使います
+    # 戻り値は矩形 (N, 4) の配列 [x1, y1, x2, y2] と類似度 (N,) の配列(類似度の高い順)です
+    def findAllTemplates(
+        self,
+        template_path,
+        threshold=0.7,
+        use_gray=True,
+        show_value=False,
+        show_position=True,
+        ms=2000,
+        crop=[],
+        mask_path=None,
+        frame=None,
+        iou_threshold=0.3,
+        max_results=None,
+    ):
+        # TemplateMatcherが渡された場合はその設定(閾値を含む)を使う
+        if isinstance(template_path, TemplateMatcher):
+            matcher = template_path
+            threshold = matcher.threshold
+        else:
+            matcher = get_matcher(template_path, use_gray, crop, mask_path)
 
-        res = cv2.matchTemplate(src, template, method, mask)
-        _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        if frame is None:
+            frame = self._get_latest_frame()
+        boxes, scores = matcher.find_all(frame, threshold, iou_threshold, max_results)
 
         if show_value:
-            print(template_path + " ZNCC value: " + str(max_val))
+            print(f"{matcher.template_path} found: {len(boxes)} ZNCC values: {scores.tolist()}")
 
-        top_left = max_loc
-        bottom_right = (top_left[0] + w + 1, top_left[1] + h + 1)
-        tag = str(time.perf_counter()) + str(random.random())
-        # print(f"max_val: {max_val}, threshold: {threshold}")
-        if max_val >= threshold:
-            if self.gui is not None and show_position:
-                # self.gui.delete("ImageRecRect")
-                self.gui.ImgRect(
-                    *top_left, *bottom_right, outline="blue", tag=tag, ms=ms
-                )
-            return True
-        else:
-            if self.gui is not None and show_position and not show_only_true_rect:
-                # self.gui.delete("ImageRecRect")
-                self.gui.ImgRect(
-                    *top_left, *bottom_right, outline="red", tag=tag, ms=ms
-                )
-            return False
+        for box in boxes:
+            self._show_match_rect(matcher, (int(box[0]), int(box[1])), True, show_position, ms=ms)
+        return boxes, scores
 
     # 現在のスクリーンショットと指定した複数の画像のテンプレートマッチングを行います
     # 相関値が最も大きい値となった画像のインデックス、各画像のテンプレートマッチングの閾値、閾値判定結果を返します。
@@ -656,20 +996,25 @@ class ImageProcPythonCommand(PythonCommand):
         show_only_true_rect=True,
         ms=2000,
         crop=[],
+        frame=None,
     ):
-        src = self.camera.readFrame()
-        src = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY) if use_gray else src
+        templates = [
+            template_store.get(
+                _get_template_filespec(template_path), "gray" if use_gray else "color"
+            )
+            for template_path in template_path_list
+        ]
+        min_size = (
+            max(template.shape[1] for template in templates),
+            max(template.shape[0] for template in templates),
+        )
 
-        if len(crop) == 4:
-            src = src[crop[1] : crop[3], crop[0] : crop[2]]
+        # トリミングしてから変換する(トリミング範囲は最大のテンプレートより小さくならないようにする)
+        src, offset = self._get_source_image(frame, use_gray, crop, min_size)
 
         max_val_list = []
         judge_threshold_list = []
-        for template_path in template_path_list:
-            template = cv2.imread(
-                _get_template_filespec(template_path),
-                cv2.IMREAD_GRAYSCALE if use_gray else cv2.IMREAD_COLOR,
-            )
+        for template_path, template in zip(template_path_list, templates):
             w, h = template.shape[1], template.shape[0]
 
             method = cv2.TM_CCOEFF_NORMED
@@ -679,7 +1024,7 @@ class ImageProcPythonCommand(PythonCommand):
             if show_value:
                 print(template_path + " ZNCC value: " + str(max_val))
 
-            top_left = max_loc
+            top_left = (max_loc[0] + offset[0], max_loc[1] + offset[1])
             bottom_right = (top_left[0] + w + 1, top_left[1] + h + 1)
             tag = str(time.perf_counter()) + str(random.random())
             max_val_list.append(max_val)
@@ -710,14 +1055,12 @@ class ImageProcPythonCommand(PythonCommand):
             show_value=False,
             not_show_false=True,
         ):
-            src = self.camera.readFrame()
-            src = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY) if use_gray else src
+            src, _ = self._get_source_image(None, use_gray)
 
             self.gsrc.upload(src)
 
-            template = cv2.imread(
-                _get_template_filespec(template_path),
-                cv2.IMREAD_GRAYSCALE if use_gray else cv2.IMREAD_COLOR,
+            template = template_store.get(
+                _get_template_filespec(template_path), "gray" if use_gray else "color"
             )
             self.gtmpl.upload(template)
 
@@ -745,18 +1088,9 @@ class ImageProcPythonCommand(PythonCommand):
 
     # Get interframe difference binarized image
     # フレーム間差分により2値化された画像を取得
+    # 画面の動きが止まるのを待つ場合はwait_until_settledを使います
     def getInterframeDiff(self, frame1, frame2, frame3, threshold):
-        diff1 = cv2.absdiff(frame1, frame2)
-        diff2 = cv2.absdiff(frame2, frame3)
-
-        diff = cv2.bitwise_and(diff1, diff2)
-
-        # binarize
-        img_th = cv2.threshold(diff, threshold, 255, cv2.THRESH_BINARY)[1]
-
-        # remove noise
-        mask = cv2.medianBlur(img_th, 3)
-        return mask
+        return _getInterframeDiff(frame1, frame2, frame3, threshold)
 
     @deprecated(reason="Use discord instead")
     def LINE_image(self, txt="", token="token"):
@@ -31,7 +31,8 @@ class AllHatching(ImageProcPythonCommand):
             print('egg hatching')
             self.holdEnd([Direction.RIGHT, Direction.R_LEFT])
             self.press(Button.A)
-            self.wait(15)
+            # 孵化の演出が始まってから、終わって画面が止まるまで待つ(最大15秒)
+            self.wait_until_settled(quiet_frames=45, timeout=15, require_motion=True)
             for i in range(0, 5):
                 self.press(Button.A, wait=1)
             self.hatched_num += 1
@@ -2,13 +2,19 @@
 # -*- coding: utf-8 -*-
 
 from Commands.Keys import Button, Direction
-from Commands.PythonCommandBase import ImageProcPythonCommand
+from Commands.PythonCommandBase import WINDOW_MARGIN, ImageProcPythonCommand, TemplateMatcher
 
 
 # auto egg hatching using image recognition
 # 自動卵孵化(キャプボあり)
 class AutoHatching(ImageProcPythonCommand):
     NAME = '自動卵孵化'
+    TEMPLATES = {
+        'egg_notice': TemplateMatcher('Samples/egg_notice.png', window_margin=WINDOW_MARGIN),
+        'egg_found': TemplateMatcher('Samples/egg_found.png'),
+        'shiny_mark': TemplateMatcher('Samples/shiny_mark.png', threshold=0.9, window_margin=WINDOW_MARGIN),
+        'status': TemplateMatcher('Samples/status.png', threshold=0.7),
+    }
 
     def __init__(self, cam):
         super().__init__(cam)
@@ -38,13 +44,13 @@ class AutoHatching(ImageProcPythonCommand):
                     self.hold([Direction.RIGHT, Direction.R_LEFT])
 
                     # turn round and round
-                    while not self.isContainTemplate('Samples/egg_notice.png'):
-                        self.wait(1)
+                    self.wait_until(lambda frame: self.isContainTemplate(self.TEMPLATES['egg_notice'], frame=frame))
 
                     print('egg hatching')
                     self.holdEnd([Direction.RIGHT, Direction.R_LEFT])
                     self.press(Button.A)
-                    self.wait(15)
+                    # 孵化の演出が始まってから、終わって画面が止まるまで待つ(最大15秒)
+                    self.wait_until_settled(quiet_frames=45, timeout=15, require_motion=True)
                     for j in range(0, 5):
                         self.press(Button.A, wait=1)
                     self.hatched_num += 1
@@ -104,7 +110,7 @@ class AutoHatching(ImageProcPythonCommand):
 
     def getNewEgg(self):
         self.press(Button.A, wait=0.5)
-        if not self.isContainTemplate('Samples/egg_found.png'):
+        if not self.isContainTemplate(self.TEMPLATES['egg_found']):
             print('egg not found')
             self.finish()  # TODO
         print('egg found')
@@ -139,11 +145,11 @@ class AutoHatching(ImageProcPythonCommand):
             for j in range(0, col):
 
                 # if shiny, then stop
-                if self.isContainTemplate('Samples/shiny_mark.png', threshold=0.9):
+                if self.isContainTemplate(self.TEMPLATES['shiny_mark']):
                     return True
 
                 # Maybe this threshold works for only Japanese version.
-                if self.isContainTemplate('Samples/status.png', threshold=0.7):
+                if self.isContainTemplate(self.TEMPLATES['status']):
                     # Release a pokemon
                     self.Release()
 
@@ -13,7 +13,8 @@ from logging import getLogger, DEBUG, NullHandler
 from icecream import ic
 
 import tkinter as tk
-import cv2
+
+from ImageProcessing import ColorRegionDetector, box_iou
 
 
 def calculate_iou(box1: list, box2: list) -> float:
@@ -54,24 +55,19 @@ def filter_overlapping_boxes(boxes: list, iou_threshold: float = 0.25) -> list:
     :param iou_threshold: 重複と見なすIoUの閾値
     :return: フィルタリング後の矩形リスト
     """
-    keep_boxes = []
+    if len(boxes) == 0:
+        return []
 
-    for i, box1 in enumerate(boxes):
-        keep = True
-        for j, box2 in enumerate(boxes):
-            if i != j:
-                iou = calculate_iou(box1, box2)
-                if iou > iou_threshold:
-                    # 面積を比較して小さい方を除去
-                    box1_area = (box1[2] - box1[0]) * (box1[3] - box1[1])
-                    box2_area = (box2[2] - box2[0]) * (box2[3] - box2[1])
-                    if box1_area < box2_area:
-                        keep = False
-                        break
-        if keep:
-            keep_boxes.append(box1)
-
-    return keep_boxes
+    # 全ての組のIoUと面積をまとめて計算する
+    array = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    iou = box_iou(array, array)
+    np.fill_diagonal(iou, 0.0)
+    area = (array[:, 2] - array[:, 0]) * (array[:, 3] - array[:, 1])
+
+    # 重なっている矩形のうち、自分より面積が大きいものがある場合は除去
+    overlapped_by_larger = (iou > iou_threshold) & (area[:, np.newaxis] < area[np.newaxis, :])
+    keep = ~overlapped_by_larger.any(axis=1)
+    return [box for box, k in zip(boxes, keep) if k]
 
 
 # 色検出のサンプル
@@ -89,6 +85,9 @@ class ColorDetectSampleCommand(ImageProcPythonCommand):
         self.error_sat: int | float = 105
         self.error_val: int | float = 128
 
+        # HSVの範囲はスライダーの変更時にだけ作り直す
+        self.detector = ColorRegionDetector(*self.hsv_range(), min_area=100)
+
     def do(self) -> None:
         self.create_slider_window()
         while self.alive:
@@ -108,8 +107,23 @@ class ColorDetectSampleCommand(ImageProcPythonCommand):
         self.error_sat = self.error_sat_slider.get()
         self.error_val = self.error_val_slider.get()
 
+        self.detector.set_range(*self.hsv_range())
         self.update_color_label()
 
+    def hsv_range(self) -> tuple[list, list]:
+        # ターゲット色と誤差からHSV範囲を計算(色相はスライダーが0〜360、OpenCVが0〜179)
+        lower_bound = [
+            max(0, self.target_hue / 2 - self.error_hue),
+            max(0, self.target_sat - self.error_sat),
+            max(0, self.target_val - self.error_val),
+        ]
+        upper_bound = [
+            min(179, self.target_hue / 2 + self.error_hue),
+            min(255, self.target_sat + self.error_sat),
+            min(255, self.target_val + self.error_val),
+        ]
+        return lower_bound, upper_bound
+
     def update_color_label(self) -> None:
         # ターゲット色と誤差に基づいてラベルの色を設定
         target_color_rgb = self.hsv_to_rgb(
@@ -254,39 +268,15 @@ class ColorDetectSampleCommand(ImageProcPythonCommand):
         mask_path: str | None = None,
     ) -> None:
         src = self.camera.readFrame()
-        if len(crop) == 4:
-            src = src[crop[1] : crop[3], crop[0] : crop[2]]
-
-        # ターゲット色と誤差からHSV範囲を計算
-        lower_bound = np.array(
-            [
-                max(0, self.target_hue / 2 - self.error_hue),
-                max(0, self.target_sat - self.error_sat),
-                max(0, self.target_val - self.error_val),
-            ]
-        )
-        upper_bound = np.array(
-            [
-                min(179, self.target_hue / 2 + self.error_hue),
-                min(255, self.target_sat + self.error_sat),
-                min(255, self.target_val + self.error_val),
-            ]
-        )
 
-        hsv = cv2.cvtColor(src, cv2.COLOR_BGR2HSV)
-        mask = cv2.inRange(hsv, lower_bound, upper_bound)
-        # res = cv2.bitwise_and(src, src, mask=mask)
+        # 範囲に入る画素の領域(面積100画素以上)をまとめて検出する
+        boxes, areas, _ = self.detector.detect(src, crop)
 
-        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        for pic, contour in enumerate(contours):
-            area = cv2.contourArea(contour)
-            if area > 100:
-                x, y, w, h = cv2.boundingRect(contour)
-                print(f"area: {area}, x: {x}, y: {y}, w: {w}, h: {h}")
-                self.gui.ImgRect(
-                    x, y, x + w, y + h, outline="green", tag=f"contour_{pic}", ms=ms
-                )
+        for pic, ((x1, y1, x2, y2), area) in enumerate(zip(boxes.tolist(), areas.tolist())):
+            print(f"area: {area}, x: {x1}, y: {y1}, w: {x2 - x1}, h: {y2 - y1}")
+            self.gui.ImgRect(
+                x1, y1, x2, y2, outline="green", tag=f"contour_{pic}", ms=ms
+            )
 
 
 def union_of_boxes(boxes: list, iou_threshold: float = 0.5) -> list:
@@ -4,14 +4,15 @@
 import os
 import csv
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 
 import cv2
 import numpy as np
 import difflib
 
 from Commands.Keys import Button, Hat
-from Commands.PythonCommandBase import ImageProcPythonCommand
+from Commands.PythonCommandBase import Adaptive, ImageProcPythonCommand, TemplateMatcher, get_matcher, transition_log
+from ScreenClassifier import ScreenClassifier
 
 from . import ExeExceptions
 from .lib_ocr.predictor import ExeCharPredictor, TEMPLATE_CODE, TEMPLATE_NUMBER_BLANK
@@ -43,6 +44,16 @@ def normalize_kana(text):
 class BaseExeTrade(ImageProcPythonCommand):
     SLEEP_TIME = 0.3
     PUSH_TIME = 0.2
+    TEMPLATES = {
+        "before_return_top": TemplateMatcher("Macro/rokkuman_exe/trade_wait_page_before_return_top.png", threshold=0.95, crop=[117, 135, 147, 156], use_gray=True),
+        "return_top_confirm": TemplateMatcher("Macro/rokkuman_exe/return_top_confirm.png", threshold=0.95, crop=[418, 247, 876, 496], use_gray=False),
+        "return_to_main_menu_button": TemplateMatcher("Macro/rokkuman_exe/return_to_main_menu_button.png", threshold=0.9, crop=[470, 520, 800, 550], use_gray=False),
+        "initial_screen": TemplateMatcher("Macro/rokkuman_exe/network_initial_screen.png", threshold=0.95, crop=[130, 125, 330, 145], use_gray=False),
+        "communication_error": TemplateMatcher("Macro/rokkuman_exe/communication_error.png", threshold=0.95, crop=[400, 220, 850, 500], use_gray=False),
+        "trade_wait_timeout": TemplateMatcher("Macro/rokkuman_exe/trade_wait_timeout.png", threshold=0.95, crop=[370, 140, 850, 570], use_gray=False),
+    }
+    # 現在の画面の判定用 (Template/Macro/rokkuman_exe/screens.yaml)
+    SCREENS = ScreenClassifier("Macro/rokkuman_exe")
 
     def __init__(self, cam):
         super().__init__(cam)
@@ -57,7 +68,15 @@ class BaseExeTrade(ImageProcPythonCommand):
         self.clip_manager = ClipManager()
         # ---------------------------------------------------
 
+    def preload_templates(self):
+        super().preload_templates()
+        self.SCREENS.compile()
+
     def sleep(self, value: float):
+        if isinstance(value, Adaptive):
+            # 遷移の観測を行うためwait()で待つ
+            self.wait(value)
+            return
         time.sleep(value)
 
     def reset_to_main_menu(self, count=10):
@@ -71,8 +90,24 @@ class BaseExeTrade(ImageProcPythonCommand):
         print("=======================================")
 
         print("メインメニューに戻ります。")
+        # 現在の画面を判定して、その画面からの戻り方に直接進む
+        state = self.SCREENS.classify(self._get_latest_frame())
+        print(f"現在の画面: {state.name} (確信度: {state.confidence:.3f}, {state.elapsed * 1000:.1f}ms)")
+        if state.name == "initial_screen":
+            print("初期画面に戻りました。", datetime.now())
+            return
+        if state.name in ("communication_error", "trade_wait_timeout", "return_top_confirm"):
+            # Aでダイアログを閉じると初期画面に戻る
+            self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)
+            if self.wait_until(
+                lambda frame: self.isContainTemplate(self.TEMPLATES["initial_screen"], frame=frame),
+                timeout=10,
+            ):
+                print("初期画面に戻りました。", datetime.now())
+                return
+
         # 交換待機のタイムアウト前に関数タイムアウトで入ってきたとき用。
-        if self.isContainTemplate("Macro/rokkuman_exe/trade_wait_page_before_return_top.png", threshold=0.95, crop=[117, 135, 147, 156], use_gray=True,):
+        if state.name == "before_return_top":
             self.press(Button.B, self.PUSH_TIME, self.SLEEP_TIME)
             self.camera.saveCapture(filename="before_return_top_confirm" + datetime.now().strftime("%Y%m%d%H%M%S%f_") + ".png",)
             self.wait_for_screen("Macro/rokkuman_exe/return_top_confirm.png", [418, 247, 876, 496], "トップに戻る確認", wait_seconds=5)
@@ -85,7 +120,7 @@ class BaseExeTrade(ImageProcPythonCommand):
         for _ in range(4):
             self.press(Hat.BTM, self.PUSH_TIME, self.SLEEP_TIME)
             # self.camera.saveCapture(filename="return_to_main_menu_button" + datetime.now().strftime("%Y%m%d%H%M%S%f_") + ".png",crop=1,crop_ax=[470, 520, 800, 550],)
-            if self.isContainTemplate("Macro/rokkuman_exe/return_to_main_menu_button.png",threshold=0.9,crop=[470, 520, 800, 550],use_gray=False,):
+            if self.isContainTemplate(self.TEMPLATES["return_to_main_menu_button"]):
                 print("メインメニューに戻るボタンを確認しました。")
                 self.press_a_and_wait_for_screen("Macro/rokkuman_exe/network_initial_screen.png",[130, 125, 330, 145],"初期画面",)
                 print("初期画面に戻りました。", datetime.now())
@@ -102,19 +137,19 @@ class BaseExeTrade(ImageProcPythonCommand):
             # 交換画面が表示されるための待機。
             time.sleep(1)
             # 初期画面へ戻して終了
-            if self.isContainTemplate("Macro/rokkuman_exe/network_initial_screen.png", threshold=0.95, crop=[130, 125, 330, 145], use_gray=False):
+            if self.isContainTemplate(self.TEMPLATES["initial_screen"]):
                 print("初期画面に戻りました。", datetime.now())
                 return
 
     # 通信エラーのチェック
     def communication_error_check(self):
-        if self.isContainTemplate("Macro/rokkuman_exe/communication_error.png",threshold=0.95,crop=[400, 220, 850, 500],use_gray=False,):
+        if self.isContainTemplate(self.TEMPLATES["communication_error"]):
             raise ExeExceptions.CommunicationError()
         else:
             pass
 
     def trade_wait_timeout_check(self):
-        if self.isContainTemplate("Macro/rokkuman_exe/trade_wait_timeout.png",threshold=0.95,crop=[370, 140, 850, 570],use_gray=False,):
+        if self.isContainTemplate(self.TEMPLATES["trade_wait_timeout"]):
             print("トレード待機タイムアウトのため、初期画面へ戻ります。")
             self.press_a_and_wait_for_screen("Macro/rokkuman_exe/network_initial_screen.png",[130, 125, 330, 145],"初期画面へ戻る",wait_seconds=10,)
             print("初期画面へ戻りました。", datetime.now())
@@ -123,38 +158,39 @@ class BaseExeTrade(ImageProcPythonCommand):
 
     # 画面の状態になるまで待機する。
     def wait_for_screen(self, path, crop, page_name, wait_seconds=60):
-        start_time = datetime.now()
-        while (datetime.now() - start_time) < timedelta(seconds=wait_seconds):
-            if self.isContainTemplate(path, threshold=0.95, crop=crop, use_gray=False):
-                return
-            else:
-                # 次の確認まで0.5秒待機
-                self.sleep(self.SLEEP_TIME)
-        else:
-            print(str(wait_seconds)+ "秒待機しましたが、"+ page_name+ "に遷移しませんでした。")
-            raise ExeExceptions.InitializationError("メインメニューに戻ります。")
+        # 新しいフレームが取得されるたびに判定する
+        if self.wait_until(
+            lambda frame: self.isContainTemplate(path, threshold=0.95, crop=crop, use_gray=False, frame=frame),
+            timeout=wait_seconds,
+        ):
+            return
+        print(str(wait_seconds)+ "秒待機しましたが、"+ page_name+ "に遷移しませんでした。")
+        raise ExeExceptions.InitializationError("メインメニューに戻ります。")
 
     def press_a_and_wait_for_screen(self, path, crop, page_name, use_gray=False, threshold=0.95, wait_seconds=20):
+        # 変化先の画面と通信エラー画面を同じフレームで判定する(呼び出しごとに同じTemplateMatcherを使う)
+        screens = {
+            "screen": get_matcher(path, use_gray=use_gray, crop=crop, threshold=threshold),
+            "error": self.TEMPLATES["communication_error"],
+        }
         for _ in range(2):
             # ボタンを押す
             self.press(Button.A, self.PUSH_TIME)
 
             # 画面の状態が変わるのを待つ
-            start_time = datetime.now()
-            while (datetime.now() - start_time) < timedelta(seconds=wait_seconds):
-                # 指定した変化先の画像と一致することを確認できたら待機を完了
-                if self.isContainTemplate(path, threshold=threshold, crop=crop, use_gray=use_gray):
-                    break
-                elif self.isContainTemplate("Macro/rokkuman_exe/communication_error.png",threshold=0.95,crop=[400, 220, 850, 500],use_gray=False,):
-                    # 通信エラーのチェック
-                    print("通信エラーのため、メインメニューに戻ります。")
-                    self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)
-                    raise ExeExceptions.InitializationError("メインメニューに戻ります。")
-                else:
-                    # デバッグ用。画面判定がズレた場合に指定場所とその場所のssを作成
-                    print(page_name + "への遷移を待機します")
-                    self.sleep(self.SLEEP_TIME)
-            else:
+            print(page_name + "への遷移を待機します")
+            start = time.perf_counter()
+            result = self.wait_any(screens, timeout=wait_seconds)
+            if result is not None and result[0] == "screen":
+                # 遷移にかかった時間を記録する(同じ名前のAdaptiveで使える)
+                transition_log.record(page_name, time.perf_counter() - start)
+            if result is not None and result[0] == "error":
+                # 通信エラーのチェック
+                print("通信エラーのため、メインメニューに戻ります。")
+                self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)
+                raise ExeExceptions.InitializationError("メインメニューに戻ります。")
+            elif result is None:
+                # デバッグ用。画面判定がズレた場合に指定場所とその場所のssを作成
                 self.camera.saveCapture(filename=path + datetime.now().strftime("%Y%m%d%H%M%S%f_")+ page_name,crop=1,crop_ax=crop,)
                 print(page_name + "に遷移できませんでした。再試行します。")
                 print("crop: ", crop)
@@ -240,15 +276,13 @@ class BaseExeTrade(ImageProcPythonCommand):
         self.press(Button.A, self.PUSH_TIME)
         print(f"画面への遷移を待機します（OCR: 「{expected_char}」検出待ち）")
         x1, y1, x2, y2 = crop_rect
-        while True:
-            frame = self.camera.readFrame()
-            if frame is not None:
-                crop = frame[y1:y2, x1:x2]
-                binary = self.preprocess(crop)
-                char, _ = self.predictor.predict(binary)
-                if char == expected_char:
-                    break
-            self.sleep(0.1)
+
+        def is_expected_char(frame):
+            binary = self.preprocess(frame.image[y1:y2, x1:x2])
+            char, _ = self.predictor.predict(binary)
+            return char == expected_char
+
+        self.wait_until(is_expected_char)
 
     def ocr_row(self, frame, r_idx):
         """
@@ -501,6 +535,6 @@ class BaseExeTrade(ImageProcPythonCommand):
             #  # 「はい」選択
             # self.press_a_and_wait_for_screen("Macro/rokkuman_exe/ress_chip_exe/trader_02_select.png", [599,123,603,152], "チップ選択画面", use_gray=True,threshold=0.5, wait_seconds=3)  # チップ選択画面の表示待ち
             self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)  # トレード確認画面待ち
-            self.sleep(2)
+            self.wait_until_settled(quiet_frames=15, timeout=2, require_motion=True)  # トレード演出が始まって終わるまで(最大2秒)
             self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)  # チップ選択画面の表示待ち
             self.sleep(0.7)
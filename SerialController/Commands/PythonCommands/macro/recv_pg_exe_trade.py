@@ -5,6 +5,7 @@ import time
 from datetime import datetime, timedelta
 import traceback
 from Commands.Keys import Button, Hat
+from Commands.PythonCommandBase import Adaptive
 
 from .base_exe_trade import BaseExeTrade
 from . import ExeExceptions
@@ -62,21 +63,22 @@ class recv_exe_trade(BaseExeTrade):
         print("ローカルトレードを選択しました。")
         self.sleep(0.1)
         # チップトレード選択
+        # 待機時間は観測した遷移の所要時間から決める(最長は従来の固定時間)
         self.press(Hat.BTM, self.PUSH_TIME, self.SLEEP_TIME)
-        self.sleep(1)
+        self.sleep(Adaptive("PG受取-チップトレードにカーソル", default=1))
         self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)
-        self.sleep(1)
+        self.sleep(Adaptive("PG受取-ナビカストレード選択", default=1))
         # self.press_a_and_wait_for_screen("Macro/rokkuman_exe/trade_setting_menu_recv_selected.png",[140, 415, 400, 440],"トレード設定画面-チップトレード選択",)
         print("ナビカストレードを選択しました。")
         # 待ち受ける
         # self.press_a_and_wait_for_screen("Macro/rokkuman_exe/trade_setting_menu_next_selected.png",[140, 570, 285, 590],"トレード設定画面-受取選択",)
         self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)
-        self.sleep(1)
+        self.sleep(Adaptive("PG受取-受取選択", default=1))
         print("受取を選択しました。")
         # nextを選択してチップ選択へ
         # self.press_a_and_wait_for_screen("Macro/rokkuman_exe/trade_chip_frame.png",[203, 134, 224, 300],"トレード設定画面-Next選択",)
         self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)
-        self.sleep(3)
+        self.sleep(Adaptive("PG受取-Next選択", default=3))
         print("nextを選択しました。")
 
         # 並べ替えをして、カーソル位置リセット
@@ -92,13 +94,13 @@ class recv_exe_trade(BaseExeTrade):
         # NoDataを選択
         # self.press_a_and_wait_for_screen("Macro/rokkuman_exe/trade_message_menu_default_selected.png",[590, 195, 900, 225],"トレードメッセージ選択",)
         self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)
-        self.sleep(1)
+        self.sleep(Adaptive("PG受取-NoData選択", default=1))
         print("NoDataを選択しました。")
 
         # メッセージ選択
         # self.press_a_and_wait_for_screen("Macro/rokkuman_exe/trade_wait_page_any.png",[1020, 142, 1155, 145],"トレード待機画面",)
         self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)
-        self.sleep(1)
+        self.sleep(Adaptive("PG受取-トレードメッセージ選択", default=1))
         print("トレードメッセージを選択しました")
         trade_wait_start_time = datetime.now()
         print("トレード待機を開始します。開始時刻:",trade_wait_start_time,"待機終了時刻:",trade_wait_start_time + timedelta(minutes=0.3),)
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import time
-from datetime import datetime, timedelta
 import traceback
 from Commands.Keys import Button, Hat
+from Commands.PythonCommandBase import TemplateMatcher
 
 from .base_exe_trade import BaseExeTrade
 from . import ExeExceptions
@@ -11,6 +11,13 @@ from . import ExeExceptions
 
 class send_exe_trade(BaseExeTrade):
     NAME = "エグゼ交換送り側"
+    TEMPLATES = {
+        **BaseExeTrade.TEMPLATES,
+        "no_partner_update_no": TemplateMatcher("Macro/rokkuman_exe/no_partner_update_no.png", threshold=0.95, crop=[410, 170, 840, 490], use_gray=False),
+        "no_partner_update_yes": TemplateMatcher("Macro/rokkuman_exe/no_partner_update_yes.png", threshold=0.95, crop=[400, 160, 850, 500], use_gray=False),
+        "trade_partner_available": TemplateMatcher("Macro/rokkuman_exe/trade_partner_available.png", threshold=0.95, crop=[830, 200, 880, 230], use_gray=False),
+    }
+    TRADE_WAIT_SECONDS = 3 * 60
 
     def __init__(self, cam):
         super().__init__(cam)
@@ -111,41 +118,42 @@ class send_exe_trade(BaseExeTrade):
 
         # メッセージ選択
         # self.press_a_and_wait_for_screen("Macro/rokkuman_exe/trade_wait_page_any.png",[1020, 142, 1155, 145],"トレード待機画面",)
-        # ここだけ相手が見つからないケースが早いので、ボタンを押して、その後の処理はwhileに任せる。
-        # 2画面待ち関数を作成した場合、そちらに任せられる。（判定関数をリストで渡せる関数的なやつ）
+        # ここだけ相手が見つからないケースが早いので、ボタンを押して、その後の処理はwait_anyに任せる。
         # ここの待ち時間を長めにしています。
         time.sleep(0.6)
         self.press(Button.A, self.PUSH_TIME, self.SLEEP_TIME)
         print("トレードメッセージを選択しました")
 
-        trade_wait_start_time = datetime.now()
+        # 相手が見つからない画面と見つかった画面を同じフレームで判定する
+        screens = {
+            "no_partner": self.TEMPLATES["no_partner_update_no"],
+            "partner_available": self.TEMPLATES["trade_partner_available"],
+        }
         # トレード相手が見つかるまで待つ（3分だけ）
-        while (datetime.now() - trade_wait_start_time) < timedelta(minutes=3):
+        deadline = time.monotonic() + self.TRADE_WAIT_SECONDS
+        while (remaining := deadline - time.monotonic()) > 0:
             print("トレード相手を探す")
+            result = self.wait_any(screens, timeout=remaining, parallel=True)
+            if result is None:
+                break
             # 相手が見つからない
             # いいえ→メニューに戻るで初期画面
-            if self.isContainTemplate("Macro/rokkuman_exe/no_partner_update_no.png",threshold=0.95,crop=[410, 170, 840, 490],use_gray=False,):
+            if result[0] == "no_partner":
                 print("相手が見つからない")
-                while not self.isContainTemplate("Macro/rokkuman_exe/no_partner_update_yes.png",threshold=0.95,crop=[400, 160, 850, 500],use_gray=False,):
+                while not self.isContainTemplate(self.TEMPLATES["no_partner_update_yes"]):
                     self.press(Hat.BTM, self.PUSH_TIME, self.SLEEP_TIME)
                 print("トレードリスト更新にカーソルを合わせました。")
                 self.press_a_and_wait_for_screen("Macro/rokkuman_exe/trade_list_update.png",[480, 340, 720, 380],"トレードリスト更新",)
                 print("トレードリスト更新開始")
                 continue  # 次のループへ
             # 相手が見つかる
-            elif self.isContainTemplate("Macro/rokkuman_exe/trade_partner_available.png",threshold=0.95,crop=[830, 200, 880, 230],use_gray=False,):
-                print("トレード相手が見つかりました")
-                self.press_a_and_wait_for_screen("Macro/rokkuman_exe/confirm_trade_partner_selection.png",[430, 320, 850, 470],"相手の返答待ち",)
-                self.press_a_and_wait_for_screen("Macro/rokkuman_exe/successful_trade.png",[550, 300, 740, 480],"トレード完了画面",)
-                # 交換完了。
-                self.press_a_and_wait_for_screen("Macro/rokkuman_exe/network_initial_screen.png",[130, 125, 330, 145],"初期画面",)
-                break
-            else:
-                print("トレード相手がいなかったので、待機します")
-                self.sleep(self.SLEEP_TIME)
-                continue
+            print("トレード相手が見つかりました")
+            self.press_a_and_wait_for_screen("Macro/rokkuman_exe/confirm_trade_partner_selection.png",[430, 320, 850, 470],"相手の返答待ち",)
+            self.press_a_and_wait_for_screen("Macro/rokkuman_exe/successful_trade.png",[550, 300, 740, 480],"トレード完了画面",)
+            # 交換完了。
+            self.press_a_and_wait_for_screen("Macro/rokkuman_exe/network_initial_screen.png",[130, 125, 330, 145],"初期画面",)
+            return
 
-        else:
-            print("タイムアウトパターンです。")
-            # self.reset_to_main_menu(10)
-            raise ExeExceptions.InitializationError("メインメニューに戻ります。")
+        print("タイムアウトパターンです。")
+        # self.reset_to_main_menu(10)
+        raise ExeExceptions.InitializationError("メインメニューに戻ります。")
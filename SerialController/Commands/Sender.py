@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-from typing import List, TYPE_CHECKING
+from typing import Hashable, List, Optional, TYPE_CHECKING
 
 import math
 import os
@@ -11,6 +11,10 @@ import platform
 import serial
 from logging import getLogger, DEBUG, NullHandler
 
+from .SerialMetrics import SerialMetrics
+from .SerialProtocol import PROTOCOL_ASCII, PROTOCOL_BINARY, negotiate
+from .SerialWriter import PRIORITY_NORMAL, SerialWriter
+
 if TYPE_CHECKING:
     import tkinter as tk
 
@@ -31,6 +35,12 @@ class Sender:
         self.R_holding = False
         self._R_holding = None
         self.is_print = if_print
+        # ボタン操作をバイナリのフレーム(SerialProtocol)で送るか。接続後にnegotiateProtocolで決める
+        self.binary_protocol = False
+        # 書き込みはすべてこのスレッドから行う(コマンドとGUIの書き込みが混ざらないように)
+        self.writer = SerialWriter(self._writeNow)
+        # 書き込みの統計(書き込みを登録したコマンドごと)
+        self.metrics = SerialMetrics()
         self.time_bef = time.perf_counter()
         self.time_aft = time.perf_counter()
         self.Buttons = ["Stick.RIGHT", "Stick.LEFT",
@@ -82,66 +92,111 @@ class Sender:
 
     def closeSerial(self):
         self._logger.debug("Closing the serial communication")
+        # 送りかけのボタン操作を送ってから閉じる
+        self.writer.flush(timeout=1.0)
         self.ser.close()
+        self.binary_protocol = False
+
+    def negotiateProtocol(self, protocol: str = PROTOCOL_ASCII) -> bool:
+        """
+        ボタン操作の送信形式を決める(openSerialの後に呼ぶ)
+
+        Args:
+            protocol (str): "ascii"(16進数の行), "auto"(ファームウェアが対応していればバイナリ),
+                "binary"(問い合わせずにバイナリ)
+
+        Returns:
+            bool: バイナリのフレームを使う場合はTrue
+        """
+        if protocol == PROTOCOL_BINARY:
+            self.binary_protocol = True
+        elif protocol == PROTOCOL_ASCII or not self.isOpened():
+            self.binary_protocol = False
+        else:
+            self.writer.flush(timeout=1.0)
+            self.binary_protocol = negotiate(self.ser)
+        self._logger.info(f"Serial protocol: {'binary' if self.binary_protocol else 'ascii'}")
+        return self.binary_protocol
 
     def isOpened(self):
         self._logger.debug("Checking if serial communication is open")
         return True if self.ser is not None and self.ser.isOpen() else False
 
-    def writeRow(self, row: str, is_show: bool = False):
+    def _writeNow(self, data: bytes, source: Optional[str] = None):
+        # SerialWriterのスレッドから呼ばれる(sourceは書き込みを登録したコマンドの集計名)
+        error = True
+        start = time.perf_counter()
         try:
-            self.time_bef = time.perf_counter()
-            if self.before is not None and self.before != 'end' and is_show:
-                output = self.before.split(' ')
-                self.show_input(output)
-
-            self.ser.write((row + '\r\n').encode('utf-8'))
-            self.time_aft = time.perf_counter()
-            self.before = row
+            self.ser.write(data)
+            error = False
         except serial.serialutil.SerialException as e:
-            # print(e)
+            # エラーはあえてprintでも出す。
+            print(e)
             self._logger.error(f"Error : {e}")
         except AttributeError as e:
             print('Using a port that is not open.')
             self._logger.error('Maybe Using a port that is not open.')
             self._logger.error(e)
+        finally:
+            self.metrics.record(source, len(data), time.perf_counter() - start, error)
+
+    def _enqueue(self, data: bytes, priority: int = PRIORITY_NORMAL, coalesce: Optional[Hashable] = None):
+        # 書き込みはSerialWriterのスレッドで行う(ここではキューに入れるだけ)
+        if self.ser is None:
+            print('Using a port that is not open.')
+            self._logger.error('Maybe Using a port that is not open.')
+            return
+        self.writer.put(data, priority, coalesce, self.metrics.source())
+
+    def serialMetrics(self) -> list:
+        """
+        書き込みの統計(SerialMetrics.snapshot)を返す。通信速度に占める割合は接続中のポートのボーレートで求める
+        """
+        return self.metrics.snapshot(getattr(self.ser, 'baudrate', None))
+
+    def writeRow(self, row: str, is_show: bool = False, priority: int = PRIORITY_NORMAL,
+                 coalesce: Optional[Hashable] = None):
+        self.time_bef = time.perf_counter()
+        if self.before is not None and self.before != 'end' and is_show:
+            output = self.before.split(' ')
+            self.show_input(output)
+
+        self._enqueue((row + '\r\n').encode('utf-8'), priority, coalesce)
+        self.time_aft = time.perf_counter()
+        self.before = row
         # self._logger.debug(f"{row}")
         # Show sending serial datas
         if self.is_show_serial.get():
             print(row)
 
     def writeList(self, values: list, is_show: bool = False):
-        try:
-            self.time_bef = time.perf_counter()
-            if self.before is not None and self.before != 'end' and is_show:
-                pass
-
-            self.ser.write(values)
-            self.time_aft = time.perf_counter()
-            self.before = values
-        except serial.serialutil.SerialException as e:
-            # print(e)
-            self._logger.error(f"Error : {e}")
-        except AttributeError as e:
-            print('Using a port that is not open.')
-            self._logger.error('Maybe Using a port that is not open.')
-            self._logger.error(e)
+        self.time_bef = time.perf_counter()
+        self._enqueue(bytes(values))
+        self.time_aft = time.perf_counter()
+        self.before = values
         # self._logger.debug(f"{values}")
         # Show sending serial datas
         if self.is_show_serial.get():
             print(values)
 
+    def writeBytes(self, data: bytes, priority: int = PRIORITY_NORMAL, coalesce: Optional[Hashable] = None):
+        """
+        エンコード済みのデータをそのまま送る
+
+        Args:
+            data (bytes): 送るデータ
+            priority (int): 優先度(SerialWriter.PRIORITY_URGENTの場合は、まだ送られていない書き込みを捨てて先に送る)
+            coalesce (Hashable | None): 指定した場合、直前の同じキーの書き込みがまだ送られていなければ置き換える
+        """
+        self.time_bef = time.perf_counter()
+        self._enqueue(data, priority, coalesce)
+        self.time_aft = time.perf_counter()
+        # Show sending serial datas
+        if self.is_show_serial.get():
+            print(data[:-2].decode('utf-8') if data.endswith(b'\r\n') else list(data))
+
     def writeRow_wo_perf_counter(self, row: str, is_show: bool = False):
-        try:
-            self.ser.write((row + '\r\n').encode('utf-8'))
-        except serial.serialutil.SerialException as e:
-            # エラーはあえてprintでも出す。
-            print(e)
-            self._logger.error(f"Error : {e}")
-        except AttributeError as e:
-            print('Using a port that is not open.')
-            self._logger.error('Maybe Using a port that is not open.')
-            self._logger.error(e)
+        self._enqueue((row + '\r\n').encode('utf-8'))
         # self._logger.debug(f"{row}")
         # Show sending serial datas
         if self.is_show_serial.get():
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+from loguru import logger
+
+from PrecisionTimer import PrecisionTimer
+from .Keys import KeyPress, SendFormat
+from .SerialWriter import PRIORITY_NORMAL, PRIORITY_URGENT
+
+if TYPE_CHECKING:
+    from Commands.Sender import Sender
+
+
+class _FrameRecorder:
+    """
+    `KeyPress`から送られる内容をシリアルに書き込まず、予定時刻と送信するバイト列として記録する。
+    """
+
+    def __init__(self, binary_protocol: bool = False):
+        self.t = 0.0
+        self.frames: list[tuple[float, bytes]] = []
+        self.binary_protocol = binary_protocol
+
+    def writeRow(self, row: str, is_show: bool = False):
+        self.frames.append((self.t, (row + "\r\n").encode("utf-8")))
+
+    def writeList(self, values: list, is_show: bool = False):
+        self.frames.append((self.t, bytes(values)))
+
+    def writeBytes(self, data: bytes, priority: int = PRIORITY_NORMAL, coalesce=None):
+        self.frames.append((self.t, data))
+
+
+class Sequence:
+    """
+    ボタン操作と待機の並び。`compile()`で送信するフレームの時刻表に変換し、専用のスレッドで送る。
+
+    `press()`を続けて呼ぶ場合と違い、各フレームの送信時刻はシーケンスの開始時刻からの経過時間で決まるため、
+    1回ごとの処理時間や待機の誤差が積み重ならない。
+
+    Example:
+        seq = Sequence().press(Button.HOME, wait=1).press(Direction.DOWN).pressRep(Direction.RIGHT, 5)
+        self.playSequence(seq)
+    """
+
+    def __init__(self):
+        self.steps: list[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def press(self, buttons, duration: float = 0.1, wait: float = 0.1) -> Sequence:
+        """`PythonCommand.press`と同じ"""
+        self.steps.append(("input", buttons))
+        self.steps.append(("wait", float(duration)))
+        self.steps.append(("inputEnd", buttons))
+        self.steps.append(("wait", float(wait)))
+        return self
+
+    def pressRep(self, buttons, repeat: int, duration: float = 0.1, interval: float = 0.1, wait: float = 0.1) -> Sequence:
+        """`PythonCommand.pressRep`と同じ"""
+        for i in range(0, repeat):
+            self.press(buttons, duration, 0 if i == repeat - 1 else interval)
+        return self.wait(wait)
+
+    def hold(self, buttons, wait: float = 0.1) -> Sequence:
+        """`PythonCommand.hold`と同じ"""
+        self.steps.append(("hold", buttons))
+        return self.wait(wait)
+
+    def holdEnd(self, buttons) -> Sequence:
+        """`PythonCommand.holdEnd`と同じ"""
+        self.steps.append(("holdEnd", buttons))
+        return self
+
+    def wait(self, wait: float) -> Sequence:
+        """何もせずに待機する"""
+        self.steps.append(("wait", float(wait)))
+        return self
+
+    def extend(self, other: Sequence) -> Sequence:
+        """別のシーケンスを後ろにつなげる"""
+        self.steps.extend(other.steps)
+        return self
+
+    def compile(self, keys: KeyPress) -> CompiledSequence:
+        """
+        `keys`の現在の状態(押しっぱなしのボタン・スティック)から始めて、送信するフレームの時刻表を作る。
+
+        送信内容は`KeyPress`と同じ処理で作るため、`press()`を続けて呼んだ場合と同じバイト列になる。
+        """
+        recorder = _FrameRecorder(keys.ser.binary_protocol)
+        sim = KeyPress(recorder)
+        sim.format = copy.deepcopy(keys.format)
+        sim.holdButton = list(keys.holdButton)
+        for kind, value in self.steps:
+            if kind == "wait":
+                recorder.t += value
+                continue
+            # KeyPressは渡されたリストに押しっぱなしのボタンを追加するため、コピーを渡す
+            buttons = list(value) if isinstance(value, list) else value
+            getattr(sim, kind)(buttons)
+
+        final_format = sim.format
+        sim.format = SendFormat()
+        sim.format.resetAllDirections()
+        release = sim.encode()
+        return CompiledSequence(recorder.frames, recorder.t, final_format, sim.holdButton, release)
+
+
+class CompiledSequence:
+    """
+    送信するフレームの時刻表(開始からの秒数, バイト列)。`Sequence.compile()`で作る。
+
+    Args:
+        frames (list[tuple[float, bytes]]): 送信するフレーム
+        duration (float): 最後の待機を含むシーケンス全体の長さ(秒)
+        final_format (SendFormat): 再生後の送信内容の状態
+        final_hold (list): 再生後に押しっぱなしのボタン
+        release (bytes): 中断したときに送る、すべてのボタンを離すフレーム
+    """
+
+    def __init__(self, frames: list[tuple[float, bytes]], duration: float, final_format: SendFormat,
+                 final_hold: list, release: bytes):
+        self.frames = frames
+        self.duration = duration
+        self.final_format = final_format
+        self.final_hold = final_hold
+        self.release = release
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def play(self, keys: KeyPress, timer: Optional[PrecisionTimer] = None) -> SequenceRun:
+        """
+        専用のスレッドで再生を始める。再生が終わると`keys`の状態を再生後の状態にする。
+
+        再生中は`keys`で別の入力を送らないこと。
+        """
+        run = SequenceRun(self, keys, timer)
+        run.start()
+        return run
+
+
+class SequenceRun:
+    """
+    再生中のシーケンス。`wait()`で終わるのを待ち、`cancel()`で中断する。
+
+    各フレームの送信時刻の誤差(実際に送信した時刻 - 予定時刻)を記録し、`stats()`で返す。
+    """
+
+    def __init__(self, sequence: CompiledSequence, keys: KeyPress, timer: Optional[PrecisionTimer] = None):
+        self.sequence = sequence
+        self.keys = keys
+        self.timer = PrecisionTimer() if timer is None else timer
+        self.errors: list[float] = []
+        self.completed = False
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _run(self) -> None:
+        ser: Sender = self.keys.ser
+        timer = self.timer
+        errors = self.errors
+        try:
+            # 校正が済んでいなければ開始時刻を決める前に行う
+            timer.spin_margin
+            start = time.perf_counter()
+            for offset, data in self.sequence.frames:
+                if not timer.sleep_until(start + offset):
+                    break
+                errors.append(time.perf_counter() - start - offset)
+                ser.writeBytes(data)
+            else:
+                # 最後の待機
+                self.completed = timer.sleep_until(start + self.sequence.duration)
+            if self.completed:
+                self.keys.format = copy.deepcopy(self.sequence.final_format)
+                self.keys.holdButton = list(self.sequence.final_hold)
+            else:
+                ser.writeBytes(self.sequence.release, priority=PRIORITY_URGENT)
+                self.keys.format = SendFormat()
+                self.keys.holdButton = []
+            logger.debug(f"Sequence {'finished' if self.completed else 'cancelled'}: {self.stats()}")
+        finally:
+            self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        再生が終わるまで待つ。
+
+        Returns:
+            bool: 再生が終わった(中断を含む)場合はTrue、`timeout`秒が過ぎた場合はFalse
+        """
+        return self._done.wait(timeout)
+
+    def cancel(self) -> None:
+        """再生を中断し、すべてのボタンを離す"""
+        self.timer.cancel()
+
+    def stats(self) -> dict:
+        """
+        送信時刻の誤差の統計を返す。
+
+        Returns:
+            dict: frames(送信したフレームの数), completed, mean_us, p50_us, p99_us, max_us
+        """
+        errors = np.array(self.errors, dtype=np.float64) * 1e6
+        result = {"frames": len(errors), "completed": self.completed}
+        if errors.size:
+            result.update({
+                "mean_us": float(errors.mean()),
+                "p50_us": float(np.percentile(errors, 50)),
+                "p99_us": float(np.percentile(errors, 99)),
+                "max_us": float(errors.max()),
+            })
+        return result
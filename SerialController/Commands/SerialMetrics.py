@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+シリアル通信の統計(書き込み回数・バイト数・ser.writeの所要時間・例外・毎秒の書き込み数)
+
+書き込みはそれを登録したコマンドごとに集計する。コマンドのスレッドで`begin`を呼ぶと、
+そのスレッドから登録した書き込みはコマンド名で、それ以外のスレッド(GUIの操作など)の書き込みは
+`MANUAL_SOURCE`で集計される。
+"""
+from __future__ import annotations
+
+import csv
+import datetime
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from loguru import logger
+
+# コマンド以外(GUI・キーボードなど)からの書き込みの集計名
+MANUAL_SOURCE = "(manual)"
+# コマンドの終了時に1行ずつ追記するファイル
+SERIAL_METRICS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "profiles", "default", "serial_metrics.csv")
+
+# ヒストグラムの精度(2のべき乗の区間ごとの分割数。相対誤差は1/SUB_BUCKETS以下)
+SUB_BUCKETS = 16
+# 記録する最大値(マイクロ秒)。これより大きい値はこの値として数える
+MAX_LATENCY_US = 1 << 26
+_SUB_BITS = SUB_BUCKETS.bit_length() - 1
+
+CSV_COLUMNS = [
+    "time", "command", "writes", "bytes", "errors", "duration_s", "writes_per_sec", "bytes_per_sec",
+    "peak_writes_per_sec", "peak_bytes_per_sec", "link_utilization",
+    "p50_us", "p90_us", "p99_us", "max_us",
+]
+
+
+class LatencyHistogram:
+    """
+    HDR Histogram形式の(対数・線形の)ヒストグラム
+
+    値(マイクロ秒の整数)を2のべき乗の区間に分け、各区間をさらに`SUB_BUCKETS`個に等分して数える。
+    記録は整数のビット演算だけで、メモリは値の範囲によらず一定。
+    """
+
+    def __init__(self):
+        self.counts = [0] * self._index(MAX_LATENCY_US) + [0]
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def _index(value: int) -> int:
+        if value < 2 * SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - _SUB_BITS - 1
+        return (shift << _SUB_BITS) + (value >> shift)
+
+    @staticmethod
+    def _upperBound(index: int) -> int:
+        # indexの区間に入る最大の値
+        if index < 2 * SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        return ((index % SUB_BUCKETS + SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, value_us: int) -> None:
+        # 書き込みのたびに呼ばれるので_indexを展開している
+        if value_us < 2 * SUB_BUCKETS:
+            self.counts[value_us] += 1
+        else:
+            if value_us > MAX_LATENCY_US:
+                value_us = MAX_LATENCY_US
+            shift = value_us.bit_length() - _SUB_BITS - 1
+            self.counts[(shift << _SUB_BITS) + (value_us >> shift)] += 1
+        if value_us > self.max:
+            self.max = value_us
+        self.total += 1
+
+    def percentile(self, q: float) -> int:
+        """
+        q(0〜100)パーセンタイルの値(マイクロ秒)。区間の上限を返す
+        """
+        if self.total == 0:
+            return 0
+        target = max(1, -(-self.total * q // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._upperBound(index), self.max)
+        return self.max
+
+    def buckets(self) -> list[tuple[int, int]]:
+        """記録がある区間の(上限(マイクロ秒), 数)"""
+        return [(self._upperBound(i), c) for i, c in enumerate(self.counts) if c]
+
+
+class CommandMetrics:
+    """1つのコマンド(または`MANUAL_SOURCE`)の書き込みの統計"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.writes = 0
+        self.bytes = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        # 1秒ごとの書き込み数・バイト数(秒が変わったときにピークを更新する)
+        self._second = 0
+        self._second_writes = 0
+        self._second_bytes = 0
+        self._peak_writes = 0
+        self._peak_bytes = 0
+
+    def record(self, nbytes: int, latency: float, error: bool, now: float) -> None:
+        self.writes += 1
+        self.bytes += nbytes
+        if error:
+            self.errors += 1
+        self.latency.record(int(latency * 1e6))
+
+        second = int(now)
+        if second != self._second:
+            self._updatePeak()
+            self._second = second
+            self._second_writes = 0
+            self._second_bytes = 0
+        self._second_writes += 1
+        self._second_bytes += nbytes
+
+    def _updatePeak(self) -> None:
+        if self._second_writes > self._peak_writes:
+            self._peak_writes = self._second_writes
+        if self._second_bytes > self._peak_bytes:
+            self._peak_bytes = self._second_bytes
+
+    @property
+    def peak_writes_per_sec(self) -> int:
+        """1秒間の書き込み数の最大値"""
+        return max(self._peak_writes, self._second_writes)
+
+    @property
+    def peak_bytes_per_sec(self) -> int:
+        """1秒間のバイト数の最大値"""
+        return max(self._peak_bytes, self._second_bytes)
+
+    def summary(self, baudrate: Optional[int] = None) -> dict:
+        """
+        統計をまとめる
+
+        Args:
+            baudrate (int | None): 指定した場合、ピークのバイト数が通信速度(1バイト10ビット)に占める割合も求める
+        """
+        end = self.finished if self.finished is not None else time.perf_counter()
+        duration = end - self.started
+        # 1秒未満の場合は1秒として毎秒の値を求める(書き込み1回で大きな値にならないように)
+        rate_duration = max(duration, 1.0)
+        peak_bytes = self.peak_bytes_per_sec
+        return {
+            "command": self.name,
+            "writes": self.writes,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "duration_s": round(duration, 3),
+            "writes_per_sec": round(self.writes / rate_duration, 2),
+            "bytes_per_sec": round(self.bytes / rate_duration, 2),
+            "peak_writes_per_sec": self.peak_writes_per_sec,
+            "peak_bytes_per_sec": peak_bytes,
+            "link_utilization": round(peak_bytes * 10 / baudrate, 3) if baudrate else None,
+            "p50_us": self.latency.percentile(50),
+            "p90_us": self.latency.percentile(90),
+            "p99_us": self.latency.percentile(99),
+            "max_us": self.latency.max,
+        }
+
+
+class SerialMetrics:
+    """
+    Senderの書き込みの統計をコマンドごとに集める
+
+    `record`はSerialWriterのスレッド、`begin`/`end`はコマンドのスレッド、`snapshot`はGUIから呼ばれる。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, CommandMetrics] = {}
+        # スレッド → 実行中のコマンド名
+        self._sources: dict[int, str] = {}
+
+    def begin(self, name: str) -> None:
+        """
+        呼び出したスレッドをコマンドとして登録し、そのコマンドの統計をリセットする
+        """
+        with self._lock:
+            self._sources[threading.get_ident()] = name
+            self._metrics[name] = CommandMetrics(name)
+
+    def end(self) -> Optional[CommandMetrics]:
+        """
+        呼び出したスレッドの登録を解除する
+
+        Returns:
+            CommandMetrics | None: そのコマンドの統計
+        """
+        with self._lock:
+            name = self._sources.pop(threading.get_ident(), None)
+            metrics = self._metrics.get(name)
+            if metrics is not None:
+                metrics.finished = time.perf_counter()
+            return metrics
+
+    def source(self) -> str:
+        """呼び出したスレッドの集計名(書き込みを登録するときに呼ぶ)"""
+        return self._sources.get(threading.get_ident(), MANUAL_SOURCE)
+
+    def record(self, source: Optional[str], nbytes: int, latency: float, error: bool = False) -> None:
+        """
+        1回の書き込みを記録する
+
+        Args:
+            source (str | None): 集計名(`source()`の値)
+            nbytes (int): 書き込んだバイト数
+            latency (float): ser.writeの所要時間(秒)
+            error (bool): 例外が起きたか
+        """
+        now = time.perf_counter()
+        name = source or MANUAL_SOURCE
+        with self._lock:
+            metrics = self._metrics.get(name)
+            if metrics is None:
+                metrics = self._metrics[name] = CommandMetrics(name)
+            metrics.record(nbytes, latency, error, now)
+
+    def snapshot(self, baudrate: Optional[int] = None) -> list[dict]:
+        """すべての集計名の統計"""
+        with self._lock:
+            return [m.summary(baudrate) for m in self._metrics.values()]
+
+    def histograms(self) -> dict[str, list[tuple[int, int]]]:
+        """集計名ごとのser.writeの所要時間のヒストグラム(区間の上限(マイクロ秒), 数)"""
+        with self._lock:
+            return {name: m.latency.buckets() for name, m in self._metrics.items()}
+
+    def reset(self) -> None:
+        """統計を消す(実行中のコマンドの登録は残す)"""
+        with self._lock:
+            self._metrics.clear()
+
+    def dump(self, path: str, baudrate: Optional[int] = None) -> bool:
+        """
+        すべての統計をファイルに保存する。拡張子が.jsonの場合はヒストグラムも含めたJSON、それ以外はCSV
+
+        Returns:
+            bool: 保存できた場合はTrue
+        """
+        rows = self.snapshot(baudrate)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            if path.endswith(".json"):
+                histograms = self.histograms()
+                for row in rows:
+                    row["histogram_us"] = histograms.get(row["command"], [])
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(rows, f, ensure_ascii=False, indent=1)
+            else:
+                with open(path, "w", encoding="utf-8", newline="") as f:
+                    writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+                    writer.writeheader()
+                    now = datetime.datetime.now().isoformat(timespec="seconds")
+                    writer.writerows({"time": now, **row} for row in rows)
+        except OSError as e:
+            logger.warning(f"Serial metrics cannot be saved: {path} ({e})")
+            return False
+        logger.debug(f"Serial metrics saved: {path}")
+        return True
+
+
+def appendSummary(summary: dict, path: str = SERIAL_METRICS_PATH) -> bool:
+    """
+    コマンド1回分の統計をCSVに1行追記する(コマンドの終了時に呼ぶ)
+
+    Returns:
+        bool: 保存できた場合はTrue
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        is_new = not os.path.exists(path)
+        with open(path, "a", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+            if is_new:
+                writer.writeheader()
+            writer.writerow({"time": datetime.datetime.now().isoformat(timespec="seconds"), **summary})
+    except OSError as e:
+        logger.warning(f"Serial metrics cannot be saved: {path} ({e})")
+        return False
+    return True
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arduino向けのバイナリのフレーム(ASCIIの16進数の行と併用する)
+
+ASCIIの行(`0x0008 8 80 80\\r\\n`, 最大25バイト程度)の代わりに、固定長9バイトのフレームで送る。
+
+    [0] HEADER (0xA5)
+    [1] ボタン 下位8ビット
+    [2] ボタン 上位8ビット
+    [3] ハット
+    [4] LX  [5] LY  [6] RX  [7] RY
+    [8] チェックサム([1]〜[7]の和の下位8ビット)
+
+ヘッダはASCIIの行に現れない値なので、ファームウェアは先頭のバイトでどちらかを判別できる。
+`end`やdirect_serialなどのASCIIの行はバイナリのモードでもそのまま送る。
+
+接続時に`NEGOTIATE_REQUEST`を送り、`NEGOTIATE_TIMEOUT`秒以内に`NEGOTIATE_ACK`の行が返ってきた場合だけ
+バイナリのフレームを使う(対応していないファームウェアではASCIIの行のまま)。
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from loguru import logger
+
+HEADER = 0xA5
+FRAME_LENGTH = 9
+NEGOTIATE_REQUEST = b"proto binary\r\n"
+NEGOTIATE_ACK = b"proto binary ok"
+NEGOTIATE_TIMEOUT = 0.3
+
+# 設定(serial_protocol)の値
+PROTOCOL_ASCII = "ascii"
+PROTOCOL_AUTO = "auto"
+PROTOCOL_BINARY = "binary"
+
+
+def encodeFrame(btn: int, hat: int, lx: int, ly: int, rx: int, ry: int) -> bytes:
+    """状態をバイナリのフレームにエンコードする"""
+    payload = [btn & 0xFF, (btn >> 8) & 0xFF, hat & 0xFF, lx & 0xFF, ly & 0xFF, rx & 0xFF, ry & 0xFF]
+    return bytes([HEADER, *payload, sum(payload) & 0xFF])
+
+
+def decodeFrame(data: bytes) -> tuple[int, int, int, int, int, int]:
+    """
+    バイナリのフレームをデコードする(ファームウェアの受信処理と同じ手順)
+
+    Returns:
+        tuple: (btn, hat, lx, ly, rx, ry)
+
+    Raises:
+        ValueError: 長さ・ヘッダ・チェックサムが正しくない場合
+    """
+    if len(data) != FRAME_LENGTH:
+        raise ValueError(f"Invalid frame length: {len(data)}")
+    if data[0] != HEADER:
+        raise ValueError(f"Invalid frame header: {data[0]:#04x}")
+    if sum(data[1:8]) & 0xFF != data[8]:
+        raise ValueError("Frame checksum mismatch")
+    return data[1] | data[2] << 8, data[3], data[4], data[5], data[6], data[7]
+
+
+def negotiate(ser: Any, timeout: float = NEGOTIATE_TIMEOUT) -> bool:
+    """
+    ファームウェアがバイナリのフレームに対応しているか問い合わせる
+
+    Args:
+        ser (serial.Serial): 開いているシリアルポート
+        timeout (float): 応答を待つ時間(秒)
+
+    Returns:
+        bool: 対応している場合はTrue
+    """
+    previous_timeout = ser.timeout
+    try:
+        ser.reset_input_buffer()
+        ser.timeout = timeout
+        ser.write(NEGOTIATE_REQUEST)
+        reply = ser.read_until(b"\n")
+    except Exception as e:
+        logger.warning(f"Serial protocol negotiation failed: {e}")
+        return False
+    finally:
+        ser.timeout = previous_timeout
+    return reply.strip() == NEGOTIATE_ACK
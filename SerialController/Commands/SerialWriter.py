@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+from loguru import logger
+
+# 優先度(小さいほど先に送る)
+PRIORITY_URGENT = 0
+PRIORITY_NORMAL = 1
+# 遅延の統計に使う直近の書き込みの数
+LATENCY_HISTORY = 1000
+
+
+class SerialWriter:
+    """
+    シリアルへの書き込みを1つのスレッドにまとめる。
+
+    書き込みは優先度・登録順のキューに入れてすぐに戻り、専用のスレッドが順に`write`を呼ぶ。
+    コマンドのスレッドとGUI(マウスでのスティック操作など)の書き込みが1行の途中で混ざらず、
+    コマンドのスレッドはシリアルの書き込みを待たない。
+
+    - `coalesce`を指定した書き込みは、直前に登録した書き込みが同じ`coalesce`でまだ送られていなければ、
+      それを置き換える(スティックを動かし続けるときに、送られる前に古くなった位置を送らない)
+    - `PRIORITY_URGENT`の書き込み(`end`や中断時にボタンを離すフレーム)は、まだ送られていない
+      通常の書き込みを捨てて最初に送る
+
+    登録から書き込み完了までの時間を記録し、`stats()`で返す。
+
+    Args:
+        write (Callable[[bytes, Any], None]): 実際にシリアルに書き込む関数(専用のスレッドから、
+            データと`put`の`tag`を渡して呼ばれる)
+    """
+
+    def __init__(self, write: Callable[[bytes, Any], None]):
+        self._write = write
+        # [優先度, 登録順, 登録時刻, データ, tag] のヒープ。送信を始めたらデータをNoneにする
+        self._queue: list[list] = []
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._tail: Optional[tuple[Hashable, list]] = None
+        self._busy = False
+        self._thread: Optional[threading.Thread] = None
+        self._latencies: deque[float] = deque(maxlen=LATENCY_HISTORY)
+        self.count = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def put(self, data: bytes, priority: int = PRIORITY_NORMAL, coalesce: Optional[Hashable] = None,
+            tag: Any = None) -> None:
+        """
+        書き込みを登録する
+
+        Args:
+            data (bytes): 書き込むデータ
+            priority (int): 優先度(PRIORITY_URGENT, PRIORITY_NORMAL)
+            coalesce (Hashable | None): 置き換えてよい書き込みを表すキー
+            tag (Any): `write`にそのまま渡す値(書き込みを登録したコマンドなど)
+        """
+        now = time.perf_counter()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="SerialWriter", daemon=True)
+                self._thread.start()
+
+            tail = self._tail
+            if coalesce is not None and tail is not None and tail[0] == coalesce and tail[1][3] is not None:
+                tail[1][2] = now
+                tail[1][3] = data
+                tail[1][4] = tag
+                self.coalesced += 1
+                return
+
+            if priority == PRIORITY_URGENT and self._queue:
+                kept = []
+                for entry in self._queue:
+                    if entry[0] <= priority:
+                        kept.append(entry)
+                    else:
+                        entry[3] = None
+                        self.dropped += 1
+                heapq.heapify(kept)
+                self._queue = kept
+
+            entry = [priority, self._seq, now, data, tag]
+            self._seq += 1
+            heapq.heappush(self._queue, entry)
+            self._tail = (coalesce, entry) if coalesce is not None and priority == PRIORITY_NORMAL else None
+            self._cond.notify()
+
+    def _run(self) -> None:
+        cond = self._cond
+        while True:
+            with cond:
+                while not self._queue:
+                    self._busy = False
+                    cond.notify_all()
+                    cond.wait()
+                queue = self._queue
+                entry = heapq.heappop(queue)
+                enqueued, data, tag = entry[2], entry[3], entry[4]
+                entry[3] = None
+                self._busy = True
+            try:
+                self._write(data, tag)
+            except Exception as e:
+                logger.error(f"Serial write failed: {e}")
+            self._latencies.append(time.perf_counter() - enqueued)
+            self.count += 1
+
+    @property
+    def pending(self) -> int:
+        """まだ送られていない書き込みの数"""
+        return len(self._queue)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        登録済みの書き込みがすべて終わるまで待つ
+
+        Returns:
+            bool: すべて終わった場合はTrue、`timeout`秒が過ぎた場合はFalse
+        """
+        with self._cond:
+            if self._thread is None:
+                return True
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def stats(self) -> dict:
+        """
+        書き込みの統計を返す。
+
+        Returns:
+            dict: count(書き込んだ数), coalesced(置き換えた数), dropped(捨てた数), pending,
+                p50_us, p99_us, max_us(直近`LATENCY_HISTORY`回の登録から書き込み完了までの時間、マイクロ秒)
+        """
+        latencies = np.array(self._latencies, dtype=np.float64) * 1e6
+        result = {"count": self.count, "coalesced": self.coalesced, "dropped": self.dropped, "pending": self.pending}
+        if latencies.size:
+            result.update({
+                "p50_us": float(np.percentile(latencies, 50)),
+                "p99_us": float(np.percentile(latencies, 99)),
+                "max_us": float(latencies.max()),
+            })
+        return result
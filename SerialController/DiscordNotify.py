@@ -1,6 +1,5 @@
 import os
 from tkinter import messagebox, simpledialog
-import cv2
 import io
 
 from deprecated import deprecated
@@ -51,8 +50,7 @@ class Discord_Notify:
         Returns:
             bytes: 画像データ（PNG形式）
         """
-        image_bgr = self.camera.readFrame()
-        image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+        image_rgb = self.camera.latest_frame().rgb()
         image = Image.fromarray(image_rgb)
         png = io.BytesIO()
         image.save(
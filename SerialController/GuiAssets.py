@@ -265,7 +265,10 @@ class CaptureArea(tk.Canvas):
         )
 
     def mouseCtrlLeftPress(self, event):
-        _img = cv2.cvtColor(self.camera.readFrame(), cv2.COLOR_BGR2RGB)
+        frame = self.camera.latest_frame()
+        if frame is None:
+            return
+        _img = frame.rgb()
         if self.master.is_use_left_stick_mouse.get():
             self.UnbindLeftClick()
         x, y = event.x, event.y
@@ -281,7 +284,7 @@ class CaptureArea(tk.Canvas):
             f"G: {_img[int(y * ratio_y), int(x * ratio_x)][1]}, "
             f"B: {_img[int(y * ratio_y), int(x * ratio_x)][2]}]"
         )
-        hsv = cv2.cvtColor(_img, cv2.COLOR_RGB2HSV)
+        hsv = frame.hsv()
         h = hsv[int(y * ratio_y), int(x * ratio_x)][0]
         s = hsv[int(y * ratio_y), int(x * ratio_x)][1]
         v = hsv[int(y * ratio_y), int(x * ratio_x)][2]
@@ -358,6 +361,7 @@ class CaptureArea(tk.Canvas):
                     f"{hex(int(128 - mag * 127.5 * np.sin(np.deg2rad(langle))))} "
                     f"80 80",
                     is_show=False,
+                    coalesce="mouse_left_stick",
                 )
                 self.dq.append([langle, mag, _time - self.calc_time])
                 self.calc_time = _time
@@ -368,6 +372,7 @@ class CaptureArea(tk.Canvas):
                 f"{hex(int(128 - mag * 127.5 * np.sin(np.deg2rad(langle))))}"
                 f" 80 80",
                 is_show=False,
+                coalesce="mouse_left_stick",
             )
 
         if mag >= 1:
@@ -469,6 +474,7 @@ class CaptureArea(tk.Canvas):
                     f"{hex(int(128 + mag * 127.5 * np.cos(np.deg2rad(rangle))))} "
                     f"{hex(int(128 - mag * 127.5 * np.sin(np.deg2rad(rangle))))}",
                     is_show=False,
+                    coalesce="mouse_right_stick",
                 )
                 self.dq.append([rangle, mag, _time - self.calc_time])
                 self.calc_time = _time
@@ -478,6 +484,7 @@ class CaptureArea(tk.Canvas):
                 f"{hex(int(128 + mag * 127.5 * np.cos(np.deg2rad(rangle))))} "
                 f"{hex(int(128 - mag * 127.5 * np.sin(np.deg2rad(rangle))))}",
                 is_show=False,
+                coalesce="mouse_right_stick",
             )
         if mag >= 1:
             center_x = (self.radius + self.radius // 11) * np.cos(np.deg2rad(rangle))
@@ -523,13 +530,14 @@ class CaptureArea(tk.Canvas):
 
     def capture(self):
         if self.is_show_var.get():
-            image_bgr = self.camera.readFrame()
+            frame = self.camera.latest_frame()
         else:
             self.after(self.next_frames, self.capture)
             return
 
-        if image_bgr is not None:
-            image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+        if frame is not None:
+            # 表示サイズ以上の範囲で最も小さい縮小画像を使う(RGB変換はフレームごとに共有される)
+            image_rgb = frame.rgb(self._preview_level(frame.image.shape))
             image_pil = Image.fromarray(image_rgb).resize(self.show_size)
             image_tk = ImageTk.PhotoImage(image_pil)
 
@@ -543,6 +551,14 @@ class CaptureArea(tk.Canvas):
 
         self.after(self.next_frames, self.capture)
 
+    def _preview_level(self, shape):
+        level = 0
+        while (shape[1] >> (level + 1)) >= self.show_size[0] and (
+            shape[0] >> (level + 1)
+        ) >= self.show_size[1]:
+            level += 1
+        return level
+
     def saveCapture(self):
         self.camera.saveCapture()
 
@@ -22,6 +22,31 @@ def crop_image(image: numpy.ndarray, crop: List[int] = None) -> numpy.ndarray:
     return cropped_image
 
 
+def expand_crop(crop: List[int], min_size: Tuple[int, int], image_size: Tuple[int, int]) -> List[int]:
+    '''
+    トリミング範囲をテンプレート画像のサイズ以上になるよう広げる
+    crop: [x軸始点, y軸始点, x軸終点, y軸終点]
+    min_size: (幅, 高さ) 最低限必要なサイズ
+    image_size: (幅, 高さ) 元画像のサイズ
+    範囲は中心を保ったまま広げ、画像の端で止める
+    '''
+    x0, y0, x1, y1 = crop
+    for axis, (lo, hi) in enumerate(((x0, x1), (y0, y1))):
+        need = min(min_size[axis], image_size[axis]) - (hi - lo)
+        if need > 0:
+            lo -= need // 2
+            hi += need - need // 2
+            if lo < 0:
+                lo, hi = 0, hi - lo
+            if hi > image_size[axis]:
+                lo, hi = lo - (hi - image_size[axis]), image_size[axis]
+        if axis == 0:
+            x0, x1 = lo, hi
+        else:
+            y0, y1 = lo, hi
+    return [x0, y0, x1, y1]
+
+
 def crop_image_extend(image: numpy.ndarray, crop_fmt: int | str = None, crop: List[int] = None) -> numpy.ndarray:
     '''
     画像をトリミングする
@@ -97,11 +122,17 @@ def getImage(path: str, mode: str = "color"):
         return cv2.imread(path, cv2.IMREAD_COLOR)
 
 
-def doPreprocessImage(image: numpy.ndarray, use_gray: bool = True, crop: List[int] = None, BGR_range: Optional[dict] = None, threshold_binary: Optional[int] = None) -> Tuple[numpy.ndarray, int, int]:
+def doPreprocessImage(image: numpy.ndarray, use_gray: bool = True, crop: List[int] = None, BGR_range: Optional[dict] = None, threshold_binary: Optional[int] = None,
+                      min_size: Optional[Tuple[int, int]] = None) -> Tuple[numpy.ndarray, int, int]:
     '''
     画像をトリミングしてグレースケール化/2値化する
+    トリミングを先に行い、色変換・2値化はトリミング後の範囲だけに対して行う
+    min_size(幅, 高さ)を指定した場合、トリミング範囲がそれより小さければ広げる(テンプレートマッチングの対象画像用)
     2値化関連のContributor: mikan kochan 空太 (敬称略)
     '''
+    if min_size is not None and crop is not None and len(crop) == 4:
+        x0, y0, x1, y1 = expand_crop([crop[2], crop[0], crop[3], crop[1]], min_size, (image.shape[1], image.shape[0]))
+        crop = [y0, y1, x0, x1]
     src = crop_image(image, crop=crop)     # トリミング
 
     if use_gray:
@@ -117,6 +148,399 @@ def doPreprocessImage(image: numpy.ndarray, use_gray: bool = True, crop: List[in
     return src, width, height
 
 
+def _prepare_template(template_image: numpy.ndarray | str, use_gray: bool = True, crop: List[int] = None, BGR_range: Optional[dict] = None,
+                      threshold_binary: Optional[int] = None) -> Tuple[numpy.ndarray, int, int]:
+    '''
+    テンプレート画像を加工する
+    パス(str)が渡された場合は、読み込み・加工済みの画像をTemplateStoreから取得する
+    '''
+    if isinstance(template_image, str):
+        from TemplateStore import template_store
+        template = template_store.get(template_image, mode="gray" if use_gray else "color", crop_template=crop,
+                                      threshold_binary=threshold_binary, BGR_range=None if use_gray else BGR_range)
+        return template, template.shape[1], template.shape[0]
+    return doPreprocessImage(template_image, use_gray=use_gray, crop=crop, BGR_range=BGR_range, threshold_binary=threshold_binary)
+
+
+def _prepare_mask(mask_image: numpy.ndarray | str | None) -> Optional[numpy.ndarray]:
+    '''
+    マスク画像を取得する(パスが渡された場合はTemplateStoreから取得する)
+    '''
+    if isinstance(mask_image, str):
+        from TemplateStore import template_store
+        return template_store.get(mask_image, mode="mask")
+    return mask_image
+
+
+# ピラミッド探索で縮小後のテンプレート画像に必要な最小サイズ(これより小さくなる段階は使わない)
+PYRAMID_MIN_TEMPLATE_SIZE = 8
+
+
+def pyramid_level_for(template_size: Tuple[int, int], level: int) -> int:
+    '''
+    テンプレート画像のサイズ(幅, 高さ)で使える縮小段階を返す(縮小後のテンプレートが小さくなりすぎない段階まで下げる)
+    '''
+    while level > 0 and min(template_size) >> level < PYRAMID_MIN_TEMPLATE_SIZE:
+        level -= 1
+    return level
+
+
+def pyramid_match(image: numpy.ndarray, template_image: numpy.ndarray, method: int, mask_image: numpy.ndarray = None, level: int = 2,
+                  top_k: int = 3, image_small: numpy.ndarray = None, template_small: numpy.ndarray = None,
+                  mask_small: numpy.ndarray = None) -> Tuple[float, tuple]:
+    '''
+    縮小画像で候補位置を探し、元の解像度では候補の周辺だけを照合するテンプレートマッチング(粗密探索)
+    level: 縮小段階(1で1/2、2で1/4)。テンプレート画像が小さい場合は自動的に下げる(0なら全探索)
+    top_k: 元の解像度で照合する候補数
+    image_small, template_small, mask_small: 縮小済みの画像があれば渡す(なければここで縮小する)
+    戻り値は全探索(cv2.matchTemplate + cv2.minMaxLoc)と同じ(類似度, 左上座標)
+    '''
+    h, w = template_image.shape[:2]
+    level = pyramid_level_for((w, h), level)
+    if level == 0 or image.shape[0] < h or image.shape[1] < w:
+        res = cv2.matchTemplate(image, template_image, method, mask=mask_image)
+        _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        return max_val, max_loc
+
+    scale = 1 << level
+    if image_small is None:
+        image_small = cv2.resize(image, (image.shape[1] // scale, image.shape[0] // scale), interpolation=cv2.INTER_AREA)
+    if template_small is None:
+        template_small = cv2.resize(template_image, (w // scale, h // scale), interpolation=cv2.INTER_AREA)
+    if mask_image is not None and mask_small is None:
+        mask_small = cv2.resize(mask_image, (w // scale, h // scale), interpolation=cv2.INTER_NEAREST)
+    if image_small.shape[0] < template_small.shape[0] or image_small.shape[1] < template_small.shape[1]:
+        res = cv2.matchTemplate(image, template_image, method, mask=mask_image)
+        _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        return max_val, max_loc
+
+    # 縮小画像で上位の候補を探す(見つけた候補の周辺は次の候補から除外する)
+    res = cv2.matchTemplate(image_small, template_small, method, mask=mask_small)
+    numpy.nan_to_num(res, copy=False, nan=-1.0, posinf=-1.0, neginf=-1.0)
+    suppress_x = max(1, template_small.shape[1] // 2)
+    suppress_y = max(1, template_small.shape[0] // 2)
+    candidates = []
+    for _ in range(top_k):
+        _, val, _, (x, y) = cv2.minMaxLoc(res)
+        if candidates and val <= -1.0:
+            break
+        candidates.append((x, y))
+        res[max(0, y - suppress_y):y + suppress_y + 1, max(0, x - suppress_x):x + suppress_x + 1] = -1.0
+
+    # 元の解像度で候補の周辺だけを照合する(縮小による位置のずれを吸収するため2段階分の余白をとる)
+    margin = scale * 2
+    best_val, best_loc = -numpy.inf, (0, 0)
+    for x, y in candidates:
+        x0 = max(0, x * scale - margin)
+        y0 = max(0, y * scale - margin)
+        x1 = min(image.shape[1], x * scale + margin + w)
+        y1 = min(image.shape[0], y * scale + margin + h)
+        res = cv2.matchTemplate(image[y0:y1, x0:x1], template_image, method, mask=mask_image)
+        _, val, _, (lx, ly) = cv2.minMaxLoc(res)
+        if val > best_val:
+            best_val, best_loc = val, (x0 + lx, y0 + ly)
+    return best_val, best_loc
+
+
+# 8ビットごとの立っているビット数(numpy.bitwise_countがない場合に使う)
+_POPCOUNT_TABLE = numpy.array([bin(i).count("1") for i in range(256)], dtype=numpy.uint8)
+# binary_matchで一度に比較するワード数の目安(作業用配列の大きさを抑える)
+_BINARY_MATCH_CHUNK = 1 << 20
+# binary_match(engine="auto")でビット演算を使う条件
+# 探索範囲がテンプレートと同じ大きさの場合、またはテンプレートの画素数がこれ以上で、
+# 比較するワード数(位置の数×行数×1行のワード数)がこれ以下の場合
+BINARY_MATCH_MIN_PIXELS = 8192
+BINARY_MATCH_MAX_WORDS = 400000
+
+
+def _popcount_sum(words: numpy.ndarray) -> numpy.ndarray:
+    '''
+    uint64配列の最後の軸について、立っているビット数の合計を返す
+    '''
+    if hasattr(numpy, "bitwise_count"):
+        return numpy.bitwise_count(words).sum(axis=-1, dtype=numpy.int32)
+    counts = _POPCOUNT_TABLE[words.view(numpy.uint8)]
+    return counts.sum(axis=-1, dtype=numpy.int32)
+
+
+def _pack_rows(image: numpy.ndarray, extra_words: int = 0) -> numpy.ndarray:
+    '''
+    2値画像の各行を左の画素が上位ビットになるようにuint64へ詰める (高さ, ワード数 + extra_words)
+    '''
+    packed = numpy.packbits(image > 0, axis=1)
+    n_words = -(-packed.shape[1] // 8) + extra_words
+    buf = numpy.zeros((packed.shape[0], n_words * 8), dtype=numpy.uint8)
+    buf[:, :packed.shape[1]] = packed
+    return buf.view(">u8").astype(numpy.uint64)
+
+
+def pack_binary_template(template_image: numpy.ndarray, mask_image: numpy.ndarray = None) -> Tuple[numpy.ndarray, Optional[numpy.ndarray], int]:
+    '''
+    2値画像のテンプレートを行ごとにビットに詰める(binary_match用)
+    戻り値は(テンプレート (高さ, ワード数), マスク (高さ, ワード数), 比較する画素数)
+    マスクを指定しない場合もテンプレートの幅を超えるビットを除くマスクを返す
+    '''
+    h, w = template_image.shape[:2]
+    mask = numpy.ones((h, w), dtype=bool) if mask_image is None else mask_image > 0
+    mask_bits = _pack_rows(mask)
+    return _pack_rows(template_image) & mask_bits, mask_bits, int(mask.sum())
+
+
+def binary_match_map(image: numpy.ndarray, template_image: numpy.ndarray, mask_image: numpy.ndarray = None) -> numpy.ndarray:
+    '''
+    2値画像(0/255)どうしの全ての位置の類似度(一致した画素の割合)をcv2.matchTemplate(TM_SQDIFF)で求める
+    (0/255の画像では二乗誤差/255^2が不一致画素数になる)
+    '''
+    h, w = template_image.shape[:2]
+    if mask_image is None:
+        n_pixels = h * w
+        res = cv2.matchTemplate(image, template_image, cv2.TM_SQDIFF)
+    else:
+        n_pixels = int(numpy.count_nonzero(mask_image))
+        res = cv2.matchTemplate(image, template_image, cv2.TM_SQDIFF, mask=mask_image)
+    return 1.0 - numpy.round(res.astype(numpy.float64) / (255 * 255)) / max(1, n_pixels)
+
+
+def binary_match(image: numpy.ndarray, template_image: numpy.ndarray, mask_image: numpy.ndarray = None,
+                 packed_template: Tuple[numpy.ndarray, Optional[numpy.ndarray], int] = None,
+                 engine: str = "auto") -> Tuple[float, tuple]:
+    '''
+    2値画像(0/255)どうしのテンプレートマッチング
+    類似度は一致した画素の割合(0.0〜1.0)で、cv2.matchTemplate + cv2.minMaxLocと同じ(類似度, 左上座標)を返す
+    (同じ類似度の位置が複数ある場合はy, xの順で最初の位置)
+    packed_template: pack_binary_templateの結果(テンプレートを繰り返し使う場合に渡す)
+    engine: 不一致画素数の求め方
+        "bits": 画素を64ビット単位に詰め、XORとビット数の数え上げで求める
+                比較する位置の数×テンプレートの画素数/64 に比例して時間がかかる
+        "sqdiff": cv2.matchTemplate(TM_SQDIFF)で求める(binary_match_map)
+                  探索範囲がテンプレートより十分広い場合はこちらが速い
+        "auto": 探索範囲がテンプレートと同じ大きさの場合や、大きいテンプレートを狭い範囲で探す場合は"bits"、
+                それ以外は"sqdiff"
+    どちらの方法でも結果は同じ
+    '''
+    h, w = template_image.shape[:2]
+    ny, nx = image.shape[0] - h + 1, image.shape[1] - w + 1
+    if engine == "auto":
+        n_words = -(-w // 64)
+        use_bits = ny * nx == 1 or (
+            h * w >= BINARY_MATCH_MIN_PIXELS and ny * nx * h * n_words <= BINARY_MATCH_MAX_WORDS
+        )
+        engine = "bits" if use_bits else "sqdiff"
+    if engine == "sqdiff":
+        _, max_val, _, max_loc = cv2.minMaxLoc(binary_match_map(image, template_image, mask_image))
+        return max_val, max_loc
+
+    if packed_template is None:
+        packed_template = pack_binary_template(template_image, mask_image)
+    template_bits, mask_bits, n_pixels = packed_template
+    n_words = template_bits.shape[1]
+
+    if ny == 1 and nx == 1:
+        # 探索範囲がテンプレートと同じ大きさの場合はそのまま比較する
+        diff = (_pack_rows(image[:h, :w]) & mask_bits) ^ template_bits
+        return 1.0 - float(_popcount_sum(diff.reshape(-1))) / max(1, n_pixels), (0, 0)
+
+    # 各x位置から始まる幅wの画素列をワード単位で作る: 左端が x = 64q + r の位置のk番目のワードは
+    # 行のワード列の q+k 番目を r ビット左にずらし、q+k+1 番目の上位 r ビットを足したもの
+    source = _pack_rows(image, extra_words=1)
+    x = numpy.arange(nx)
+    q, r = x >> 6, (x & 63).astype(numpy.uint64)
+    windows = numpy.empty((n_words, image.shape[0], nx), dtype=numpy.uint64)
+    for k in range(n_words):
+        hi = source[:, q + k]
+        lo = source[:, q + k + 1]
+        # 64ビットのシフトは未定義のため、右シフトは2回に分ける
+        windows[k] = (hi << r) | ((lo >> numpy.uint64(1)) >> (numpy.uint64(63) - r))
+
+    # テンプレートの行方向をまとめて比較する(作業用配列が大きくなりすぎないようy方向に分割する)
+    mismatch = numpy.zeros((ny, nx), dtype=numpy.int32)
+    step = max(1, _BINARY_MATCH_CHUNK // max(1, nx * h))
+    for k in range(n_words):
+        rows = numpy.lib.stride_tricks.sliding_window_view(windows[k], h, axis=0)  # (ny, nx, h)
+        for y0 in range(0, ny, step):
+            diff = (rows[y0:y0 + step] & mask_bits[:, k]) ^ template_bits[:, k]
+            mismatch[y0:y0 + step] += _popcount_sum(diff)
+
+    y, x = numpy.unravel_index(numpy.argmin(mismatch), mismatch.shape)
+    return 1.0 - float(mismatch[y, x]) / max(1, n_pixels), (int(x), int(y))
+
+
+def color_signature(image: numpy.ndarray) -> numpy.ndarray:
+    '''
+    画像の色の特徴(チャンネルごとの平均と標準偏差)を返す (2, チャンネル数)
+    '''
+    mean, std = cv2.meanStdDev(image)
+    return numpy.stack([mean.ravel(), std.ravel()])
+
+
+def min_signature_distance(image: numpy.ndarray, size: Tuple[int, int], signature: numpy.ndarray) -> Tuple[float, tuple]:
+    '''
+    image内の大きさsize(幅, 高さ)の全ての位置について、color_signatureとの距離の最小値を返す
+    距離はチャンネルごとの |平均の差| + |標準偏差の差| の最大値(画素値の単位)
+    積分画像を使うため、位置の数によらず画像の画素数に比例する時間で求まる
+    戻り値は(最小の距離, その位置の左上座標)
+    '''
+    w, h = size
+    sums, sqsums = cv2.integral2(image, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+    if sums.ndim == 2:
+        sums, sqsums = sums[..., numpy.newaxis], sqsums[..., numpy.newaxis]
+
+    def window_sum(s):
+        return s[h:, w:] - s[:-h, w:] - s[h:, :-w] + s[:-h, :-w]
+
+    n = float(w * h)
+    mean = window_sum(sums) / n
+    std = numpy.sqrt(numpy.maximum(window_sum(sqsums) / n - mean * mean, 0.0))
+    distance = (numpy.abs(mean - signature[0]) + numpy.abs(std - signature[1])).max(axis=-1)
+    y, x = numpy.unravel_index(numpy.argmin(distance), distance.shape)
+    return float(distance[y, x]), (int(x), int(y))
+
+
+def box_iou(boxes1: numpy.ndarray, boxes2: numpy.ndarray) -> numpy.ndarray:
+    '''
+    矩形どうしのIoU(Intersection over Union)をまとめて計算する
+    boxes1: (N, 4), boxes2: (M, 4) の配列 [x1, y1, x2, y2]
+    戻り値は (N, M) の配列
+    '''
+    boxes1 = numpy.asarray(boxes1, dtype=numpy.float64).reshape(-1, 4)
+    boxes2 = numpy.asarray(boxes2, dtype=numpy.float64).reshape(-1, 4)
+    x1 = numpy.maximum(boxes1[:, numpy.newaxis, 0], boxes2[numpy.newaxis, :, 0])
+    y1 = numpy.maximum(boxes1[:, numpy.newaxis, 1], boxes2[numpy.newaxis, :, 1])
+    x2 = numpy.minimum(boxes1[:, numpy.newaxis, 2], boxes2[numpy.newaxis, :, 2])
+    y2 = numpy.minimum(boxes1[:, numpy.newaxis, 3], boxes2[numpy.newaxis, :, 3])
+    intersection = numpy.clip(x2 - x1, 0, None) * numpy.clip(y2 - y1, 0, None)
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    union = area1[:, numpy.newaxis] + area2[numpy.newaxis, :] - intersection
+    return numpy.divide(intersection, union, out=numpy.zeros_like(intersection), where=union > 0)
+
+
+def non_max_suppression(boxes: numpy.ndarray, scores: numpy.ndarray, iou_threshold: float = 0.3,
+                        max_results: Optional[int] = None) -> numpy.ndarray:
+    '''
+    スコアの高い順に矩形を選び、選んだ矩形とのIoUがiou_thresholdを超える矩形を除く(NMS)
+    1回の選択ごとに残り全ての矩形とのIoUをまとめて計算する
+    戻り値は残った矩形のインデックス(スコアの高い順)
+    '''
+    boxes = numpy.asarray(boxes, dtype=numpy.float64).reshape(-1, 4)
+    order = numpy.argsort(-numpy.asarray(scores, dtype=numpy.float64), kind="stable")
+    keep = []
+    while order.size > 0 and (max_results is None or len(keep) < max_results):
+        i = order[0]
+        keep.append(i)
+        iou = box_iou(boxes[i], boxes[order[1:]])[0]
+        order = order[1:][iou <= iou_threshold]
+    return numpy.array(keep, dtype=numpy.intp)
+
+
+def find_peaks(res: numpy.ndarray, size: Tuple[int, int], threshold: float, iou_threshold: float = 0.3,
+               max_results: Optional[int] = None) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    '''
+    類似度マップ(大きいほど似ている)から、閾値以上の位置を重なりを除いて全て返す
+    局所最大(3x3)のうち閾値以上のものを候補とし、重なった候補はnon_max_suppressionで1つにする
+    size: テンプレートの大きさ(幅, 高さ)
+    戻り値は(矩形 (N, 4) の配列 [x1, y1, x2, y2], 類似度 (N,) の配列)。類似度の高い順
+    '''
+    w, h = size
+    # マスク使用時は分母が0の位置がinf/nanになるため除く
+    res = numpy.nan_to_num(res, nan=-1.0, posinf=-1.0, neginf=-1.0)
+    peaks = (res >= threshold) & (res >= cv2.dilate(res, numpy.ones((3, 3), numpy.uint8)))
+    ys, xs = numpy.nonzero(peaks)
+    scores = res[ys, xs].astype(numpy.float64)
+    boxes = numpy.stack([xs, ys, xs + w, ys + h], axis=1).astype(numpy.int32)
+    keep = non_max_suppression(boxes, scores, iou_threshold, max_results)
+    return boxes[keep], scores[keep]
+
+
+def find_all(image: numpy.ndarray, template_image: numpy.ndarray, threshold: float, method: int = cv2.TM_CCOEFF_NORMED,
+             mask_image: numpy.ndarray = None, iou_threshold: float = 0.3, max_results: Optional[int] = None) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    '''
+    image内でテンプレートとの類似度がthreshold以上の位置を全て探す(アイテムやタマゴ、アイコンの数を数える場合など)
+    matcherを繰り返し呼ぶ代わりに、1回のテンプレートマッチングの類似度マップからfind_peaksで求める
+    method: 類似度が大きいほど似ている方式(TM_CCOEFF_NORMED, TM_CCORR_NORMEDなど)
+    戻り値は(矩形 (N, 4) の配列 [x1, y1, x2, y2], 類似度 (N,) の配列)。類似度の高い順
+    '''
+    h, w = template_image.shape[:2]
+    res = cv2.matchTemplate(image, template_image, method, mask=mask_image)
+    return find_peaks(res, (w, h), threshold, iou_threshold, max_results)
+
+
+class ColorRegionDetector:
+    '''
+    HSVの範囲に入る画素の領域を検出する
+    範囲の上限・下限の配列はset_rangeで作っておき(スライダーの操作時などはset_rangeだけを呼ぶ)、
+    1回のcv2.inRangeで2値画像にしてから、cv2.connectedComponentsWithStatsで領域の矩形・面積・重心をまとめて求める
+    lower, upper: [H, S, V] (Hは0〜179)。H の lower > upper の場合は赤のように0をまたぐ範囲になる
+    min_area: これより画素数が少ない領域は除く
+    '''
+
+    def __init__(self, lower: List[float], upper: List[float], min_area: int = 100, connectivity: int = 8):
+        self.min_area = min_area
+        self.connectivity = connectivity
+        self.lower = None
+        self.upper = None
+        self._ranges = []
+        self.set_range(lower, upper)
+
+    def set_range(self, lower: List[float], upper: List[float]) -> None:
+        '''
+        検出するHSVの範囲を変更する
+        '''
+        lower = [int(numpy.ceil(v)) for v in lower]
+        upper = [int(numpy.floor(v)) for v in upper]
+        if lower[0] <= upper[0]:
+            ranges = [(lower, upper)]
+        else:
+            # 0をまたぐ色相の範囲は2つに分ける
+            ranges = [([lower[0], lower[1], lower[2]], [179, upper[1], upper[2]]),
+                      ([0, lower[1], lower[2]], [upper[0], upper[1], upper[2]])]
+        self.lower = lower
+        self.upper = upper
+        self._ranges = [(numpy.array(lo, dtype=numpy.uint8), numpy.array(up, dtype=numpy.uint8))
+                        for lo, up in ranges]
+
+    def mask(self, image: numpy.ndarray) -> numpy.ndarray:
+        '''
+        範囲に入る画素を255、それ以外を0にした画像を返す
+        image: BGR画像
+        '''
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, *self._ranges[0])
+        for lower, upper in self._ranges[1:]:
+            mask |= cv2.inRange(hsv, lower, upper)
+        return mask
+
+    def detect(self, image: numpy.ndarray, crop: List[int] = None) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        '''
+        範囲に入る画素の領域を検出する
+        image: BGR画像
+        crop: 探索範囲 [x軸始点, y軸始点, x軸終点, y軸終点]。戻り値の座標はimage上の座標になる
+        戻り値は(矩形 (N, 4) の配列 [x1, y1, x2, y2], 画素数 (N,) の配列, 重心 (N, 2) の配列 [x, y])。画素数の多い順
+        '''
+        x0, y0 = 0, 0
+        if crop is not None and len(crop) == 4:
+            image = image[crop[1]:crop[3], crop[0]:crop[2]]
+            x0, y0 = crop[0], crop[1]
+        mask = self.mask(image)
+
+        # 範囲に入る画素を囲む矩形の中だけをラベリングする(画面の一部だけが該当する場合に速い)
+        bx, by, bw, bh = cv2.boundingRect(mask)
+        if bw == 0 or bh == 0:
+            return numpy.empty((0, 4), dtype=numpy.int32), numpy.empty(0, dtype=numpy.int32), numpy.empty((0, 2))
+        _, _, stats, centroids = cv2.connectedComponentsWithStats(mask[by:by + bh, bx:bx + bw], connectivity=self.connectivity)
+
+        # ラベル0は背景
+        stats, centroids = stats[1:], centroids[1:]
+        keep = numpy.nonzero(stats[:, cv2.CC_STAT_AREA] >= self.min_area)[0]
+        keep = keep[numpy.argsort(-stats[keep, cv2.CC_STAT_AREA], kind="stable")]
+        stats, centroids = stats[keep], centroids[keep]
+
+        x = stats[:, cv2.CC_STAT_LEFT] + (x0 + bx)
+        y = stats[:, cv2.CC_STAT_TOP] + (y0 + by)
+        boxes = numpy.stack([x, y, x + stats[:, cv2.CC_STAT_WIDTH], y + stats[:, cv2.CC_STAT_HEIGHT]], axis=1)
+        return boxes, stats[:, cv2.CC_STAT_AREA].copy(), centroids + numpy.array([x0 + bx, y0 + by], dtype=numpy.float64)
+
+
 def opneImage(image: numpy.ndarray, crop: List[int] = None, title="image"):
     '''
     キー入力があるまで画像を表示する
@@ -186,10 +610,12 @@ class ImageProcessing:
             self.__logger.error(f"Image Write Error: {e}")
             return False
 
-    def doTemplateMatch(self, image: numpy.ndarray, template_image: numpy.ndarray, mask_image: numpy.ndarray = None) -> Tuple[float, tuple]:
+    def doTemplateMatch(self, image: numpy.ndarray, template_image: numpy.ndarray, mask_image: numpy.ndarray = None,
+                        pyramid_level: int = 0) -> Tuple[float, tuple]:
         '''
         テンプレートマッチングをする
         画像は必要に応じて事前にグレースケール化やトリミングをしておく必要がある
+        pyramid_level: 1以上の場合は縮小画像で候補を探してから照合する(粗密探索、pyramid_match参照)
         '''
         # 比較方式を設定する
         method = cv2.TM_CCORR_NORMED if type(mask_image) == numpy.ndarray else cv2.TM_CCOEFF_NORMED
@@ -202,35 +628,46 @@ class ImageProcessing:
             matcher = cv2.cuda.createTemplateMatching(cv2.CV_8UC1, method)
             self.__gresult = matcher.match(self.__gsrc, self.__gtmpl)
             res = self.gresult.download()
+        elif pyramid_level > 0:
+            return pyramid_match(image, template_image, method, mask_image=mask_image, level=pyramid_level)
         else:
             res = cv2.matchTemplate(image, template_image, method, mask_image)
         _, max_val, _, max_loc = cv2.minMaxLoc(res)  # 結果から類似度と類似度が最大となる場所を抽出
 
         return max_val, max_loc
 
-    def isContainTemplate(self, image: numpy.ndarray, template_image: numpy.ndarray, mask_image: numpy.ndarray = None, threshold: float = 0.7, use_gray: bool = True,
-                          crop: List[int] = [], BGR_range: Optional[dict] = None, threshold_binary: Optional[int] = None, crop_template: list[int] = [], show_image: bool = False) -> Tuple[bool, tuple, int, int, float]:
+    def isContainTemplate(self, image: numpy.ndarray, template_image: numpy.ndarray | str, mask_image: numpy.ndarray | str = None, threshold: float = 0.7, use_gray: bool = True,
+                          crop: List[int] = [], BGR_range: Optional[dict] = None, threshold_binary: Optional[int] = None, crop_template: list[int] = [], show_image: bool = False,
+                          pyramid_level: int = 0, use_binary_match: bool = False) -> Tuple[bool, tuple, int, int, float]:
         '''
         テンプレートマッチングを行い類似度が閾値を超えているかを確認する
+        template_image, mask_imageには画像のパスも指定できる(読み込み・加工結果はキャッシュされる)
+        pyramid_level: 1以上の場合は粗密探索を行う(探索範囲が広いときに速い)
+        use_binary_match: 2値化(threshold_binary, BGR_range)した画像どうしをビット演算で比較する(binary_match参照)
+                          類似度は一致した画素の割合になる
         '''
-        # テンプレートマッチング対象画像を加工する
-        src, _, _ = doPreprocessImage(image, use_gray=use_gray, crop=crop, BGR_range=BGR_range, threshold_binary=threshold_binary)
+        # テンプレート画像を加工する(パスが渡された場合は加工済みの画像をキャッシュから取得する)
+        template, width, height = _prepare_template(template_image, use_gray=use_gray, crop=crop_template, BGR_range=BGR_range, threshold_binary=threshold_binary)
+        mask_image = _prepare_mask(mask_image)
+
+        # テンプレートマッチング対象画像を加工する(トリミング範囲はテンプレート画像より小さくならないようにする)
+        src, _, _ = doPreprocessImage(image, use_gray=use_gray, crop=crop, BGR_range=BGR_range, threshold_binary=threshold_binary, min_size=(width, height))
 
         # [DEBUG] テンプレートマッチング対象画像を表示する
         if show_image:
             cv2.imshow("image", src)
             cv2.waitKey()
 
-        # テンプレート画像を加工する
-        template, width, height = doPreprocessImage(template_image, use_gray=use_gray, crop=crop_template, BGR_range=BGR_range, threshold_binary=threshold_binary)
-
         # テンプレートマッチングを行う
-        max_val, max_loc = self.doTemplateMatch(src, template, mask_image=mask_image)
+        if use_binary_match and (threshold_binary is not None or (BGR_range is not None and not use_gray)):
+            max_val, max_loc = binary_match(src, template, mask_image=mask_image)
+        else:
+            max_val, max_loc = self.doTemplateMatch(src, template, mask_image=mask_image, pyramid_level=pyramid_level)
 
         # 類似度が閾値を超えたかを戻り値として返す(合わせて位置とテンプレート画像のサイズも返す)
         return max_val > threshold, max_loc, width, height, max_val
 
-    def isContainTemplate_max(self, image: numpy.ndarray, template_image_list: List[numpy.ndarray], mask_image_list: List[numpy.ndarray] = [], threshold: float = 0.7, use_gray: bool = True,
+    def isContainTemplate_max(self, image: numpy.ndarray, template_image_list: List[numpy.ndarray | str], mask_image_list: List[numpy.ndarray | str] = [], threshold: float = 0.7, use_gray: bool = True,
                               crop: List[int] = [], BGR_range: Optional[dict] = None, threshold_binary: Optional[int] = None, crop_template: list[int] = [], show_image: bool = False) -> Tuple[int, List[float], List[tuple], List[int], List[int], List[bool]]:
         '''
         複数のテンプレート画像を用いてそれぞれテンプレートマッチングを行い類似度が最も大きい画像のindexを返す
@@ -251,17 +688,21 @@ class ImageProcessing:
         height_list = []
         judge_threshold_list = []
 
-        # テンプレートマッチング対象画像を加工する
-        src, _, _ = doPreprocessImage(image, use_gray=use_gray, crop=crop, BGR_range=BGR_range, threshold_binary=threshold_binary)
+        # テンプレート画像を加工する
+        templates = [_prepare_template(template_image, use_gray=use_gray, crop=crop_template, BGR_range=BGR_range, threshold_binary=threshold_binary)
+                     for template_image in template_image_list]
+        mask_image_list_temp = [_prepare_mask(mask_image) for mask_image in mask_image_list_temp]
+        min_size = (max([t[1] for t in templates], default=0), max([t[2] for t in templates], default=0))
+
+        # テンプレートマッチング対象画像を加工する(トリミング範囲は最大のテンプレート画像より小さくならないようにする)
+        src, _, _ = doPreprocessImage(image, use_gray=use_gray, crop=crop, BGR_range=BGR_range, threshold_binary=threshold_binary, min_size=min_size)
 
         # [DEBUG] テンプレートマッチング対象画像を表示する
         if show_image:
             cv2.imshow("image", src)
             cv2.waitKey()
 
-        for template_image, mask_image in zip(template_image_list, mask_image_list_temp):
-            # テンプレート画像を加工する
-            template, width, height = doPreprocessImage(template_image, use_gray=use_gray, crop=crop_template, BGR_range=BGR_range, threshold_binary=threshold_binary)
+        for (template, width, height), mask_image in zip(templates, mask_image_list_temp):
             max_val, max_loc = self.doTemplateMatch(src, template, mask_image=mask_image)
             max_val_list.append(max_val)
             max_loc_list.append(max_loc)
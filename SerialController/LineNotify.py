@@ -1,6 +1,5 @@
 import configparser
 from typing import Any, Optional
-import cv2
 import io
 import os
 
@@ -98,8 +97,7 @@ class Line_Notify:
                 self.send_text(notification_message)
                 return
 
-            image_bgr = self.camera.readFrame()
-            image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+            image_rgb = self.camera.latest_frame().rgb()
             image = Image.fromarray(image_rgb)
             png = io.BytesIO()  # 空のio.BytesIOオブジェクトを用意
             image.save(
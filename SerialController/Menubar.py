@@ -6,6 +6,7 @@ import tkinter as tk
 from KeyConfig import PokeKeycon
 from LineNotify import Line_Notify
 from get_pokestatistics import GetFromHomeGUI
+from SerialMetricsViewer import SerialMetricsViewer
 import DiscordNotify
 from loguru import logger
 
@@ -22,6 +23,7 @@ class PokeController_Menubar(tk.Menu):
         self.camera = self.master.camera
         self.poke_treeview = None
         self.key_config = None
+        self.serial_metrics = None
         self.line = None
 
         tk.Menu.__init__(self, self.root, **kw)
@@ -55,6 +57,9 @@ class PokeController_Menubar(tk.Menu):
         self.menu_command.add(
             "command", command=self.ResetWindowSize, label="画面サイズのリセット"
         )
+        self.menu_command.add(
+            "command", command=self.OpenSerialMetrics, label="シリアル通信の統計"
+        )
         self.menu_command.add(
             "command",
             command=self.open_discord_notify_setting,
@@ -107,6 +112,21 @@ class PokeController_Menubar(tk.Menu):
         self.key_config.destroy()
         self.key_config = None
 
+    def OpenSerialMetrics(self) -> None:
+        logger.debug("Open serial metrics window")
+        if self.serial_metrics is not None:
+            self.serial_metrics.focus_force()
+            return
+
+        window = SerialMetricsViewer(self.root, self.ser)
+        window.protocol("WM_DELETE_WINDOW", self.closingSerialMetrics)
+        self.serial_metrics = window
+
+    def closingSerialMetrics(self) -> None:
+        logger.debug("Close serial metrics window")
+        self.serial_metrics.destroy()
+        self.serial_metrics = None
+
     def ResetWindowSize(self) -> None:
         logger.debug("Reset window size")
         self.preview.setShowsize(360, 640)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import atexit
+import ctypes
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+# 期限の直前に回転待ちする時間の範囲(秒)
+# スリープの遅れがMAX_SPIN_MARGINを超える環境では、その分だけ遅れて戻る(CPUを使い続けないため)
+MIN_SPIN_MARGIN = 0.0003
+MAX_SPIN_MARGIN = 0.002
+# Windowsで要求するタイマーの分解能(ミリ秒)。既定の分解能(15.6ms)ではスリープが最大15ms程度遅れる
+WINDOWS_TIMER_RESOLUTION_MS = 1
+# 校正で測るスリープの回数
+CALIBRATION_SAMPLES = 20
+# 誤差の統計に使う直近の待機の数
+ERROR_HISTORY = 1000
+# 回転待ちする時間の調整に使う直近のスリープの遅れの数と、調整する間隔
+OVERSHOOT_HISTORY = 200
+ADJUST_INTERVAL = 20
+
+
+_high_resolution_enabled = False
+
+
+def enable_high_resolution_timer() -> bool:
+    """
+    Windowsのタイマーの分解能を`WINDOWS_TIMER_RESOLUTION_MS`にする(timeBeginPeriod)。
+
+    プロセスで1回だけ行い、終了時に元に戻す。Windows以外では何もしない。
+
+    Returns:
+        bool: 分解能を変更した場合はTrue
+    """
+    global _high_resolution_enabled
+    if os.name != "nt":
+        return False
+    if not _high_resolution_enabled:
+        try:
+            winmm = ctypes.WinDLL("winmm")
+            if winmm.timeBeginPeriod(WINDOWS_TIMER_RESOLUTION_MS) != 0:
+                logger.warning("timeBeginPeriod failed")
+                return False
+            atexit.register(winmm.timeEndPeriod, WINDOWS_TIMER_RESOLUTION_MS)
+        except (AttributeError, OSError) as e:
+            logger.warning(f"High resolution timer is not available: {e}")
+            return False
+        _high_resolution_enabled = True
+        logger.debug(f"Timer resolution set to {WINDOWS_TIMER_RESOLUTION_MS}ms")
+    return True
+
+
+def calibrate_spin_margin(samples: int = CALIBRATION_SAMPLES) -> float:
+    """
+    `Event.wait`が指定時間からどれだけ遅れて戻るかを測り、回転待ちに切り替える時間を求める。
+
+    OSのタイマー分解能(Windowsでは1〜15ms程度)によって遅れが変わるため、実行環境ごとに測る。
+    Windowsでは先に`enable_high_resolution_timer`で分解能を1msにする。
+
+    Returns:
+        float: 回転待ちに切り替える時間(秒)。遅れの95パーセンタイルに余裕を足したもの
+    """
+    event = threading.Event()
+    overshoots = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        event.wait(0.001)
+        overshoots.append(time.perf_counter() - start - 0.001)
+    margin = float(np.percentile(overshoots, 95)) + 0.0002
+    return min(MAX_SPIN_MARGIN, max(MIN_SPIN_MARGIN, margin))
+
+
+class PrecisionTimer:
+    """
+    中断できる高精度な待機。
+
+    期限の`spin_margin`秒前までは`threading.Event`で眠り(CPUを使わない)、
+    残りだけ`time.perf_counter()`で回転待ちする。`cancel()`を呼ぶと待機中でもすぐに戻る。
+    回転待ちは最大`MAX_SPIN_MARGIN`秒で、スリープの遅れがそれより大きい環境では期限より遅れて戻る。
+    待機ごとの誤差(実際に戻った時刻 - 期限)を記録し、`stats()`で返す。
+
+    Args:
+        spin_margin (float | None): 回転待ちする時間(秒)。Noneの場合は初回の待機時に`calibrate_spin_margin`で求め
+            (求めた値はすべてのタイマーで共有する)、以降は実際のスリープの遅れの99パーセンタイルに合わせて調整する
+    """
+
+    _calibrated_margin: Optional[float] = None
+    _calibration_lock = threading.Lock()
+
+    def __init__(self, spin_margin: Optional[float] = None):
+        self._spin_margin = spin_margin
+        self._adaptive = spin_margin is None
+        self._overshoots: deque[float] = deque(maxlen=OVERSHOOT_HISTORY)
+        self._overshoot_count = 0
+        self._cancel = threading.Event()
+        self._errors: deque[float] = deque(maxlen=ERROR_HISTORY)
+        self._count = 0
+        self._cancelled = 0
+
+    @property
+    def spin_margin(self) -> float:
+        if self._spin_margin is None:
+            with PrecisionTimer._calibration_lock:
+                if PrecisionTimer._calibrated_margin is None:
+                    enable_high_resolution_timer()
+                    PrecisionTimer._calibrated_margin = calibrate_spin_margin()
+                    logger.debug(f"Timer spin margin calibrated: {PrecisionTimer._calibrated_margin * 1e6:.0f}us")
+            self._spin_margin = PrecisionTimer._calibrated_margin
+        return self._spin_margin
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        """待機を中断する(以降の待機も`reset()`までは即座に戻る)"""
+        self._cancel.set()
+
+    def reset(self) -> None:
+        """中断を解除する"""
+        self._cancel.clear()
+
+    def sleep(self, seconds: float) -> bool:
+        """
+        `seconds`秒待機する。
+
+        Returns:
+            bool: 最後まで待機した場合はTrue、中断された場合はFalse
+        """
+        return self.sleep_until(time.perf_counter() + max(0.0, float(seconds)))
+
+    def sleep_until(self, deadline: float) -> bool:
+        """
+        `time.perf_counter()`が`deadline`になるまで待機する。
+
+        Returns:
+            bool: 最後まで待機した場合はTrue、中断された場合はFalse
+        """
+        cancel = self._cancel
+        margin = self.spin_margin
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= margin:
+                break
+            target = time.perf_counter() + remaining - margin
+            if cancel.wait(remaining - margin):
+                self._cancelled += 1
+                return False
+            self._record_overshoot(time.perf_counter() - target)
+            margin = self._spin_margin
+        while time.perf_counter() < deadline:
+            if cancel.is_set():
+                self._cancelled += 1
+                return False
+        self._count += 1
+        self._errors.append(time.perf_counter() - deadline)
+        return True
+
+    def _record_overshoot(self, overshoot: float) -> None:
+        if not self._adaptive:
+            return
+        overshoots = self._overshoots
+        overshoots.append(overshoot)
+        # 履歴が満杯になった後も、回転待ちの時間はADJUST_INTERVAL回ごとにだけ求め直す
+        self._overshoot_count += 1
+        if self._overshoot_count % ADJUST_INTERVAL == 0:
+            margin = float(np.percentile(overshoots, 99)) + 0.0001
+            self._spin_margin = min(MAX_SPIN_MARGIN, max(MIN_SPIN_MARGIN, margin))
+
+    def stats(self) -> dict:
+        """
+        待機の誤差の統計を返す。
+
+        Returns:
+            dict: count(最後まで待機した回数), cancelled(中断された回数), spin_margin_us,
+                mean_us, p50_us, p99_us, max_us(直近`ERROR_HISTORY`回の誤差、マイクロ秒)
+        """
+        errors = np.array(self._errors, dtype=np.float64) * 1e6
+        result = {
+            "count": self._count,
+            "cancelled": self._cancelled,
+            "spin_margin_us": (self._spin_margin or 0.0) * 1e6,
+        }
+        if errors.size:
+            result.update({
+                "mean_us": float(errors.mean()),
+                "p50_us": float(np.percentile(errors, 50)),
+                "p99_us": float(np.percentile(errors, 99)),
+                "max_us": float(errors.max()),
+            })
+        return result
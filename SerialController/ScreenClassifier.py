@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+import yaml
+from loguru import logger
+
+from Camera import CapturedFrame
+from TemplateMatcher import TemplateMatcher, get_template_filespec, match_all
+
+MANIFEST_NAME = "screens.yaml"
+
+# dHashの縮小サイズ(HASH_SIZE x HASH_SIZE ビット)
+HASH_SIZE = 8
+HASH_BITS = HASH_SIZE * HASH_SIZE
+# 一致と判定するハミング距離の既定値
+DEFAULT_MAX_DISTANCE = 10
+
+
+def dhash_bits(images: list[np.ndarray]) -> np.ndarray:
+    """
+    グレースケール画像のdHash(隣接画素の差分ハッシュ)をまとめて計算する。
+
+    Args:
+        images (list[np.ndarray]): グレースケール画像
+
+    Returns:
+        np.ndarray: (画像数, HASH_BITS // 8) のuint8配列(ビットを詰めたハッシュ)
+    """
+    if not images:
+        return np.empty((0, HASH_BITS // 8), dtype=np.uint8)
+    small = np.stack(
+        [cv2.resize(image, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA) for image in images]
+    ).astype(np.int16)
+    diff = small[:, :, 1:] > small[:, :, :-1]
+    return np.packbits(diff.reshape(len(images), HASH_BITS), axis=1)
+
+
+def dhash_hex(image: np.ndarray, roi: list = []) -> str:
+    """
+    画像(BGR)の指定範囲のdHashを16進文字列で返す(マニフェストの`hash`に書く値)。
+
+    Args:
+        image (np.ndarray): 画像(BGR)
+        roi (list): 範囲 [x軸始点, y軸始点, x軸終点, y軸終点]。空の場合は画像全体
+    """
+    return dhash_bits([_gray_roi(image, roi)])[0].tobytes().hex()
+
+
+def _gray_roi(frame: CapturedFrame | np.ndarray, roi: list) -> np.ndarray:
+    if isinstance(frame, CapturedFrame):
+        if len(roi) == 4:
+            return frame.roi(*roi, kind="gray")
+        return frame.gray()
+    image = frame[roi[1]:roi[3], roi[0]:roi[2]] if len(roi) == 4 else frame
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+class ScreenState:
+    """
+    `ScreenClassifier.classify`の結果。
+
+    Attributes:
+        name (str | None): 判定された画面の名前。どの画面にも一致しなかった場合はNone
+        confidence (float): 判定された画面の確信度(0.0〜1.0)。一致しなかった場合は最も近い画面の確信度
+        candidate (str | None): 最も確信度が高かった画面の名前(一致しなかった場合も含む)
+        scores (dict[str, float]): 画面ごとの確信度
+        timings (dict[str, float]): 画面ごとの判定時間(秒)
+        elapsed (float): 判定全体にかかった時間(秒)
+    """
+
+    def __init__(
+        self,
+        name: Optional[str],
+        confidence: float,
+        candidate: Optional[str],
+        scores: dict[str, float],
+        timings: dict[str, float],
+        elapsed: float,
+    ):
+        self.name = name
+        self.confidence = confidence
+        self.candidate = candidate
+        self.scores = scores
+        self.timings = timings
+        self.elapsed = elapsed
+
+    def __bool__(self) -> bool:
+        return self.name is not None
+
+    def __repr__(self) -> str:
+        return (
+            f"<ScreenState {self.name} confidence={self.confidence:.3f} "
+            f"candidate={self.candidate} elapsed={self.elapsed * 1000:.2f}ms>"
+        )
+
+
+class ScreenClassifier:
+    """
+    画面ごとの特徴(範囲とテンプレート画像、または範囲と知覚ハッシュ)から、現在の画面を1回で判定する。
+
+    特徴はディレクトリ内の`screens.yaml`に記述する。
+    テンプレートの画面は`TemplateMatcher`で判定し(類似度が確信度)、
+    ハッシュの画面は全画面のdHashをまとめて計算してハミング距離を一括で比較する
+    (1 - 距離 / 64 が確信度)。閾値を満たす画面のうち確信度が最も高いものを返す。
+
+    マニフェストは最初の判定時(または`compile()`)に読み込む。
+
+    Args:
+        directory (str): マニフェストのあるディレクトリ(`TEMPLATE_PATH`からの相対パスまたは絶対パス)
+        parallel (bool): テンプレートの判定をスレッドプールで並列に行うか
+
+    Example:
+        screens.yaml:
+            screens:
+              initial_screen:
+                template: network_initial_screen.png
+                crop: [130, 125, 330, 145]
+                threshold: 0.95
+                use_gray: false
+              battle_list:
+                roi: [1040, 144, 1162, 175]
+                hash: 3c3c7e7e3c3c1800       # または hash_image: network_battle_list_screen.png
+                max_distance: 8
+
+        state = ScreenClassifier("Macro/rokkuman_exe").classify(frame)
+        if state.name == "initial_screen":
+            ...
+    """
+
+    def __init__(self, directory: str, parallel: bool = True):
+        self.directory = directory
+        self.parallel = parallel
+        self._templates: dict[str, TemplateMatcher] = {}
+        self._hash_names: list[str] = []
+        self._hash_rois: list[list[int]] = []
+        self._hashes = np.empty((0, HASH_BITS // 8), dtype=np.uint8)
+        self._max_distances = np.empty(0, dtype=np.int32)
+        self._order: list[str] = []
+        self._compiled = False
+
+    def __repr__(self) -> str:
+        return f"<ScreenClassifier {self.directory} screens={self.names}>"
+
+    @property
+    def names(self) -> list[str]:
+        """判定対象の画面の名前(マニフェストの順)"""
+        return list(self._order)
+
+    def compile(self) -> ScreenClassifier:
+        """
+        マニフェストと画像を読み込む。
+
+        Raises:
+            FileNotFoundError: マニフェストまたは画像を読み込めなかった場合
+            ValueError: マニフェストの記述が不正な場合
+
+        Returns:
+            ScreenClassifier: 自分自身
+        """
+        directory = get_template_filespec(self.directory)
+        manifest_path = os.path.join(directory, MANIFEST_NAME)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Screen manifest not found: {manifest_path}")
+
+        screens = manifest.get("screens") or {}
+        if not isinstance(screens, dict) or not screens:
+            raise ValueError(f"No screens are defined: {manifest_path}")
+
+        templates = {}
+        hash_names, hash_rois, hashes, max_distances = [], [], [], []
+        for name, spec in screens.items():
+            if "template" in spec:
+                templates[name] = TemplateMatcher(
+                    os.path.abspath(os.path.join(directory, spec["template"])),
+                    threshold=float(spec.get("threshold", 0.9)),
+                    use_gray=bool(spec.get("use_gray", True)),
+                    crop=spec.get("crop", []),
+                    mask_path=(
+                        os.path.abspath(os.path.join(directory, spec["mask"])) if "mask" in spec else None
+                    ),
+                ).compile()
+            elif "hash" in spec or "hash_image" in spec:
+                roi = list(spec.get("roi", []))
+                if "hash" in spec:
+                    value = bytes.fromhex(str(spec["hash"]))
+                    if len(value) != HASH_BITS // 8:
+                        raise ValueError(f"Invalid hash for screen '{name}': {spec['hash']}")
+                    hashes.append(np.frombuffer(value, dtype=np.uint8))
+                else:
+                    image_path = os.path.join(directory, spec["hash_image"])
+                    data = np.fromfile(image_path, dtype=np.uint8) if os.path.exists(image_path) else None
+                    image = cv2.imdecode(data, cv2.IMREAD_COLOR) if data is not None else None
+                    if image is None:
+                        raise FileNotFoundError(f"Screen image cannot be loaded: {image_path}")
+                    hashes.append(dhash_bits([_gray_roi(image, roi)])[0])
+                hash_names.append(name)
+                hash_rois.append(roi)
+                max_distances.append(int(spec.get("max_distance", DEFAULT_MAX_DISTANCE)))
+            else:
+                raise ValueError(f"Screen '{name}' needs 'template' or 'hash': {manifest_path}")
+
+        self._templates = templates
+        self._hash_names = hash_names
+        self._hash_rois = hash_rois
+        self._hashes = np.stack(hashes) if hashes else np.empty((0, HASH_BITS // 8), dtype=np.uint8)
+        self._max_distances = np.array(max_distances, dtype=np.int32)
+        self._order = list(screens.keys())
+        self._compiled = True
+        logger.debug(f"Screen classifier loaded: {manifest_path} ({len(self._order)} screens)")
+        return self
+
+    def classify(self, frame: CapturedFrame | np.ndarray) -> ScreenState:
+        """
+        フレームがどの画面かを判定する。
+
+        Args:
+            frame (CapturedFrame | np.ndarray): 対象フレーム(BGR)
+
+        Returns:
+            ScreenState: 判定結果
+        """
+        if not self._compiled:
+            self.compile()
+
+        start = time.perf_counter()
+        scores: dict[str, float] = {}
+        timings: dict[str, float] = {}
+        matched: dict[str, bool] = {}
+
+        # テンプレートの画面
+        items = list(self._templates.items())
+        results = match_all([matcher for _, matcher in items], frame, parallel=self.parallel, match=_timed_match)
+        for (name, _), ((is_match, _, score), elapsed) in zip(items, results):
+            scores[name] = float(score)
+            matched[name] = bool(is_match)
+            timings[name] = elapsed
+
+        # ハッシュの画面(まとめて計算する)
+        if self._hash_names:
+            t = time.perf_counter()
+            bits = dhash_bits([_gray_roi(frame, roi) for roi in self._hash_rois])
+            distances = np.unpackbits(np.bitwise_xor(bits, self._hashes), axis=1).sum(axis=1)
+            per_screen = (time.perf_counter() - t) / len(self._hash_names)
+            for name, distance, max_distance in zip(self._hash_names, distances, self._max_distances):
+                scores[name] = 1.0 - float(distance) / HASH_BITS
+                matched[name] = bool(distance <= max_distance)
+                timings[name] = per_screen
+
+        candidate = max(self._order, key=lambda name: scores[name])
+        found = [name for name in self._order if matched[name]]
+        name = max(found, key=lambda name: scores[name]) if found else None
+        return ScreenState(
+            name,
+            scores[name if name is not None else candidate],
+            candidate,
+            scores,
+            timings,
+            time.perf_counter() - start,
+        )
+
+
+def _timed_match(matcher: TemplateMatcher, frame) -> tuple[tuple, float]:
+    t = time.perf_counter()
+    result = matcher.match(frame)
+    return result, time.perf_counter() - t
+
+
+if __name__ == "__main__":
+    # スクリーンショットから`screens.yaml`に書くハッシュを求める
+    parser = argparse.ArgumentParser(description="Print the dHash of a screenshot region for screens.yaml")
+    parser.add_argument("image", help="screenshot (BGR image file)")
+    parser.add_argument("--roi", type=int, nargs=4, default=[], metavar=("X0", "Y0", "X1", "Y1"))
+    args = parser.parse_args()
+    image = cv2.imdecode(np.fromfile(args.image, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise SystemExit(f"Cannot load image: {args.image}")
+    print(dhash_hex(image, args.roi))
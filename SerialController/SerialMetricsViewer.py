@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import tkinter as tk
+import tkinter.ttk as ttk
+from tkinter import filedialog
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from Commands.Sender import Sender
+
+# 表示を更新する間隔(ミリ秒)
+REFRESH_INTERVAL_MS = 1000
+
+# (見出し, SerialMetricsの統計のキー, 幅)
+COLUMNS = [
+    ("コマンド", "command", 180),
+    ("書き込み", "writes", 70),
+    ("バイト", "bytes", 80),
+    ("例外", "errors", 50),
+    ("回/秒", "writes_per_sec", 60),
+    ("B/秒", "bytes_per_sec", 70),
+    ("最大 回/秒", "peak_writes_per_sec", 80),
+    ("最大 B/秒", "peak_bytes_per_sec", 80),
+    ("使用率(%)", "link_utilization", 70),
+    ("p50(us)", "p50_us", 70),
+    ("p99(us)", "p99_us", 70),
+    ("max(us)", "max_us", 70),
+]
+
+
+class SerialMetricsViewer(tk.Toplevel):
+    """
+    シリアル通信の統計(Sender.serialMetrics)をコマンドごとに表示するウィンドウ
+
+    使用率はピーク時の1秒間のバイト数が通信速度に占める割合。100%に近いコマンドは送信が詰まっている。
+    """
+
+    def __init__(self, master, ser: Sender):
+        super().__init__(master)
+        self.ser = ser
+        self.title("シリアル通信の統計")
+        self._after_id = None
+
+        frame = ttk.Frame(self)
+        frame.pack(expand=True, fill="both", padx=5, pady=5)
+        self.treeview = ttk.Treeview(frame, columns=[key for _, key, _ in COLUMNS], show="headings", height=8)
+        for heading, key, width in COLUMNS:
+            self.treeview.heading(key, text=heading)
+            self.treeview.column(key, width=width, anchor="w" if key == "command" else "e", stretch=tk.NO)
+        self.treeview.pack(side="left", expand=True, fill="both")
+        vsb = ttk.Scrollbar(frame, orient="vertical", command=self.treeview.yview)
+        vsb.pack(side="right", fill="y")
+        self.treeview.configure(yscrollcommand=vsb.set)
+
+        buttons = ttk.Frame(self)
+        buttons.pack(fill="x", padx=5, pady=(0, 5))
+        ttk.Button(buttons, text="保存", command=self.save).pack(side="right")
+        ttk.Button(buttons, text="リセット", command=self.reset).pack(side="right", padx=5)
+
+        self.refresh()
+
+    def refresh(self) -> None:
+        self.treeview.delete(*self.treeview.get_children())
+        for row in self.ser.serialMetrics():
+            values = []
+            for _, key, _ in COLUMNS:
+                value = row[key]
+                if key == "link_utilization":
+                    value = "-" if value is None else f"{value * 100:.1f}"
+                values.append(value)
+            self.treeview.insert("", "end", values=values)
+        self._after_id = self.after(REFRESH_INTERVAL_MS, self.refresh)
+
+    def reset(self) -> None:
+        logger.debug("Reset serial metrics")
+        self.ser.metrics.reset()
+
+    def save(self) -> None:
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")],
+            initialfile="serial_metrics.csv",
+        )
+        if path:
+            self.ser.metrics.dump(path, getattr(self.ser.ser, "baudrate", None))
+
+    def destroy(self) -> None:
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        super().destroy()
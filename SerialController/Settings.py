@@ -44,6 +44,14 @@ class GuiSettings:
             self.serial_data_format_name = tk.StringVar(value=self.setting['General Setting']['serial_data_format_name'])
         except:
             self.serial_data_format_name = tk.StringVar(value='Default')
+        try:
+            self.serial_protocol = tk.StringVar(value=self.setting['General Setting']['serial_protocol'])
+        except:
+            self.serial_protocol = tk.StringVar(value='ascii')
+        try:
+            self.camera_backend = tk.StringVar(value=self.setting['General Setting']['camera_backend'])
+        except:
+            self.camera_backend = tk.StringVar(value='thread')
         try:
             self.touchscreen_start_x = int(self.setting['General Setting']['touchscreen_start_x'])
         except:
@@ -122,6 +130,8 @@ class GuiSettings:
             'is_show_serial': False,
             'is_use_keyboard': True,
             'serial_data_format_name': 'Default',
+            'serial_protocol': 'ascii',
+            'camera_backend': 'thread',
             'touchscreen_start_x': 1,
             'touchscreen_start_y': 1,
             'touchscreen_end_x': 320,
@@ -223,6 +233,8 @@ class GuiSettings:
             'is_show_serial': self.is_show_serial.get(),
             'is_use_keyboard': self.is_use_keyboard.get(),
             'serial_data_format_name': self.serial_data_format_name.get(),
+            'serial_protocol': self.serial_protocol.get(),
+            'camera_backend': self.camera_backend.get(),
             'touchscreen_start_x': self.touchscreen_start_x,
             'touchscreen_start_y': self.touchscreen_start_y,
             'touchscreen_end_x': self.touchscreen_end_x,
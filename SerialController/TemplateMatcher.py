@@ -0,0 +1,761 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from typing import Any, Callable, Optional
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from Camera import CapturedFrame
+from ImageProcessing import (
+    binary_match,
+    binary_match_map,
+    color_signature,
+    expand_crop,
+    find_peaks,
+    min_signature_distance,
+    pack_binary_template,
+    pyramid_level_for,
+    pyramid_match,
+)
+from TemplateStore import template_store
+
+TEMPLATE_PATH = "./Template/"
+
+WINDOW_MARGIN = 8
+"""
+`TemplateMatcher(window_margin=WINDOW_MARGIN)`で使う前回位置の周囲の幅(ピクセル)。
+
+前回の位置の周囲だけを探すと、テンプレートが複数の位置にある場合に全体を探したときと
+異なる位置・類似度を返すことがあるため、判定が変わらないことを確認したテンプレートだけで指定する
+(`benchmarks/search_window.py`)。
+"""
+
+
+def get_template_filespec(template_path: str) -> str:
+    """
+    テンプレート画像ファイルのパスを取得する。
+    入力が絶対パスの場合は、`TEMPLATE_PATH`につなげずに返す。
+    Args:
+        template_path (str): 画像パス
+    Returns:
+        str: テンプレート画像ファイルのパス
+    """
+    if path.isabs(template_path):
+        return template_path
+    else:
+        return path.join(TEMPLATE_PATH, template_path)
+
+
+def get_source_image(
+    frame: CapturedFrame | np.ndarray,
+    use_gray: bool = True,
+    crop: list = [],
+    min_size: Optional[tuple] = None,
+) -> tuple[np.ndarray, tuple[int, int]]:
+    """
+    テンプレートマッチングの対象画像を返す。
+
+    トリミングを先に行い、グレースケール化はトリミング後の範囲だけに対して行う。
+    ただし、`CapturedFrame`のグレースケール画像がすでにキャッシュされていればそれを切り出す。
+
+    Args:
+        frame (CapturedFrame | np.ndarray): 対象フレーム(BGR)
+        use_gray (bool): グレースケール画像を返すか
+        crop (list): トリミング範囲 [x軸始点, y軸始点, x軸終点, y軸終点]
+        min_size (tuple | None): (幅, 高さ) トリミング範囲がこれより小さい場合は広げる(テンプレートのサイズ)
+
+    Returns:
+        tuple[np.ndarray, tuple[int, int]]: 対象画像、元画像における対象画像の左上座標
+    """
+    image = frame.image if isinstance(frame, CapturedFrame) else frame
+
+    if len(crop) == 4:
+        x0, y0, x1, y1 = crop
+        if min_size is not None:
+            x0, y0, x1, y1 = expand_crop(
+                crop, min_size, (image.shape[1], image.shape[0])
+            )
+    else:
+        x0, y0, x1, y1 = 0, 0, image.shape[1], image.shape[0]
+
+    if isinstance(frame, CapturedFrame):
+        src = frame.roi(x0, y0, x1, y1, "gray" if use_gray else "bgr")
+    else:
+        src = image[y0:y1, x0:x1]
+        src = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY) if use_gray else src
+    return src, (x0, y0)
+
+
+class TemplateMatcher:
+    """
+    テンプレート画像・トリミング範囲・マスク・グレースケール/カラーの組を固定したテンプレートマッチング。
+
+    コマンドの`TEMPLATES`に宣言しておくと、コマンド開始時(`PythonCommand.do_safe`)に
+    まとめて読み込み・検証されるため、実行途中で初回読み込みの待ちが発生せず、
+    ファイルがない場合はボタン操作の前にエラーになる。
+
+    Args:
+        template_path (str): テンプレート画像のパス(`TEMPLATE_PATH`からの相対パスまたは絶対パス)
+        threshold (float): 一致と判定する類似度の閾値
+        use_gray (bool): グレースケール画像で比較するか
+        crop (list): 探索範囲 [x軸始点, y軸始点, x軸終点, y軸終点]。空の場合は画面全体
+        mask_path (str | None): マスク画像のパス。指定した場合は`TM_CCORR_NORMED`で比較する
+        pyramid_level (int): 1以上の場合、1/2**pyramid_level に縮小した画像で候補位置を探し、
+            元の解像度では候補の周辺だけを照合する(粗密探索)。探索範囲が広い場合に速い
+        top_k (int): 粗密探索で元の解像度で照合する候補数
+        window_margin (int | None): 前回一致した位置の周囲何ピクセルを先に探すか。
+            その範囲で閾値を超えればそれを結果とし、超えなければ探索範囲全体を探す。Noneの場合は使わない。
+            テンプレートが画面内の1か所にしか現れないことを確認した場合だけ指定する(`WINDOW_MARGIN`)
+        prefilter (float | None): 探索範囲全体を探す前に、テンプレートと同じ大きさの各位置の色の特徴
+            (チャンネルごとの平均・標準偏差)をテンプレートと比べ、最も近い位置でも距離がこの値を超えれば
+            テンプレートマッチングを省略する(類似度0.0として返す)。値は`calibrate_prefilter`で求める。
+            Noneの場合は使わない。マスクを指定した場合は使わない
+
+    Example:
+        class AutoHatching(ImageProcPythonCommand):
+            NAME = "自動卵孵化"
+            TEMPLATES = {
+                "egg_notice": TemplateMatcher("Samples/egg_notice.png"),
+            }
+
+            def do(self):
+                if self.isContainTemplate(self.TEMPLATES["egg_notice"]):
+                    ...
+    """
+
+    def __init__(
+        self,
+        template_path: str,
+        threshold: float = 0.7,
+        use_gray: bool = True,
+        crop: list = [],
+        mask_path: Optional[str] = None,
+        pyramid_level: int = 0,
+        top_k: int = 3,
+        window_margin: Optional[int] = None,
+        prefilter: Optional[float] = None,
+    ):
+        self.template_path = template_path
+        self.threshold = threshold
+        self.use_gray = use_gray
+        self.crop = list(crop)
+        self.mask_path = mask_path
+        self.method = cv2.TM_CCOEFF_NORMED if mask_path is None else cv2.TM_CCORR_NORMED
+        self.pyramid_level = pyramid_level
+        self.top_k = top_k
+        self.window_margin = window_margin
+        self.prefilter = prefilter
+        self.width = 0
+        self.height = 0
+        self._compiled = False
+        # 粗密探索用に縮小したテンプレート画像とマスク画像 (元の画像, 段階, 縮小テンプレート, 縮小マスク)
+        self._small = None
+        # テンプレートの色の特徴 (元の画像, color_signatureの結果)
+        self._signature = None
+        # 前回閾値を超えた位置(フレーム上の左上座標)
+        self._last_loc: Optional[tuple[int, int]] = None
+        self.window_hits = 0
+        self.window_misses = 0
+        self.full_searches = 0
+        self.cache_hits = 0
+        self.prefilter_skips = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{type(self).__name__} {self.template_path} threshold={self.threshold} "
+            f"use_gray={self.use_gray} crop={self.crop} pyramid_level={self.pyramid_level}>"
+        )
+
+    @property
+    def mode(self) -> str:
+        return "gray" if self.use_gray else "color"
+
+    @property
+    def cache_key(self) -> tuple:
+        """フレームごとの判定結果のキャッシュで使うキー。条件が同じ`TemplateMatcher`は結果を共有する"""
+        return (
+            "template",
+            self.template_path,
+            self.mode,
+            tuple(self.crop),
+            self.method,
+            self.mask_path,
+            self.pyramid_level,
+            self.prefilter,
+            self.window_margin,
+        )
+
+    def compile(self) -> TemplateMatcher:
+        """
+        テンプレート画像とマスク画像を読み込み、サイズを確定する。
+
+        Raises:
+            FileNotFoundError: 画像を読み込めなかった場合
+            ValueError: 探索範囲が画像として不正な場合
+
+        Returns:
+            TemplateMatcher: 自分自身
+        """
+        template, mask = self._load_images()
+        if mask is not None:
+            if mask.shape[:2] != template.shape[:2]:
+                raise ValueError(
+                    f"Mask size {mask.shape[:2]} does not match template {template.shape[:2]}: {self.mask_path}"
+                )
+        if len(self.crop) not in (0, 4) or (
+            len(self.crop) == 4 and (self.crop[2] <= self.crop[0] or self.crop[3] <= self.crop[1])
+        ):
+            raise ValueError(f"Invalid crop {self.crop}: {self.template_path}")
+        self.height, self.width = template.shape[:2]
+        self._compiled = True
+        return self
+
+    def search(
+        self, frame: CapturedFrame | np.ndarray, threshold: Optional[float] = None
+    ) -> tuple[float, tuple[int, int]]:
+        """
+        フレーム内で最も類似度が高い位置を探す。
+
+        前回閾値を超えた位置があれば、まずその周囲(`window_margin`)だけを探し、
+        閾値を超えればその結果を返す(探索範囲内に閾値を超える位置が複数ある場合は、
+        最大の位置ではなく前回の位置に近いものが返る)。
+
+        `CapturedFrame`を渡した場合、同じフレーム・同じ条件の結果はフレームに保持され、
+        2回目以降はテンプレートマッチングを行わずに返す。
+
+        Args:
+            frame (CapturedFrame | np.ndarray): 対象フレーム(BGR)
+            threshold (float | None): 前回の位置の周囲で一致とみなす閾値。Noneの場合は`self.threshold`
+
+        Returns:
+            tuple[float, tuple[int, int]]: 類似度、フレーム上の左上座標
+        """
+        if not self._compiled:
+            self.compile()
+        if threshold is None:
+            threshold = self.threshold
+
+        key = None
+        if isinstance(frame, CapturedFrame):
+            key = (self.cache_key, threshold)
+            cached = frame.cached_result(key)
+            if cached is not None:
+                self.cache_hits += 1
+                _match_cache_stats["hits"] += 1
+                return cached
+            _match_cache_stats["misses"] += 1
+
+        result = self._search(frame, threshold)
+        if key is not None:
+            frame.cache_result(key, result)
+        return result
+
+    def _load_images(self) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        """テンプレート画像とマスク画像を返す(読み込み済みのためキャッシュから取得される。ファイル更新時は読み直される)"""
+        template = template_store.get(get_template_filespec(self.template_path), self.mode)
+        mask = None
+        if self.mask_path is not None:
+            mask = template_store.get(get_template_filespec(self.mask_path), "mask")
+        return template, mask
+
+    def _get_source(
+        self, frame: CapturedFrame | np.ndarray, crop: list, min_size: Optional[tuple] = None
+    ) -> tuple[np.ndarray, tuple[int, int]]:
+        """フレームから比較対象の画像を切り出す"""
+        return get_source_image(frame, self.use_gray, crop, min_size)
+
+    def _match_image(
+        self, src: np.ndarray, template: np.ndarray, mask: Optional[np.ndarray]
+    ) -> tuple[float, tuple[int, int]]:
+        """`src`内で最も類似度が高い位置を探す"""
+        res = cv2.matchTemplate(src, template, self.method, mask=mask)
+        _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        return max_val, max_loc
+
+    def _match_map(
+        self, src: np.ndarray, template: np.ndarray, mask: Optional[np.ndarray]
+    ) -> np.ndarray:
+        """`src`内の全ての位置の類似度を返す"""
+        return cv2.matchTemplate(src, template, self.method, mask=mask)
+
+    def _search(
+        self, frame: CapturedFrame | np.ndarray, threshold: float
+    ) -> tuple[float, tuple[int, int]]:
+        template, mask = self._load_images()
+
+        last_loc = self._last_loc
+        if last_loc is not None and self.window_margin is not None:
+            result = self._search_window(frame, template, mask, last_loc)
+            if result is not None:
+                if result[0] >= threshold:
+                    self.window_hits += 1
+                    return result
+                self.window_misses += 1
+
+        src, offset = self._get_source(frame, self.crop, (template.shape[1], template.shape[0]))
+        if self.prefilter is not None and mask is None:
+            distance, loc = min_signature_distance(
+                src, (template.shape[1], template.shape[0]), self._get_signature(template)
+            )
+            if distance > self.prefilter:
+                # 色の特徴が近い位置がないため、テンプレートマッチングを省略する
+                self.prefilter_skips += 1
+                self._last_loc = None
+                return 0.0, (loc[0] + offset[0], loc[1] + offset[1])
+
+        max_val, top_left = self._search_full(frame, src, offset, template, mask)
+        self.full_searches += 1
+        self._last_loc = top_left if max_val >= threshold else None
+        return max_val, top_left
+
+    def _search_window(
+        self,
+        frame: CapturedFrame | np.ndarray,
+        template: np.ndarray,
+        mask: Optional[np.ndarray],
+        last_loc: tuple[int, int],
+    ) -> Optional[tuple[float, tuple[int, int]]]:
+        image = frame.image if isinstance(frame, CapturedFrame) else frame
+        h, w = template.shape[:2]
+        if len(self.crop) == 4:
+            rx0, ry0, rx1, ry1 = expand_crop(self.crop, (w, h), (image.shape[1], image.shape[0]))
+        else:
+            rx0, ry0, rx1, ry1 = 0, 0, image.shape[1], image.shape[0]
+        x, y = last_loc
+        m = self.window_margin
+        window = [max(rx0, x - m), max(ry0, y - m), min(rx1, x + w + m), min(ry1, y + h + m)]
+        if window[2] - window[0] < w or window[3] - window[1] < h:
+            return None
+        # 探索範囲がテンプレートとほぼ同じ大きさの場合は周囲だけを探しても速くならない
+        window_area = (window[2] - window[0] - w + 1) * (window[3] - window[1] - h + 1)
+        region_area = (rx1 - rx0 - w + 1) * (ry1 - ry0 - h + 1)
+        if window_area * 2 > region_area:
+            return None
+        src, offset = self._get_source(frame, window)
+        max_val, max_loc = self._match_image(src, template, mask)
+        return max_val, (max_loc[0] + offset[0], max_loc[1] + offset[1])
+
+    def _get_signature(self, template: np.ndarray) -> np.ndarray:
+        signature = self._signature
+        if signature is None or signature[0] is not template:
+            # テンプレートが読み直された場合も作り直す
+            signature = (template, color_signature(template))
+            self._signature = signature
+        return signature[1]
+
+    def _search_full(
+        self,
+        frame: CapturedFrame | np.ndarray,
+        src: np.ndarray,
+        offset: tuple[int, int],
+        template: np.ndarray,
+        mask: Optional[np.ndarray],
+    ) -> tuple[float, tuple[int, int]]:
+        if self.pyramid_level > 0:
+            max_val, max_loc = self._pyramid_search(frame, src, template, mask)
+        else:
+            max_val, max_loc = self._match_image(src, template, mask)
+        return max_val, (max_loc[0] + offset[0], max_loc[1] + offset[1])
+
+    def _pyramid_search(
+        self,
+        frame: CapturedFrame | np.ndarray,
+        src: np.ndarray,
+        template: np.ndarray,
+        mask: Optional[np.ndarray],
+    ) -> tuple[float, tuple[int, int]]:
+        level = pyramid_level_for((template.shape[1], template.shape[0]), self.pyramid_level)
+        if level == 0:
+            return self._match_image(src, template, mask)
+
+        small = self._small
+        if small is None or small[0] is not template or small[1] != level:
+            # テンプレートが読み直された場合も作り直す
+            scale = 1 << level
+            size = (template.shape[1] // scale, template.shape[0] // scale)
+            small = (
+                template,
+                level,
+                cv2.resize(template, size, interpolation=cv2.INTER_AREA),
+                None if mask is None else cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST),
+            )
+            self._small = small
+
+        # 画面全体を探す場合はフレームにキャッシュされた縮小画像を使う
+        src_small = None
+        if isinstance(frame, CapturedFrame) and len(self.crop) == 0:
+            src_small = frame.gray(level) if self.use_gray else frame.bgr(level)
+        return pyramid_match(
+            src,
+            template,
+            self.method,
+            mask_image=mask,
+            level=level,
+            top_k=self.top_k,
+            image_small=src_small,
+            template_small=small[2],
+            mask_small=small[3],
+        )
+
+    def match(
+        self, frame: CapturedFrame | np.ndarray, threshold: Optional[float] = None
+    ) -> tuple[bool, tuple[int, int], float]:
+        """
+        フレームにテンプレートが含まれるかを判定する。
+
+        Args:
+            frame (CapturedFrame | np.ndarray): 対象フレーム(BGR)
+            threshold (float | None): 閾値。Noneの場合は`self.threshold`
+
+        Returns:
+            tuple[bool, tuple[int, int], float]: 判定結果、フレーム上の左上座標、類似度
+        """
+        if threshold is None:
+            threshold = self.threshold
+        score, top_left = self.search(frame, threshold)
+        return score >= threshold, top_left, score
+
+    def find_all(
+        self,
+        frame: CapturedFrame | np.ndarray,
+        threshold: Optional[float] = None,
+        iou_threshold: float = 0.3,
+        max_results: Optional[int] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        探索範囲内でテンプレートと一致する位置を全て探す(アイテムやタマゴ、アイコンの数を数える場合など)。
+
+        1回のテンプレートマッチングの類似度マップから閾値以上の位置を求め、
+        重なった位置はNMS(`ImageProcessing.find_peaks`)で1つにする。
+        粗密探索・前回位置の周囲の探索・事前判定は使わない。
+
+        Args:
+            frame (CapturedFrame | np.ndarray): 対象フレーム(BGR)
+            threshold (float | None): 閾値。Noneの場合は`self.threshold`
+            iou_threshold (float): 重なっていると見なすIoUの閾値
+            max_results (int | None): 返す最大数。Noneの場合は全て
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: フレーム上の矩形 (N, 4) の配列 [x1, y1, x2, y2] と
+                類似度 (N,) の配列。類似度の高い順
+        """
+        if not self._compiled:
+            self.compile()
+        if threshold is None:
+            threshold = self.threshold
+        template, mask = self._load_images()
+        h, w = template.shape[:2]
+        src, offset = self._get_source(frame, self.crop, (w, h))
+        boxes, scores = find_peaks(
+            self._match_map(src, template, mask), (w, h), threshold, iou_threshold, max_results
+        )
+        boxes += np.array([offset[0], offset[1], offset[0], offset[1]], dtype=boxes.dtype)
+        return boxes, scores
+
+    def stats(self) -> dict:
+        """
+        前回の位置の周囲を先に探す処理の統計を返す。
+
+        Returns:
+            dict: window_hits(周囲だけで済んだ回数), window_misses(周囲で見つからず全体を探した回数),
+                full_searches(全体を探した回数), hit_rate(全判定のうち周囲だけで済んだ割合),
+                cache_hits(同じフレームの判定結果を再利用した回数),
+                prefilter_skips(色の特徴でテンプレートマッチングを省略した回数)
+        """
+        total = self.window_hits + self.full_searches
+        return {
+            "window_hits": self.window_hits,
+            "window_misses": self.window_misses,
+            "full_searches": self.full_searches,
+            "hit_rate": self.window_hits / total if total else 0.0,
+            "cache_hits": self.cache_hits,
+            "prefilter_skips": self.prefilter_skips,
+        }
+
+    def __call__(self, frame: CapturedFrame | np.ndarray) -> bool:
+        return self.match(frame)[0]
+
+
+class BinaryTemplateMatcher(TemplateMatcher):
+    """
+    2値化した画像どうしを比較するテンプレートマッチング。
+
+    テンプレート画像と探索範囲を同じ条件で2値化し(`ImageProcessing.doPreprocessImage`と同じ)、
+    画素を64ビット単位に詰めてXORとビット数の数え上げで比較する(`ImageProcessing.binary_match`)。
+    文字やUIの枠など、2値化して判定する画面では相関による比較より軽い。
+    類似度は一致した画素の割合(0.0〜1.0)。`match()`などの戻り値は`TemplateMatcher`と同じ。
+
+    Args:
+        template_path (str): テンプレート画像のパス
+        threshold (float): 一致と判定する一致画素の割合の閾値
+        use_gray (bool): グレースケール画像を`threshold_binary`で2値化するか。Falseの場合は`BGR_range`で2値化する
+        crop (list): 探索範囲 [x軸始点, y軸始点, x軸終点, y軸終点]。空の場合は画面全体
+        mask_path (str | None): マスク画像のパス。マスクの白い画素だけを比較する
+        threshold_binary (int | None): 2値化の閾値
+        BGR_range (dict | None): 2値化する色の範囲({'lower': [B, G, R], 'upper': [B, G, R]})
+        window_margin (int | None): `TemplateMatcher`と同じ
+    """
+
+    def __init__(
+        self,
+        template_path: str,
+        threshold: float = 0.9,
+        use_gray: bool = True,
+        crop: list = [],
+        mask_path: Optional[str] = None,
+        threshold_binary: Optional[int] = 128,
+        BGR_range: Optional[dict] = None,
+        window_margin: Optional[int] = None,
+    ):
+        super().__init__(
+            template_path, threshold, use_gray, crop, mask_path, window_margin=window_margin
+        )
+        self.threshold_binary = threshold_binary
+        self.BGR_range = BGR_range
+        # (元のテンプレート画像, 元のマスク画像, pack_binary_templateの結果)
+        self._packed = None
+
+    @property
+    def cache_key(self) -> tuple:
+        return (
+            "binary",
+            self.template_path,
+            self.mode,
+            tuple(self.crop),
+            self.mask_path,
+            self.threshold_binary,
+            None
+            if self.BGR_range is None
+            else (tuple(self.BGR_range["lower"]), tuple(self.BGR_range["upper"])),
+            self.window_margin,
+        )
+
+    def compile(self) -> BinaryTemplateMatcher:
+        if self.use_gray and self.threshold_binary is None:
+            raise ValueError(f"threshold_binary is required with use_gray=True: {self.template_path}")
+        if not self.use_gray and self.BGR_range is None:
+            raise ValueError(f"BGR_range is required with use_gray=False: {self.template_path}")
+        super().compile()
+        return self
+
+    def _load_images(self) -> tuple[np.ndarray, Optional[np.ndarray]]:
+        template = template_store.get(
+            get_template_filespec(self.template_path),
+            self.mode,
+            threshold_binary=self.threshold_binary,
+            BGR_range=self.BGR_range,
+        )
+        mask = None
+        if self.mask_path is not None:
+            mask = template_store.get(get_template_filespec(self.mask_path), "mask")
+        return template, mask
+
+    def _get_source(
+        self, frame: CapturedFrame | np.ndarray, crop: list, min_size: Optional[tuple] = None
+    ) -> tuple[np.ndarray, tuple[int, int]]:
+        src, offset = get_source_image(frame, self.use_gray, crop, min_size)
+        if not self.use_gray:
+            src = cv2.inRange(src, np.array(self.BGR_range["lower"]), np.array(self.BGR_range["upper"]))
+        if self.threshold_binary is not None:
+            _, src = cv2.threshold(src, self.threshold_binary, 255, cv2.THRESH_BINARY)
+        return src, offset
+
+    def _match_image(
+        self, src: np.ndarray, template: np.ndarray, mask: Optional[np.ndarray]
+    ) -> tuple[float, tuple[int, int]]:
+        packed = self._packed
+        if packed is None or packed[0] is not template or packed[1] is not mask:
+            # テンプレートが読み直された場合も作り直す
+            packed = (template, mask, pack_binary_template(template, mask))
+            self._packed = packed
+        return binary_match(src, template, mask, packed_template=packed[2])
+
+    def _match_map(
+        self, src: np.ndarray, template: np.ndarray, mask: Optional[np.ndarray]
+    ) -> np.ndarray:
+        return binary_match_map(src, template, mask)
+
+
+def calibrate_prefilter(
+    matcher: TemplateMatcher,
+    frames: list[CapturedFrame | np.ndarray],
+    margin: float = 1.5,
+    min_cutoff: float = 8.0,
+) -> float:
+    """
+    `TemplateMatcher.prefilter`に設定する値を求める。
+
+    `frames`のうち、テンプレートマッチング(全探索)で`matcher.threshold`以上になるフレームについて、
+    色の特徴の距離(`ImageProcessing.min_signature_distance`)の最大値を求め、`margin`倍して返す。
+    返した値を設定すれば、`frames`では閾値以上になるフレームを省略することはない。
+
+    Args:
+        matcher (TemplateMatcher): 対象のテンプレート
+        frames (list[CapturedFrame | np.ndarray]): 検証用のフレーム(テンプレートを含むフレームを含めること)
+        margin (float): 求めた最大値に掛ける余裕
+        min_cutoff (float): 返す値の最小値
+
+    Raises:
+        ValueError: 閾値以上になるフレームがない場合
+
+    Returns:
+        float: `prefilter`に設定する値
+    """
+    if not matcher._compiled:
+        matcher.compile()
+    template, mask = matcher._load_images()
+    size = (template.shape[1], template.shape[0])
+    signature = color_signature(template)
+    distances = []
+    for frame in frames:
+        src, _ = matcher._get_source(frame, matcher.crop, size)
+        score, _ = matcher._match_image(src, template, mask)
+        if score >= matcher.threshold:
+            distances.append(min_signature_distance(src, size, signature)[0])
+    if not distances:
+        raise ValueError(f"No frame reaches the threshold {matcher.threshold}: {matcher.template_path}")
+    return max(min_cutoff, max(distances) * margin)
+
+
+_match_cache_stats = {"hits": 0, "misses": 0}
+
+
+def get_match_cache_stats() -> dict:
+    """
+    フレームごとの判定結果のキャッシュの統計を返す(すべての`TemplateMatcher`の合計)。
+
+    Returns:
+        dict: hits(テンプレートマッチングを省略した回数), misses(テンプレートマッチングを行った回数), hit_rate
+    """
+    hits, misses = _match_cache_stats["hits"], _match_cache_stats["misses"]
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=min(4, os.cpu_count() or 1),
+                    thread_name_prefix="TemplateMatcher",
+                )
+    return _executor
+
+
+def _match(matcher: TemplateMatcher, frame: CapturedFrame | np.ndarray) -> tuple[bool, tuple[int, int], float]:
+    return matcher.match(frame)
+
+
+def match_all(
+    matchers: list[TemplateMatcher],
+    frame: CapturedFrame | np.ndarray,
+    parallel: bool = False,
+    match: Optional[Callable[[TemplateMatcher, CapturedFrame | np.ndarray], Any]] = None,
+) -> list:
+    """
+    同じフレームに対して複数のテンプレートを判定する。
+
+    Args:
+        matchers (list[TemplateMatcher]): 判定するテンプレート
+        frame (CapturedFrame | np.ndarray): 対象フレーム(BGR)
+        parallel (bool): スレッドプールで並列に判定するか(`cv2.matchTemplate`はGILを解放する)
+        match (Callable | None): テンプレートごとに`match(matcher, frame)`を呼ぶ(判定時間を測る場合など)。
+            Noneの場合は`matcher.match(frame)`
+
+    Returns:
+        list: `matchers`と同じ順の判定結果。`match`を指定しない場合は(判定結果、左上座標、類似度)
+    """
+    if match is None:
+        match = _match
+    if parallel and len(matchers) > 1:
+        return list(_get_executor().map(lambda matcher: match(matcher, frame), matchers))
+    return [match(matcher, frame) for matcher in matchers]
+
+
+_matchers: dict[tuple, TemplateMatcher] = {}
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(
+    template_path: str,
+    use_gray: bool = True,
+    crop: list = [],
+    mask_path: Optional[str] = None,
+    pyramid_level: int = 0,
+    threshold: float = 0.7,
+) -> TemplateMatcher:
+    """
+    引数の組に対応する`TemplateMatcher`を返す(同じ組に対しては同じオブジェクトを返す)。
+
+    パスを文字列で指定する従来の`isContainTemplate`呼び出し用。
+    `threshold`は`wait_any`などで`TemplateMatcher.threshold`を使う場合に指定する。
+    """
+    key = (template_path, use_gray, tuple(crop), mask_path, pyramid_level, threshold)
+    matcher = _matchers.get(key)
+    if matcher is None:
+        with _matchers_lock:
+            matcher = _matchers.get(key)
+            if matcher is None:
+                matcher = TemplateMatcher(
+                    template_path,
+                    threshold=threshold,
+                    use_gray=use_gray,
+                    crop=crop,
+                    mask_path=mask_path,
+                    pyramid_level=pyramid_level,
+                )
+                _matchers[key] = matcher
+    return matcher
+
+
+def get_matcher_stats() -> dict[str, dict]:
+    """
+    `get_matcher`で作成した`TemplateMatcher`ごとの統計(`TemplateMatcher.stats`)を返す。
+
+    Returns:
+        dict[str, dict]: `repr(matcher)`をキーとした統計(判定したことのあるものだけ)
+    """
+    with _matchers_lock:
+        matchers = list(_matchers.values())
+    return {
+        repr(matcher): matcher.stats()
+        for matcher in matchers
+        if matcher.window_hits or matcher.full_searches
+    }
+
+
+def preload_templates(templates: dict[str, TemplateMatcher]) -> None:
+    """
+    宣言されたテンプレートをまとめて読み込み・検証する。
+
+    Raises:
+        FileNotFoundError, ValueError: 読み込めないテンプレートがあった場合(すべて確認してから送出する)
+    """
+    errors = []
+    for name, matcher in templates.items():
+        try:
+            matcher.compile()
+        except (FileNotFoundError, ValueError) as e:
+            errors.append(f"{name}: {e}")
+    if errors:
+        for error in errors:
+            logger.error(f"Template preload failed: {error}")
+        raise FileNotFoundError("Template preload failed:\n" + "\n".join(errors))
+    if templates:
+        logger.debug(f"Preloaded {len(templates)} templates")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import cv2
+import numpy as np
+from loguru import logger
+
+from ImageProcessing import doPreprocessImage
+
+# キャッシュに保持するテンプレート画像の合計サイズの上限(バイト)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# 同じファイルの更新日時を確認する最短間隔(秒)
+DEFAULT_CHECK_INTERVAL = 1.0
+
+TEMPLATE_MODES = ("color", "gray", "mask")
+
+
+class _Entry:
+    def __init__(self, image: np.ndarray, mtime_ns: int, checked_at: float):
+        self.image = image
+        self.mtime_ns = mtime_ns
+        self.checked_at = checked_at
+
+
+class TemplateStore:
+    """
+    テンプレート画像(マスク画像を含む)を読み込み・前処理済みの状態で保持するキャッシュ。
+
+    キーは(パス, モード, crop_template, threshold_binary, BGR_range)。
+    合計サイズが上限を超えると最も長く使われていない画像から破棄する(LRU)。
+    ファイルの更新日時は`check_interval`秒に1回だけ確認し、変わっていれば読み直す。
+    返す画像は読み取り専用。
+
+    Args:
+        max_bytes (int): 保持する画像の合計サイズの上限(バイト)
+        check_interval (float): ファイルの更新日時を確認する最短間隔(秒)
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def get(
+        self,
+        path: str,
+        mode: str = "color",
+        crop_template: Optional[List[int]] = None,
+        threshold_binary: Optional[int] = None,
+        BGR_range: Optional[dict] = None,
+    ) -> np.ndarray:
+        """
+        テンプレート画像を取得する。
+
+        Args:
+            path (str): 画像ファイルのパス
+            mode (str): "color"(BGR)、"gray"(グレースケール)、"mask"(マスク画像、グレースケール)
+            crop_template (list | None): トリミング範囲 [y軸始点, y軸終点, x軸始点, x軸終点]
+            threshold_binary (int | None): 2値化の閾値
+            BGR_range (dict | None): 2値化する色の範囲({'lower': [B, G, R], 'upper': [B, G, R]})。"color"のみ有効
+
+        Returns:
+            np.ndarray: 読み取り専用のテンプレート画像
+
+        Raises:
+            FileNotFoundError: 画像を読み込めなかった場合
+        """
+        if mode not in TEMPLATE_MODES:
+            raise ValueError(f"Unknown template mode: {mode}")
+        path = os.path.abspath(path)
+        key = (
+            path,
+            mode,
+            tuple(crop_template) if crop_template else None,
+            threshold_binary,
+            _freeze_range(BGR_range) if mode == "color" else None,
+        )
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry.checked_at < self.check_interval:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.image
+                entry.checked_at = now
+                if _mtime_ns(path) == entry.mtime_ns:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.image
+                # ファイルが更新されたので読み直す
+                self._remove(key)
+                self.reloads += 1
+                logger.debug(f"Template updated: {path}")
+            self.misses += 1
+
+        mtime_ns = _mtime_ns(path)
+        image = _load(path, mode, crop_template, threshold_binary, BGR_range)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(image, mtime_ns, now)
+            self._bytes += image.nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return image
+
+    def _remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.image.nbytes
+
+    def clear(self) -> None:
+        """キャッシュを空にする"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        キャッシュの統計を返す。
+
+        Returns:
+            dict: entries, bytes, hits, misses, reloads, evictions, hit_rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def _freeze_range(BGR_range: Optional[dict]) -> Optional[tuple]:
+    if BGR_range is None:
+        return None
+    return tuple(BGR_range["lower"]), tuple(BGR_range["upper"])
+
+
+def _mtime_ns(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+def _load(
+    path: str,
+    mode: str,
+    crop_template: Optional[List[int]],
+    threshold_binary: Optional[int],
+    BGR_range: Optional[dict],
+) -> np.ndarray:
+    # cv2.imreadは日本語を含むパスを読めないため、バイト列からデコードする
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        data = None
+    flags = cv2.IMREAD_COLOR if mode == "color" else cv2.IMREAD_GRAYSCALE
+    image = cv2.imdecode(data, flags) if data is not None and data.size else None
+    if image is None:
+        raise FileNotFoundError(f"Template image cannot be loaded: {path}")
+
+    if crop_template or threshold_binary is not None or (mode == "color" and BGR_range is not None):
+        image, _, _ = doPreprocessImage(
+            image,
+            use_gray=False,
+            crop=crop_template if crop_template else None,
+            BGR_range=BGR_range if mode == "color" else None,
+            threshold_binary=threshold_binary,
+        )
+        image = np.ascontiguousarray(image)
+    image.flags.writeable = False
+    return image
+
+
+template_store = TemplateStore()
+"""プロセス全体で共有するテンプレート画像のキャッシュ"""
@@ -18,7 +18,7 @@ from pygubu.widgets.scrollbarhelper import ScrollbarHelper
 
 import Settings
 import Utility as util
-from Camera import Camera  # , CameraQueue
+from Camera import Camera, CAMERA_BACKENDS
 from CommandLoader import CommandLoader
 from Commands import McuCommandBase, PythonCommandBase, Sender
 import PokeConLogger
@@ -134,6 +134,24 @@ class PokeControllerApp:
         )
         self.show_size_cb.grid(column="4", padx="10", row="0", sticky="ew")
         self.show_size_cb.bind("<<ComboboxSelected>>", self.applyWindowSize, add="")
+        self.separator_4 = ttk.Separator(self.camera_f2)
+        self.separator_4.config(orient="vertical")
+        self.separator_4.grid(column="5", row="0", sticky="ns")
+        self.camera_backend_label = ttk.Label(self.camera_f2)
+        self.camera_backend_label.config(text="Capture:")
+        self.camera_backend_label.grid(column="6", padx="5", row="0", sticky="ew")
+        self.camera_backend_cb = ttk.Combobox(self.camera_f2)
+        self.camera_backend = tk.StringVar()
+        self.camera_backend_cb.config(
+            textvariable=self.camera_backend,
+            state="readonly",
+            values=CAMERA_BACKENDS,
+            width="8",
+        )
+        self.camera_backend_cb.grid(column="7", padx="10", row="0", sticky="ew")
+        self.camera_backend_cb.bind(
+            "<<ComboboxSelected>>", self.applyCameraBackend, add=""
+        )
         self.camera_f2.grid(column="0", columnspan="7", row="3", sticky="nsew")
         self.camera_name_l = ttk.Label(self.camera_lf)
         self.camera_name_l.config(anchor="center", text="Camera Name: ")
@@ -335,6 +353,7 @@ class PokeControllerApp:
         self.is_show_serial.set(self.settings.is_show_serial.get())
         self.is_use_keyboard.set(self.settings.is_use_keyboard.get())
         self.fps.set(self.settings.fps.get())
+        self.camera_backend.set(self.settings.camera_backend.get())
         self.show_size.set(self.settings.show_size.get())
         self.com_port.set(self.settings.com_port.get())
         self.com_port_name.set(self.settings.com_port_name.get())
@@ -374,8 +393,7 @@ class PokeControllerApp:
             )
             self.Camera_Name.config(state="disable")
         # open up a camera
-        self.camera = Camera(self.fps.get())
-        # self.camera = CameraQueue(self.fps.get(), self.camera_id.get())
+        self.camera = Camera(self.fps.get(), backend=self.camera_backend.get())
         self.openCamera()
         # activate serial communication
         self.ser = Sender.Sender(self.is_show_serial)
@@ -505,6 +523,11 @@ class PokeControllerApp:
         print("changed FPS to: " + self.fps.get() + " [fps]")
         self.preview.setFps(self.fps.get())
 
+    def applyCameraBackend(self, event: Any = None) -> None:
+        print("changed capture backend to: " + self.camera_backend.get())
+        self.camera.backend = self.camera_backend.get()
+        self.openCamera()
+
     def applyBaudRate(self, event: Any = None) -> None:
         # 未実装
         pass
@@ -553,6 +576,7 @@ class PokeControllerApp:
                 logger.debug(
                     "COM Port " + str(self.com_port.get()) + " connected successfully"
                 )
+                self.ser.negotiateProtocol(self.settings.serial_protocol.get())
                 self.keyPress = KeyPress(self.ser)
                 self.settings.com_port.set(self.com_port.get())
                 self.settings.baud_rate.set(self.baud_rate.get())
@@ -737,6 +761,7 @@ class PokeControllerApp:
             self.settings.is_show_serial.set(self.is_show_serial.get())
             self.settings.is_use_keyboard.set(self.is_use_keyboard.get())
             self.settings.fps.set(self.fps.get())
+            self.settings.camera_backend.set(self.camera_backend.get())
             self.settings.show_size.set(self.show_size.get())
             self.settings.com_port.set(self.com_port.get())
             self.settings.baud_rate.set(self.baud_rate.get())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ベンチマーク共通の処理
+
+SerialControllerディレクトリから `python -m benchmarks.<name>` で実行する。
+カメラやシリアルは使わず、Template/以下の画像をフレームとして使う。
+"""
+from __future__ import annotations
+
+import glob
+import os
+import statistics
+import time
+from typing import Callable
+
+import cv2
+import numpy as np
+
+SERIAL_CONTROLLER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_DIR = os.path.join(SERIAL_CONTROLLER_DIR, "Template")
+
+# 1280x720のスクリーンショット(フレームの代わりに使う)
+SCREEN_PATTERNS = [
+    "Macro/rokkuman_exe/2025-05-*.png",
+    "Samples/OP.png",
+    "Samples/sample.png",
+    "Samples/sample_color_HLS.png",
+]
+
+
+def imread(path: str, flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    """Template/からの相対パスで画像を読み込む(日本語パス対応)"""
+    if not os.path.isabs(path):
+        path = os.path.join(TEMPLATE_DIR, path)
+    image = cv2.imdecode(np.fromfile(path, dtype=np.uint8), flags)
+    if image is None:
+        raise FileNotFoundError(path)
+    return image
+
+
+def load_screens(patterns: list[str] | None = None) -> dict[str, np.ndarray]:
+    """1280x720のスクリーンショットを読み込む"""
+    screens = {}
+    for pattern in patterns or SCREEN_PATTERNS:
+        for path in sorted(glob.glob(os.path.join(TEMPLATE_DIR, pattern))):
+            screens[os.path.relpath(path, TEMPLATE_DIR)] = imread(path)
+    return screens
+
+
+def measure(func: Callable[[], object], repeat: int = 200, warmup: int = 5) -> dict[str, float]:
+    """
+    関数の実行時間を計測する
+
+    Returns:
+        dict[str, float]: 中央値・p95・平均(マイクロ秒)
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {
+        "median": statistics.median(samples),
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "mean": statistics.fmean(samples),
+    }
+
+
+def print_table(rows: list[list[object]], header: list[str]) -> None:
+    """計測結果を表形式で表示する"""
+    table = [header] + [[f"{c:.1f}" if isinstance(c, float) else str(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in table) for i in range(len(header))]
+    for n, row in enumerate(table):
+        print("  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(row)))
+        if n == 0:
+            print("  ".join("-" * w for w in widths))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptiveによる待機時間の短縮の試算
+
+遷移の所要時間を対数正規分布で模擬し、固定の待機時間(default)とAdaptive(分位点pに余裕を足した時間)で
+ループを回した場合の合計待機時間と、待機時間が実際の所要時間より短かった回数(操作が早すぎた回数)を比べる。
+観測する回は(実機と同じく)遷移が終わった時点で進むものとする。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.adaptive_wait
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+
+import numpy as np
+
+from AdaptiveWait import Adaptive, TransitionLog
+from benchmarks._bench import print_table
+
+ITERATIONS = 2000
+# (名前, 固定の待機時間, 所要時間の中央値, 対数の標準偏差)
+TRANSITIONS = [
+    ("menu", 1.0, 0.35, 0.15),
+    ("next", 3.0, 1.2, 0.2),
+    ("trade", 2.0, 0.9, 0.35),
+]
+QUANTILES = [0.95, 0.99, 0.999]
+
+
+def main():
+    rng = np.random.default_rng(0)
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, default, median, sigma in TRANSITIONS:
+            latencies = median * np.exp(rng.normal(0, sigma, ITERATIONS))
+            for p in QUANTILES:
+                log = TransitionLog(os.path.join(directory, f"{name}_{p}.json"))
+                total = 0.0
+                early = 0
+                observed = 0
+                for latency in latencies:
+                    adaptive = Adaptive(name, p=p, default=default, log=log)
+                    if adaptive.should_observe():
+                        waited = min(latency, default)
+                        adaptive.record(waited if latency < default else default)
+                        observed += 1
+                    else:
+                        waited = float(adaptive)
+                        early += waited < latency
+                    total += waited
+                fixed = default * ITERATIONS
+                rows.append([
+                    f"{name} p={p}", fixed, total, f"{1.0 - total / fixed:.0%}",
+                    f"{early}/{ITERATIONS - observed}", f"{observed}",
+                ])
+    print_table(rows, ["transition", "fixed(s)", "adaptive(s)", "saved", "too early", "observed"])
+
+
+if __name__ == "__main__":
+    main()
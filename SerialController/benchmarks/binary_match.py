@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+2値化した画像のテンプレートマッチングの計測
+
+変更前: 2値化した画像(0/255)どうしをcv2.matchTemplate(TM_CCOEFF_NORMED)で比較
+変更後: ImageProcessing.binary_match
+    bits: 画素をビットに詰めてXORとビット数の数え上げで比較
+    auto: 探索範囲がテンプレートと同じ大きさの場合や、テンプレートが大きく探索範囲が狭い場合はbits、
+          それ以外はcv2.matchTemplate(TM_SQDIFF)
+
+各スクリーンショットの探索範囲にテンプレートを貼り付けた画像で、両方が貼り付けた位置を見つけたかも数える。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.binary_match
+"""
+from __future__ import annotations
+
+import cv2
+
+from ImageProcessing import binary_match, pack_binary_template
+from benchmarks._bench import imread, load_screens, measure, print_table
+
+THRESHOLD_BINARY = 128
+
+# (テンプレート, crop[x0, y0, x1, y1]) マクロで使っている組み合わせと、それより広い範囲
+CASES = [
+    ("Macro/rokkuman_exe/network_initial_screen.png", [130, 125, 330, 145]),
+    ("Macro/rokkuman_exe/network_initial_screen.png", [0, 0, 640, 360]),
+    ("Macro/rokkuman_exe/mainmenu_trade_selected.png", [130, 190, 390, 215]),
+    ("Macro/rokkuman_exe/trade_partner_available.png", [830, 200, 880, 230]),
+    ("Macro/rokkuman_exe/trade_partner_available.png", [600, 100, 1100, 400]),
+    ("Macro/rokkuman_exe/network_battle_list.png", [1040, 144, 1162, 175]),
+    ("Macro/rokkuman_exe/communication_error.png", [400, 220, 850, 500]),
+    ("Samples/shiny_mark.png", []),
+]
+
+
+def binarize(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    return cv2.threshold(gray, THRESHOLD_BINARY, 255, cv2.THRESH_BINARY)[1]
+
+
+def main():
+    screens = load_screens(["Macro/rokkuman_exe/2025-05-*.png"])
+    rows = []
+    for template_path, crop in CASES:
+        template_bgr = imread(template_path)
+        template = binarize(template_bgr)
+        packed = pack_binary_template(template)
+        h, w = template.shape
+        found_ccoeff = 0
+        found_binary = 0
+        sources = []
+        for screen in screens.values():
+            x0, y0, x1, y1 = crop if crop else [0, 0, screen.shape[1], screen.shape[0]]
+            # 探索範囲の中央付近にテンプレートを貼り付ける
+            px, py = x0 + (x1 - x0 - w) // 3, y0 + (y1 - y0 - h) // 3
+            image = screen.copy()
+            image[py : py + h, px : px + w] = template_bgr
+            src = binarize(image[y0:y1, x0:x1])
+            sources.append(src)
+            expected = (px - x0, py - y0)
+            _, _, _, loc = cv2.minMaxLoc(cv2.matchTemplate(src, template, cv2.TM_CCOEFF_NORMED))
+            _, bin_loc = binary_match(src, template, packed_template=packed, engine="bits")
+            found_ccoeff += loc == expected
+            found_binary += bin_loc == expected
+
+        src = sources[0]
+        before = measure(lambda: cv2.minMaxLoc(cv2.matchTemplate(src, template, cv2.TM_CCOEFF_NORMED)), repeat=50)
+        bits = measure(lambda: binary_match(src, template, packed_template=packed, engine="bits"), repeat=50)
+        auto = measure(lambda: binary_match(src, template, packed_template=packed), repeat=50)
+        rows.append([
+            f"{template_path} {crop}",
+            f"{w}x{h} in {src.shape[1]}x{src.shape[0]}",
+            before["median"],
+            bits["median"],
+            auto["median"],
+            before["median"] / auto["median"],
+            f"{found_ccoeff}/{len(sources)}",
+            f"{found_binary}/{len(sources)}",
+        ])
+    print_table(rows, ["template", "size", "ccoeff(us)", "bits(us)", "auto(us)", "x", "ccoeff found", "binary found"])
+
+
+if __name__ == "__main__":
+    main()
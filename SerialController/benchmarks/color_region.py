@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+色の範囲による領域検出の計測(1280x720のスクリーンショット)
+
+変更前: cv2.inRange + cv2.findContoursで輪郭を求め、Pythonのループで輪郭ごとに面積と矩形を計算する
+変更後: ImageProcessing.ColorRegionDetector(set_rangeで用意した上限・下限による1回のcv2.inRange
+        + connectedComponentsWithStats。0をまたぐHの範囲は2回のinRangeの論理和)
+範囲の変更(スライダーの操作)にかかる時間(set_range)も計測する。
+
+検出は速くならない: 画面全体では変更前の輪郭のループの0.5〜0.7倍の速さ(シングルスレッドのOpenCVでは
+connectedComponentsWithStatsがfindContoursより遅いため)。変更の利点は結果を配列で返すことと、
+範囲の変更が安いこと。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.color_region
+"""
+from __future__ import annotations
+
+import cv2
+import numpy as np
+
+from ImageProcessing import ColorRegionDetector
+from benchmarks._bench import load_screens, measure, print_table
+
+# (名前, HSVの下限, HSVの上限)
+RANGES = [
+    ("blue", [115, 95, 0], [135, 255, 248]),
+    ("white", [0, 0, 200], [179, 40, 255]),
+    ("dark", [0, 0, 0], [179, 255, 60]),
+]
+MIN_AREA = 100
+
+
+def detect_contours(image: np.ndarray, lower: list, upper: list) -> list[tuple[int, int, int, int]]:
+    """変更前の検出(輪郭ごとにループ)"""
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = []
+    for contour in contours:
+        if cv2.contourArea(contour) > MIN_AREA:
+            x, y, w, h = cv2.boundingRect(contour)
+            boxes.append((x, y, x + w, y + h))
+    return boxes
+
+
+def main():
+    screens = list(load_screens().values())
+    rows = []
+    for name, lower, upper in RANGES:
+        detector = ColorRegionDetector(lower, upper, min_area=MIN_AREA)
+        same_mask = all(
+            (detector.mask(image) == cv2.inRange(cv2.cvtColor(image, cv2.COLOR_BGR2HSV), np.array(lower), np.array(upper))).all()
+            for image in screens
+        )
+        contour_time = measure(lambda: [detect_contours(image, lower, upper) for image in screens], repeat=10, warmup=1)
+        detector_time = measure(lambda: [detector.detect(image) for image in screens], repeat=10, warmup=1)
+        set_range = measure(lambda: detector.set_range(lower, upper), repeat=100)
+        regions = sum(len(detector.detect(image)[0]) for image in screens)
+        contours = sum(len(detect_contours(image, lower, upper)) for image in screens)
+        rows.append([
+            name,
+            contour_time["median"] / len(screens),
+            detector_time["median"] / len(screens),
+            contour_time["median"] / detector_time["median"],
+            set_range["median"],
+            f"{contours}/{regions}",
+            "same" if same_mask else "DIFFERENT",
+        ])
+    print_table(rows, ["range", "contours(us)", "detector(us)", "x", "set_range(us)", "regions (old/new)", "mask"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同じテンプレートを複数探す処理の計測
+
+1. 画面全体に貼り付けたテンプレートの数を数える
+   変更前: 1件ずつ探し、見つかった位置を塗りつぶして閾値を下回るまで繰り返す(マッチングを繰り返し呼ぶ)
+   変更後: ImageProcessing.find_all(1回の類似度マップから閾値処理とNMS)
+2. 重なった矩形の除去(color_detect_sample.filter_overlapping_boxes)
+   変更前: 全ての組をPythonのループでIoU計算
+   変更後: ImageProcessing.box_iouでまとめて計算
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.find_all
+"""
+from __future__ import annotations
+
+import cv2
+import numpy as np
+
+from Commands.PythonCommands.color_detect_sample import filter_overlapping_boxes
+from ImageProcessing import find_all
+from benchmarks._bench import imread, measure, print_table
+
+TEMPLATE = "Samples/shiny_mark.png"
+SCREEN = "Samples/sample.png"
+THRESHOLD = 0.8
+COUNTS = [1, 5, 20]
+BOX_COUNTS = [20, 100, 400]
+
+
+def find_all_loop(image: np.ndarray, template: np.ndarray, threshold: float) -> list[tuple[int, int]]:
+    """1件ずつ探し、見つかった位置を塗りつぶして繰り返す"""
+    image = image.copy()
+    h, w = template.shape[:2]
+    found = []
+    while True:
+        res = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, (x, y) = cv2.minMaxLoc(res)
+        if max_val < threshold:
+            return found
+        found.append((x, y))
+        image[y : y + h, x : x + w] = 0
+
+
+def filter_overlapping_boxes_loop(boxes: list, iou_threshold: float = 0.25) -> list:
+    """変更前のfilter_overlapping_boxes(全ての組をループで比較)"""
+    keep_boxes = []
+    for i, box1 in enumerate(boxes):
+        keep = True
+        for j, box2 in enumerate(boxes):
+            if i != j:
+                x1, y1 = max(box1[0], box2[0]), max(box1[1], box2[1])
+                x2, y2 = min(box1[2], box2[2]), min(box1[3], box2[3])
+                if x2 <= x1 or y2 <= y1:
+                    continue
+                inter = (x2 - x1) * (y2 - y1)
+                area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
+                area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
+                if inter / (area1 + area2 - inter) > iou_threshold and area1 < area2:
+                    keep = False
+                    break
+        if keep:
+            keep_boxes.append(box1)
+    return keep_boxes
+
+
+def main():
+    template = imread(TEMPLATE, cv2.IMREAD_GRAYSCALE)
+    screen = imread(SCREEN, cv2.IMREAD_GRAYSCALE)
+    h, w = template.shape[:2]
+    rng = np.random.default_rng(0)
+
+    rows = []
+    for count in COUNTS:
+        image = screen.copy()
+        # 重ならない格子上の位置に貼り付ける
+        cells = [(x, y) for y in range(0, screen.shape[0] - h, h + 4) for x in range(0, screen.shape[1] - w, w + 4)]
+        for i in rng.choice(len(cells), count, replace=False):
+            x, y = cells[i]
+            image[y : y + h, x : x + w] = template
+
+        loop_found = find_all_loop(image, template, THRESHOLD)
+        boxes, _ = find_all(image, template, THRESHOLD)
+        same = sorted(loop_found) == sorted((int(b[0]), int(b[1])) for b in boxes)
+        loop = measure(lambda: find_all_loop(image, template, THRESHOLD), repeat=10, warmup=1)
+        vectorized = measure(lambda: find_all(image, template, THRESHOLD), repeat=10, warmup=1)
+        rows.append([f"{count} templates", loop["median"], vectorized["median"],
+                     loop["median"] / vectorized["median"], f"{len(boxes)} ({'same' if same else 'DIFFERENT'})"])
+    print_table(rows, ["find all", "loop(us)", "find_all(us)", "x", "found"])
+    print()
+
+    rows = []
+    for count in BOX_COUNTS:
+        xy = rng.integers(0, 1200, (count, 2))
+        wh = rng.integers(10, 80, (count, 2))
+        boxes = [(int(x), int(y), int(x + bw), int(y + bh)) for (x, y), (bw, bh) in zip(xy, wh)]
+        same = filter_overlapping_boxes_loop(boxes) == filter_overlapping_boxes(boxes)
+        loop = measure(lambda: filter_overlapping_boxes_loop(boxes), repeat=10, warmup=1)
+        vectorized = measure(lambda: filter_overlapping_boxes(boxes), repeat=10, warmup=1)
+        rows.append([f"{count} boxes", loop["median"], vectorized["median"],
+                     loop["median"] / vectorized["median"], "same" if same else "DIFFERENT"])
+    print_table(rows, ["overlap filter", "loop(us)", "vectorized(us)", "x", "result"])
+
+
+if __name__ == "__main__":
+    main()
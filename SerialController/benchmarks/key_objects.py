@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Direction / Touchscreen を大量に作ったときのメモリ・ロガーのハンドラ数・時間の計測
+
+変更前: インスタンスごとにモジュールのロガーへNullHandlerを追加し(ハンドラが増え続ける)、
+        Directionは毎回cos/sinを計算する
+変更後: __slots__の変更できない値オブジェクトで、ロガーを持たない。
+        角度・倒す量から位置を求めた結果は表(_stickPosition)に保持する
+
+マウスでスティックを操作する場合のように、角度を少しずつ変えながら作る。
+変更後は100万回作ってもメモリ(tracemalloc)とハンドラ数が増えないことを確認する
+(増えていた場合はAssertionError。KeyPress・SendFormatも含めた確認はtests/test_key_objects.py)。
+変更前はハンドラの追加が件数に比例して遅くなるため、OLD_COUNT回だけ作る。
+時間はtracemallocを有効にした状態で測るため、実際より遅い(変更前後の比較にのみ使う)。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.key_objects
+"""
+from __future__ import annotations
+
+import logging
+import math
+import time
+import tracemalloc
+from logging import DEBUG, NullHandler, getLogger
+
+from Commands.Keys import Direction, Stick, Touchscreen
+from benchmarks._bench import print_table
+
+COUNT = 1_000_000
+OLD_COUNT = 20_000
+CHECKPOINTS = 5
+# 「増えていない」とみなすメモリの増加(バイト)
+FLAT_BYTES = 64 * 1024
+
+
+class OldDirection:
+    """変更前のDirection(角度で指定する場合のみ)"""
+
+    def __init__(self, stick, angle, magnification=1.0, isDegree=True, showName=None):
+        self._logger = getLogger(__name__)
+        self._logger.addHandler(NullHandler())
+        self._logger.setLevel(DEBUG)
+        self._logger.propagate = True
+
+        self.stick = stick
+        self.angle_for_show = angle
+        self.showName = showName
+        self.mag = min(1.0, max(0.0, magnification))
+        angle = math.radians(angle) if isDegree else angle
+        self.x = math.ceil(127.5 * math.cos(angle) * self.mag + 127.5)
+        self.y = math.floor(127.5 * math.sin(angle) * self.mag + 127.5)
+
+
+class OldTouchscreen:
+    """変更前のTouchscreen"""
+
+    def __init__(self, x, y):
+        self._logger = getLogger(__name__)
+        self._logger.addHandler(NullHandler())
+        self._logger.setLevel(DEBUG)
+        self._logger.propagate = True
+
+        self.x = x
+        self.y = y
+
+
+def make_direction(cls, i: int):
+    # マウスの動きのように、角度(1度刻み)と倒す量が少しずつ変わる
+    return cls(Stick.LEFT, i % 360, 0.6 + (i % 5) * 0.1)
+
+
+def make_touchscreen(cls, i: int):
+    return cls(i % 320, i % 240)
+
+
+def run(cls, make, count: int, logger_name: str) -> list:
+    """
+    `count`回作り、途中のメモリとハンドラ数を記録する
+
+    Returns:
+        list: [1回あたりの時間(us), 区切りごとのメモリ(バイト)のリスト, 区切りごとのハンドラ数のリスト]
+    """
+    logger = logging.getLogger(logger_name)
+    step = count // CHECKPOINTS
+    memory = []
+    handlers = []
+    elapsed = 0.0
+    tracemalloc.start()
+    for chunk in range(CHECKPOINTS):
+        start = time.perf_counter()
+        for i in range(chunk * step, (chunk + 1) * step):
+            make(cls, i)
+        elapsed += time.perf_counter() - start
+        memory.append(tracemalloc.get_traced_memory()[0])
+        handlers.append(len(logger.handlers))
+    tracemalloc.stop()
+    return [elapsed / count * 1e6, memory, handlers]
+
+
+def main():
+    rows = []
+    flat = True
+    for name, cls, old_cls, make in [
+        ("Direction", Direction, OldDirection, make_direction),
+        ("Touchscreen", Touchscreen, OldTouchscreen, make_touchscreen),
+    ]:
+        old_logger = logging.getLogger(__name__)
+        old_logger.handlers.clear()
+        old_time, old_memory, old_handlers = run(old_cls, make, OLD_COUNT, __name__)
+        old_logger.handlers.clear()
+        new_time, new_memory, new_handlers = run(cls, make, COUNT, "Commands.Keys")
+        growth = new_memory[-1] - new_memory[0]
+        flat &= growth < FLAT_BYTES and new_handlers[0] == new_handlers[-1]
+        rows.append([f"{name} before x{OLD_COUNT}", old_time,
+                     f"{old_memory[0] / 1024:.0f} -> {old_memory[-1] / 1024:.0f}",
+                     f"{old_handlers[0]} -> {old_handlers[-1]}"])
+        rows.append([f"{name} after x{COUNT}", new_time,
+                     f"{new_memory[0] / 1024:.0f} -> {new_memory[-1] / 1024:.0f}",
+                     f"{new_handlers[0]} -> {new_handlers[-1]}"])
+    print_table(rows, ["objects", "us/object", "memory(KiB)", "handlers"])
+    print()
+    print("memory and handlers after change: " + ("flat" if flat else "GROWING"))
+    assert flat, "memory or logger handlers grow with the number of objects"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ボタンを押す・離す処理(KeyPress.input/inputEnd)の計測
+
+変更前: 送信内容をOrderedDictで持ち、毎回dictのコピー・種類ごとのリスト作成・16進数の文字列の組み立てを行い、
+        Sender.writeRowで改行を足してエンコードする
+変更後: 送信内容を1つの整数で持ち、種類の振り分けは1回のループで行い、
+        状態ごとにキャッシュしたバイト列をSender.writeBytesでそのまま送る
+
+シリアルには書き込まない(write()は何もしない)。1回あたりの時間は押す+離す(2フレーム)。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.keypress
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+
+from Commands.Keys import Button, Direction, Hat, KeyPress, Stick, Tilt, center
+from Commands.Sender import Sender
+from benchmarks._bench import measure, print_table
+
+CASES = [
+    ("Button.A", Button.A),
+    ("[Button.A, Button.B]", [Button.A, Button.B]),
+    ("Hat.TOP", Hat.TOP),
+    ("Direction.UP", Direction.UP),
+    ("[Direction.LEFT, Direction.R_UP]", [Direction.LEFT, Direction.R_UP]),
+]
+REPEAT = 2000
+
+
+class NullSerial:
+    def write(self, data):
+        return len(data)
+
+
+class NotShown:
+    def get(self):
+        return False
+
+
+class OldSendFormat:
+    """変更前のSendFormat(Arduino向けの処理のみ)"""
+
+    def __init__(self):
+        self.format = OrderedDict([
+            ('btn', 0), ('hat', Hat.CENTER), ('lx', center), ('ly', center),
+            ('rx', center), ('ry', center), ('sx', 0), ('sy', 0),
+        ])
+        self.L_stick_changed = False
+        self.R_stick_changed = False
+        self.Hat_pos = Hat.CENTER
+
+    def setButton(self, btns):
+        for btn in btns:
+            self.format['btn'] |= btn
+
+    def unsetButton(self, btns):
+        for btn in btns:
+            self.format['btn'] &= ~btn
+
+    def setHat(self, btns):
+        if not btns:
+            self.format['hat'] = self.Hat_pos
+        else:
+            self.Hat_pos = btns[0]
+            self.format['hat'] = btns[0]
+
+    def unsetHat(self):
+        self.Hat_pos = Hat.CENTER
+        self.format['hat'] = self.Hat_pos
+
+    def setAnyDirection(self, dirs):
+        for dir in dirs:
+            if dir.stick == Stick.LEFT:
+                if self.format['lx'] != dir.x or self.format['ly'] != 255 - dir.y:
+                    self.L_stick_changed = True
+                self.format['lx'] = dir.x
+                self.format['ly'] = 255 - dir.y
+            elif dir.stick == Stick.RIGHT:
+                if self.format['rx'] != dir.x or self.format['ry'] != 255 - dir.y:
+                    self.R_stick_changed = True
+                self.format['rx'] = dir.x
+                self.format['ry'] = 255 - dir.y
+
+    def unsetDirection(self, dirs):
+        if Tilt.UP in dirs or Tilt.DOWN in dirs:
+            self.format['ly'] = center
+            self.format['lx'] = self.fixOtherAxis(self.format['lx'])
+            self.L_stick_changed = True
+        if Tilt.RIGHT in dirs or Tilt.LEFT in dirs:
+            self.format['lx'] = center
+            self.format['ly'] = self.fixOtherAxis(self.format['ly'])
+            self.L_stick_changed = True
+        if Tilt.R_UP in dirs or Tilt.R_DOWN in dirs:
+            self.format['ry'] = center
+            self.format['rx'] = self.fixOtherAxis(self.format['rx'])
+            self.R_stick_changed = True
+        if Tilt.R_RIGHT in dirs or Tilt.R_LEFT in dirs:
+            self.format['rx'] = center
+            self.format['ry'] = self.fixOtherAxis(self.format['ry'])
+            self.R_stick_changed = True
+
+    def fixOtherAxis(self, fix_target):
+        if fix_target == center:
+            return center
+        return 0 if fix_target < center else 255
+
+    def convert2str(self):
+        space = ' '
+        str_L = ''
+        str_R = ''
+        send_btn = int(self.format['btn']) << 2
+        if self.L_stick_changed:
+            send_btn |= 0x2
+            str_L = format(self.format['lx'], 'x') + space + format(self.format['ly'], 'x')
+        if self.R_stick_changed:
+            send_btn |= 0x1
+            str_R = format(self.format['rx'], 'x') + space + format(self.format['ry'], 'x')
+        str_Hat = str(int(self.format['hat']))
+        str_format = format(send_btn, '#06x') + \
+            (space + str_Hat) + \
+            (space + str_L if self.L_stick_changed else '') + \
+            (space + str_R if self.R_stick_changed else '')
+        self.L_stick_changed = False
+        self.R_stick_changed = False
+        return str_format
+
+
+class OldKeyPress:
+    """変更前のKeyPress.input/inputEnd(Arduino向けの処理のみ)"""
+
+    def __init__(self, ser: Sender):
+        self.ser = ser
+        self.format = OldSendFormat()
+        self.holdButton = []
+
+    def input(self, btns):
+        self._pushing = dict(self.format.format)
+        if not isinstance(btns, list):
+            btns = [btns]
+        for btn in self.holdButton:
+            if btn not in btns:
+                btns.append(btn)
+        self.format.setButton([btn for btn in btns if type(btn) is Button])
+        self.format.setHat([btn for btn in btns if type(btn) is Hat])
+        self.format.setAnyDirection([btn for btn in btns if type(btn) is Direction])
+        self.ser.writeRow(self.format.convert2str())
+
+    def inputEnd(self, btns, unset_hat=True):
+        self.pushing2 = dict(self.format.format)
+        if not isinstance(btns, list):
+            btns = [btns]
+        tilts = []
+        for dir in [btn for btn in btns if type(btn) is Direction]:
+            for tilting in dir.getTilting():
+                tilts.append(tilting)
+        self.format.unsetButton([btn for btn in btns if type(btn) is Button])
+        if unset_hat:
+            self.format.unsetHat()
+        self.format.unsetDirection(tilts)
+        self.ser.writeRow(self.format.convert2str())
+
+
+def main():
+    sender = Sender(NotShown())
+    sender.ser = NullSerial()
+    rows = []
+    for name, buttons in CASES:
+        old = OldKeyPress(sender)
+        new = KeyPress(sender)
+
+        def press(keys):
+            keys.input(buttons)
+            keys.inputEnd(buttons)
+
+        old_time = measure(lambda: press(old), repeat=REPEAT, warmup=10)["median"]
+        new_time = measure(lambda: press(new), repeat=REPEAT, warmup=10)["median"]
+        rows.append([name, old_time, new_time, old_time / new_time, f"{1e6 / new_time:.0f}"])
+    print_table(rows, ["buttons", "before(us)", "after(us)", "x", "presses/s"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+動き検出(Camera.MotionDetector)の計測
+
+1. キャプチャスレッドで毎フレーム行う処理(縮小・差分)の時間
+2. 演出の代わりにスクロールする画面を60フレーム流した後に静止画面を流し、
+   wait_until_settledと同じ判定(動いた画素の割合が閾値以下のフレームが続く)で
+   静止後何フレームで止まったと判定されるか、動いている間に誤って止まったと判定しないかを確認する。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.motion
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from Camera import CapturedFrame, MotionDetector
+from benchmarks._bench import load_screens, measure, print_table
+
+MOVING_FRAMES = 60
+STILL_FRAMES = 60
+QUIET_FRAMES = 10
+THRESHOLD = 0.002
+
+
+def main():
+    screens = load_screens()
+    rng = np.random.default_rng(0)
+    rows = []
+    for name, screen in screens.items():
+        detector = MotionDetector()
+        seq = 0
+
+        def feed(image):
+            nonlocal seq
+            seq += 1
+            return detector.update(CapturedFrame(seq, 0.0, image))
+
+        # 1フレームあたりの処理時間(縮小画像を作るところから)
+        timing = measure(lambda: feed(screen), repeat=100)
+
+        detector.reset()
+        quiet = 0
+        false_settle = False
+        settled_after = None
+        for i in range(MOVING_FRAMES + STILL_FRAMES):
+            if i < MOVING_FRAMES:
+                image = np.roll(screen, 4 * i, axis=1)
+            else:
+                image = screen
+            # キャプチャのノイズ
+            noisy = np.clip(image.astype(np.int16) + rng.integers(-2, 3, image.shape), 0, 255).astype(np.uint8)
+            sample = feed(noisy)
+            if sample is None:
+                continue
+            quiet = quiet + 1 if sample.energy <= THRESHOLD else 0
+            if quiet >= QUIET_FRAMES:
+                if i < MOVING_FRAMES:
+                    false_settle = True
+                elif settled_after is None:
+                    settled_after = i - MOVING_FRAMES + 1
+        rows.append([name, timing["median"], timing["p95"], "yes" if false_settle else "no", str(settled_after)])
+    print_table(rows, ["screen", "update(us)", "p95(us)", "settled while moving", "settled after (frames)"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PythonCommand.waitの待機方式の計測
+
+変更前: 0.1秒以下は time.perf_counter() の回転待ち、それより長い場合は time.sleep
+変更後: PrecisionTimer(期限の直前までEvent.waitで眠り、残りだけ回転待ち)
+
+待機時間ごとに、誤差(実際に戻った時刻 - 期限)とCPU時間(待機時間に対する割合)を比べる。
+また、1秒の待機を0.1秒後に中断したときに戻るまでの遅れ(停止要求への応答)を比べる。
+
+最後に、スリープがタイマーの刻み(Windowsの既定の15.625ms、timeBeginPeriod(1)後の1ms)に
+切り上げられる環境を模して、回転待ちの上限(変更前の20ms、MAX_SPIN_MARGIN)ごとの誤差とCPU時間を比べる。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.precision_timer
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+
+import numpy as np
+
+import PrecisionTimer as precision_timer
+from PrecisionTimer import MAX_SPIN_MARGIN, PrecisionTimer
+from benchmarks._bench import print_table
+
+DURATIONS = [0.001, 0.01, 0.05, 0.1, 0.3]
+REPEAT = 100
+COARSE_DURATIONS = [0.01, 0.05]
+# (タイマーの刻み(秒), 回転待ちの上限(秒))
+COARSE_CASES = [(0.015625, 0.02), (0.015625, MAX_SPIN_MARGIN), (0.001, MAX_SPIN_MARGIN)]
+
+
+class CoarseEvent(threading.Event):
+    """待機の終わりをタイマーの刻みまで切り上げるEvent(OSのタイマー分解能の代わり)"""
+
+    def __init__(self, tick: float):
+        super().__init__()
+        self.tick = tick
+
+    def wait(self, timeout=None):
+        if timeout is not None:
+            now = time.perf_counter()
+            timeout = (math.floor((now + timeout) / self.tick) + 1) * self.tick - now
+        return super().wait(timeout)
+
+
+def old_wait(wait: float, stop: threading.Event) -> None:
+    """変更前のwait(中断は待機後のcheckIfAliveでのみ判定)"""
+    if wait > 0.1:
+        time.sleep(wait)
+    else:
+        current_time = time.perf_counter()
+        while time.perf_counter() < current_time + wait:
+            pass
+
+
+def measure_wait(func, duration: float) -> tuple[np.ndarray, float]:
+    errors = []
+    cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(duration)
+        errors.append(time.perf_counter() - start - duration)
+    cpu = (time.thread_time() - cpu_start) / (time.perf_counter() - wall_start)
+    return np.array(errors) * 1e6, cpu
+
+
+def stop_latency(func, stop) -> float:
+    """1秒の待機を0.1秒後に中断し、中断してから戻るまでの時間(ミリ秒)"""
+    returned = []
+    thread = threading.Thread(target=lambda: (func(1.0), returned.append(time.perf_counter())))
+    thread.start()
+    time.sleep(0.1)
+    stopped = time.perf_counter()
+    stop()
+    thread.join()
+    return (returned[0] - stopped) * 1e3
+
+
+def coarse_timer(tick: float, max_margin: float) -> PrecisionTimer:
+    precision_timer.MAX_SPIN_MARGIN = max_margin
+    timer = PrecisionTimer()
+    timer._spin_margin = max_margin
+    timer._cancel = CoarseEvent(tick)
+    # 回転待ちの時間が遅れの分布に合うまで待機しておく
+    for _ in range(REPEAT):
+        timer.sleep(0.005)
+    return timer
+
+
+def main():
+    timer = PrecisionTimer()
+    print(f"spin margin: {timer.spin_margin * 1e6:.0f}us")
+    never = threading.Event()
+    rows = []
+    for duration in DURATIONS:
+        old_errors, old_cpu = measure_wait(lambda d: old_wait(d, never), duration)
+        new_errors, new_cpu = measure_wait(timer.sleep, duration)
+        rows.append([
+            f"{duration * 1e3:g}ms",
+            float(np.median(old_errors)), float(np.percentile(old_errors, 99)), f"{old_cpu:.0%}",
+            float(np.median(new_errors)), float(np.percentile(new_errors, 99)), f"{new_cpu:.0%}",
+        ])
+    print_table(rows, ["wait", "old p50(us)", "old p99(us)", "old cpu", "new p50(us)", "new p99(us)", "new cpu"])
+    print()
+
+    old = stop_latency(lambda d: old_wait(d, never), lambda: None)
+    timer.reset()
+    new = stop_latency(timer.sleep, timer.cancel)
+    print(f"stop during 1s wait: old {old:.1f}ms, new {new:.2f}ms")
+    print(timer.stats())
+    print()
+
+    rows = []
+    for tick, max_margin in COARSE_CASES:
+        timer = coarse_timer(tick, max_margin)
+        for duration in COARSE_DURATIONS:
+            errors, cpu = measure_wait(timer.sleep, duration)
+            rows.append([
+                f"{tick * 1e3:g}ms", f"{max_margin * 1e3:g}ms", f"{duration * 1e3:g}ms",
+                timer.spin_margin * 1e6, float(np.median(errors)), float(np.percentile(errors, 99)), f"{cpu:.0%}",
+            ])
+    precision_timer.MAX_SPIN_MARGIN = MAX_SPIN_MARGIN
+    print("coarse OS timer (sleeps rounded up to the tick)")
+    print_table(rows, ["tick", "max spin", "wait", "spin(us)", "p50(us)", "p99(us)", "cpu"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+色の特徴による事前判定(TemplateMatcher.prefilter)の検証と計測
+
+エグゼのマクロでカラー(use_gray=False, 閾値0.95)で判定しているテンプレートについて、
+1. 校正用のフレームでcalibrate_prefilterにより値を求め、
+2. 別の乱数で作った検証用のフレームで、全探索で閾値以上になるのに省略してしまったフレーム(見逃し)が
+   ないことを確認し、省略できた割合と時間を計測する。
+
+フレームはスクリーンショットの探索範囲にテンプレートを貼り付けたもの(含む)と、そのままのもの(含まない)に、
+明るさ・コントラストのずれとノイズを加えて作る。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.prefilter_validation
+"""
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from Camera import CapturedFrame
+from TemplateMatcher import TemplateMatcher, calibrate_prefilter
+from benchmarks._bench import imread, load_screens, print_table
+
+# (テンプレート, crop[x0, y0, x1, y1]) エグゼのマクロでカラーで判定しているもの
+CASES = [
+    ("Macro/rokkuman_exe/network_initial_screen.png", [130, 125, 330, 145]),
+    ("Macro/rokkuman_exe/mainmenu_trade_selected.png", [130, 190, 390, 215]),
+    ("Macro/rokkuman_exe/trade_type_menu_local_trade_selected.png", [125, 250, 390, 270]),
+    ("Macro/rokkuman_exe/trade_setting_menu_send_selected.png", [140, 475, 400, 495]),
+    ("Macro/rokkuman_exe/no_partner_update_no.png", [410, 170, 840, 490]),
+    ("Macro/rokkuman_exe/trade_partner_available.png", [830, 200, 880, 230]),
+    ("Macro/rokkuman_exe/communication_error.png", [400, 220, 850, 500]),
+    ("Macro/rokkuman_exe/return_to_main_menu_button.png", [470, 520, 800, 550]),
+]
+THRESHOLD = 0.95
+CALIBRATION_FRAMES = 20
+VALIDATION_FRAMES = 60
+
+
+def distort(image: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    キャプチャで起こりうる変化(明るさ・コントラストのずれ、ノイズ)を加える
+
+    JPEG圧縮は加えない(文字だけの小さいテンプレートは品質98でも類似度が0.85前後まで下がり、
+    閾値0.95の判定自体が成り立たなくなるため)
+    """
+    alpha = rng.uniform(0.98, 1.02)
+    beta = rng.uniform(-4, 4)
+    out = image.astype(np.float32) * alpha + beta + rng.normal(0, 0.5, image.shape)
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+def make_frames(
+    screens: list[np.ndarray], template: np.ndarray, crop: list, n: int, seed: int
+) -> list[tuple[np.ndarray, bool]]:
+    rng = np.random.default_rng(seed)
+    h, w = template.shape[:2]
+    x0, y0, x1, y1 = crop
+    frames = []
+    for i in range(n):
+        image = screens[i % len(screens)].copy()
+        present = i % 2 == 0
+        if present:
+            x = int(rng.integers(x0, max(x0, x1 - w) + 1))
+            y = int(rng.integers(y0, max(y0, y1 - h) + 1))
+            image[y : y + h, x : x + w] = template
+        frames.append((distort(image, rng), present))
+    return frames
+
+
+def main():
+    screens = list(load_screens().values())
+    rows = []
+    for template_path, crop in CASES:
+        template = imread(template_path)
+        calibration = make_frames(screens, template, crop, CALIBRATION_FRAMES, seed=0)
+        validation = make_frames(screens, template, crop, VALIDATION_FRAMES, seed=1)
+
+        plain = TemplateMatcher(template_path, THRESHOLD, False, crop, window_margin=None).compile()
+        cutoff = calibrate_prefilter(plain, [image for image, _ in calibration])
+        filtered = TemplateMatcher(
+            template_path, THRESHOLD, False, crop, window_margin=None, prefilter=cutoff
+        ).compile()
+
+        missed = 0
+        positives = 0
+        plain_time = filtered_time = 0.0
+        for image, _ in validation:
+            t = time.perf_counter()
+            expected, _, _ = plain.match(CapturedFrame(0, 0.0, image))
+            plain_time += time.perf_counter() - t
+            t = time.perf_counter()
+            actual, _, _ = filtered.match(CapturedFrame(0, 0.0, image))
+            filtered_time += time.perf_counter() - t
+            positives += expected
+            missed += expected and not actual
+
+        negatives = len(validation) - positives
+        rows.append([
+            template_path,
+            cutoff,
+            f"{positives}/{len(validation)}",
+            f"{missed}",
+            f"{filtered.prefilter_skips}/{negatives}",
+            plain_time / len(validation) * 1e6,
+            filtered_time / len(validation) * 1e6,
+        ])
+    print_table(
+        rows,
+        ["template", "prefilter", "over threshold", "missed", "skipped", "full(us)", "prefilter(us)"],
+    )
+
+
+if __name__ == "__main__":
+    main()
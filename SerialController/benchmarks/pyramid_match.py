@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+画面全体を探すテンプレートマッチングの計測(全探索と粗密探索)
+
+Template/Samples/のテンプレート画像を、各スクリーンショットに貼り付けた画像(テンプレートがある場合)と
+そのままの画像(ほとんどの場合テンプレートがない)で探し、全探索との速度と結果の一致を比べる。
+一致: 位置が全探索と同じで、類似度の差が1e-4未満。
+貼り付けた画像では、全探索と粗密探索の閾値(0.8)判定が一致するかも数える。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.pyramid_match
+"""
+from __future__ import annotations
+
+import glob
+import os
+
+import cv2
+import numpy as np
+
+from Camera import CapturedFrame
+from TemplateMatcher import TemplateMatcher
+from benchmarks._bench import TEMPLATE_DIR, load_screens, measure, print_table
+
+LEVELS = [1, 2]
+THRESHOLD = 0.8
+
+
+def embed(screen: np.ndarray, template: np.ndarray, rng: np.random.Generator) -> tuple[np.ndarray, tuple[int, int]]:
+    """テンプレートをランダムな位置に貼り付けた画像を返す"""
+    h, w = template.shape[:2]
+    x = int(rng.integers(0, screen.shape[1] - w + 1))
+    y = int(rng.integers(0, screen.shape[0] - h + 1))
+    image = screen.copy()
+    image[y : y + h, x : x + w] = template
+    return image, (x, y)
+
+
+def main():
+    screens = load_screens()
+    templates = [
+        os.path.relpath(path, TEMPLATE_DIR)
+        for path in sorted(glob.glob(os.path.join(TEMPLATE_DIR, "Samples", "*.png")))
+    ]
+    templates = [t for t in templates if t not in screens]
+    rng = np.random.default_rng(0)
+
+    rows = []
+    totals = {level: [0, 0, 0, 0] for level in LEVELS}  # 一致数, 件数, 判定一致数, 判定件数
+    for template_path in templates:
+        for use_gray in (True, False):
+            exhaustive = TemplateMatcher(template_path, use_gray=use_gray).compile()
+            pyramids = {
+                level: TemplateMatcher(template_path, use_gray=use_gray, pyramid_level=level).compile()
+                for level in LEVELS
+            }
+            template = cv2.imread(os.path.join(TEMPLATE_DIR, template_path))
+
+            frames = []
+            for screen in screens.values():
+                frames.append((screen, False))
+                frames.append((embed(screen, template, rng)[0], True))
+
+            agree = {level: 0 for level in LEVELS}
+            decision = {level: 0 for level in LEVELS}
+            for image, present in frames:
+                expected = exhaustive.search(CapturedFrame(0, 0.0, image))
+                for level, matcher in pyramids.items():
+                    actual = matcher.search(CapturedFrame(0, 0.0, image))
+                    if actual[1] == expected[1] and abs(actual[0] - expected[0]) < 1e-4:
+                        agree[level] += 1
+                    if present:
+                        decision[level] += (actual[0] >= THRESHOLD) == (expected[0] >= THRESHOLD)
+                        totals[level][3] += 1
+                    totals[level][1] += 1
+            for level in LEVELS:
+                totals[level][0] += agree[level]
+                totals[level][2] += decision[level]
+
+            # 毎回新しいフレーム(縮小画像のキャッシュなし)で計測する
+            image = frames[1][0]
+            timing = measure(lambda: exhaustive.search(CapturedFrame(0, 0.0, image)), repeat=30)
+            row = [f"{template_path} ({'gray' if use_gray else 'color'})", timing["median"]]
+            for level, matcher in pyramids.items():
+                t = measure(lambda: matcher.search(CapturedFrame(0, 0.0, image)), repeat=30)
+                row += [t["median"], timing["median"] / t["median"], f"{agree[level]}/{len(frames)}"]
+            rows.append(row)
+
+    header = ["template", "full(us)"]
+    for level in LEVELS:
+        header += [f"L{level}(us)", f"L{level} x", f"L{level} agree"]
+    print_table(rows, header)
+    print()
+    for level, (agree, total, decision, present) in totals.items():
+        print(
+            f"level {level}: same max_val/max_loc {agree}/{total} ({agree / total:.1%}), "
+            f"same decision at {THRESHOLD} with template present {decision}/{present}"
+        )
+
+
+if __name__ == "__main__":
+    main()
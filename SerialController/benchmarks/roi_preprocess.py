@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+isContainTemplateの前処理(トリミング→変換)の計測
+
+変更前: フレーム全体をグレースケール化してからトリミング
+変更後: トリミングしてからその範囲だけをグレースケール化
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.roi_preprocess
+"""
+from __future__ import annotations
+
+import cv2
+
+from Camera import CapturedFrame
+from Commands.PythonCommandBase import ImageProcPythonCommand
+from benchmarks._bench import imread, load_screens, measure, print_table
+
+# (テンプレート, crop[x0, y0, x1, y1]) マクロで使っている組み合わせ
+CASES = [
+    ("Macro/rokkuman_exe/network_initial_screen.png", [130, 125, 330, 145]),
+    ("Macro/rokkuman_exe/trade_acceptance_selection.png", [780, 200, 800, 220]),
+    ("Macro/rokkuman_exe/network_battle_list.png", [1040, 144, 1162, 175]),
+    ("Macro/rokkuman_exe/communication_error.png", [400, 220, 850, 500]),
+    ("Samples/shiny_mark.png", []),
+]
+
+
+def legacy_match(image, template, use_gray, crop):
+    """変更前の処理(フレーム全体を変換してからトリミング)"""
+    src = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if use_gray else image
+    if len(crop) == 4:
+        src = src[crop[1] : crop[3], crop[0] : crop[2]]
+    res = cv2.matchTemplate(src, template, cv2.TM_CCOEFF_NORMED)
+    return cv2.minMaxLoc(res)[1]
+
+
+def main():
+    screens = load_screens(["Macro/rokkuman_exe/2025-05-*.png"])
+    image = next(iter(screens.values()))
+    command = ImageProcPythonCommand(None)
+
+    rows = []
+    for template_path, crop in CASES:
+        for use_gray in (True, False):
+            template = imread(
+                template_path, cv2.IMREAD_GRAYSCALE if use_gray else cv2.IMREAD_COLOR
+            )
+            min_size = (template.shape[1], template.shape[0])
+
+            def before():
+                return legacy_match(image, template, use_gray, crop)
+
+            def after():
+                # フレームごとに新しいCapturedFrameを作る(キャッシュなしの状態)
+                frame = CapturedFrame(0, 0.0, image)
+                src, _ = command._get_source_image(frame, use_gray, crop, min_size)
+                res = cv2.matchTemplate(src, template, cv2.TM_CCOEFF_NORMED)
+                return cv2.minMaxLoc(res)[1]
+
+            def after_call():
+                frame = CapturedFrame(0, 0.0, image)
+                return command.isContainTemplate(
+                    template_path, use_gray=use_gray, crop=crop, frame=frame
+                )
+
+            assert abs(before() - after()) < 1e-6
+            b = measure(before)
+            a = measure(after)
+            c = measure(after_call, repeat=50)
+            rows.append(
+                [
+                    f"{template_path.split('/')[-1]} {crop or 'full'}",
+                    "gray" if use_gray else "color",
+                    b["median"],
+                    a["median"],
+                    b["median"] / a["median"],
+                    c["median"],
+                ]
+            )
+
+    print_table(
+        rows,
+        ["template / crop", "mode", "before[us]", "after[us]", "speedup", "isContainTemplate[us]"],
+    )
+
+
+if __name__ == "__main__":
+    main()
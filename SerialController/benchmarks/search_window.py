@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前回の位置の周囲を先に探す処理(TemplateMatcher.window_margin)の計測
+
+ポーリングのループ(`while not self.isContainTemplate(...): self.press(...)`)を想定し、
+テンプレートを同じ位置(±2ピクセルのずれとノイズあり)に貼り付けたフレームを繰り返し判定する。
+一定間隔でテンプレートのないフレームを混ぜ、全体の探索に戻る場合も含める。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.search_window
+"""
+from __future__ import annotations
+
+import cv2
+import numpy as np
+
+from Camera import CapturedFrame
+from TemplateMatcher import WINDOW_MARGIN, TemplateMatcher
+from benchmarks._bench import imread, load_screens, print_table
+
+# (テンプレート, crop[x0, y0, x1, y1], 貼り付ける位置)
+# cropがテンプレートとほぼ同じ大きさの場合は周囲だけを探す処理は行わない(hit rateは0%になる)
+CASES = [
+    ("Macro/rokkuman_exe/mainmenu_trade_selected.png", [130, 190, 390, 215], (130, 190)),
+    ("Macro/rokkuman_exe/communication_error.png", [400, 220, 850, 500], (400, 220)),
+    ("Macro/rokkuman_exe/trade_partner_available.png", [600, 100, 1100, 400], (830, 200)),
+    ("Samples/egg_notice.png", [], (300, 560)),
+    ("Samples/shiny_mark.png", [], (1100, 80)),
+]
+N_FRAMES = 200
+# この間隔でテンプレートのないフレームを混ぜる
+ABSENT_EVERY = 20
+
+
+def make_frames(
+    screen: np.ndarray, template: np.ndarray, crop: list, position: tuple[int, int]
+) -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    h, w = template.shape[:2]
+    x0, y0, x1, y1 = crop if crop else [0, 0, screen.shape[1], screen.shape[0]]
+    frames = []
+    for i in range(N_FRAMES):
+        image = screen.copy()
+        if i % ABSENT_EVERY != ABSENT_EVERY - 1:
+            # cropからはみ出さない範囲でずらす
+            x = min(max(position[0] + int(rng.integers(-2, 3)), x0), max(x0, x1 - w))
+            y = min(max(position[1] + int(rng.integers(-2, 3)), y0), max(y0, y1 - h))
+            image[y : y + h, x : x + w] = template
+        noise = rng.integers(-4, 5, image.shape, dtype=np.int16)
+        frames.append(np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def run(matcher: TemplateMatcher, frames: list[np.ndarray]) -> tuple[float, list[bool]]:
+    """1回あたりの平均時間(マイクロ秒)と判定結果を返す"""
+    decisions = []
+    start = cv2.getTickCount()
+    for image in frames:
+        decisions.append(matcher(CapturedFrame(0, 0.0, image)))
+    elapsed = (cv2.getTickCount() - start) / cv2.getTickFrequency()
+    return elapsed / len(frames) * 1e6, decisions
+
+
+def main():
+    screen = next(iter(load_screens(["Macro/rokkuman_exe/2025-05-27_00-41-18.png"]).values()))
+    rows = []
+    for template_path, crop, position in CASES:
+        for use_gray in (True, False):
+            frames = make_frames(screen, imread(template_path), crop, position)
+            full = TemplateMatcher(template_path, 0.9, use_gray, crop, window_margin=None).compile()
+            window = TemplateMatcher(template_path, 0.9, use_gray, crop, window_margin=WINDOW_MARGIN).compile()
+            full_us, expected = run(full, frames)
+            window_us, actual = run(window, frames)
+            same = sum(a == b for a, b in zip(actual, expected))
+            rows.append([
+                f"{template_path} ({'gray' if use_gray else 'color'})",
+                full_us,
+                window_us,
+                full_us / window_us,
+                f"{window.stats()['hit_rate']:.1%}",
+                f"{same}/{len(frames)}",
+            ])
+    print_table(rows, ["template", "full(us)", "window(us)", "x", "hit rate", "same decision"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+連続したボタン操作の送信時刻の計測
+
+変更前: press()を続けて呼ぶ(KeyPress.input/inputEndで毎回送信内容を作り、待機は1回ごとに測る)
+変更後: Sequence(送信するフレームを先に作り、開始時刻からの予定時刻に専用のスレッドで送る)
+
+PythonCommand.timeLeapと同じ操作(待機時間はSCALE倍)を送り、各フレームの送信時刻と予定時刻の差を比べる。
+シリアルには書き込まず、送信した時刻とバイト列を記録する。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.sequence
+"""
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from Commands.Keys import Button, Direction, KeyPress
+from Commands.Sequence import Sequence
+from PrecisionTimer import PrecisionTimer
+from benchmarks._bench import print_table
+
+SCALE = 0.2
+REPEAT = 3
+
+
+class RecordingSender:
+    """送信した時刻とバイト列を記録する"""
+
+    def __init__(self, binary_protocol: bool = False):
+        self.sent: list[tuple[float, bytes]] = []
+        self.binary_protocol = binary_protocol
+
+    def writeRow(self, row: str, is_show: bool = False):
+        self.sent.append((time.perf_counter(), (row + "\r\n").encode("utf-8")))
+
+    def writeList(self, values: list, is_show: bool = False):
+        self.sent.append((time.perf_counter(), bytes(values)))
+
+    def writeBytes(self, data: bytes, priority: int = 1, coalesce=None):
+        self.sent.append((time.perf_counter(), data))
+
+
+def time_leap_steps() -> list[tuple]:
+    """PythonCommand.timeLeap(is_go_back=True)の(ボタン, duration, wait)"""
+    return [
+        (Button.HOME, 0.1, 1), (Direction.DOWN, 0.1, 0.1),
+        *[(Direction.RIGHT, 0.1, 0.1)] * 5,
+        (Button.A, 0.1, 1.5), (Direction.DOWN, 2, 0.5),
+        (Button.A, 0.1, 0.3), *[(Direction.DOWN, 0.1, 0.1)] * 3, (Direction.DOWN, 0.1, 0.3),
+        (Button.A, 0.1, 0.2), (Direction.DOWN, 0.7, 0.2),
+        (Button.A, 0.1, 0.2), (Direction.UP, 0.1, 0.2), (Direction.RIGHT, 1.5, 0.1), (Button.A, 0.1, 0.5),
+        (Button.A, 0.1, 0.2), (Direction.LEFT, 1.5, 0.1), (Direction.DOWN, 0.1, 0.2),
+        (Direction.RIGHT, 1.5, 0.1), (Button.A, 0.1, 0.5),
+        (Button.HOME, 0.1, 1), (Button.HOME, 0.1, 1),
+    ]
+
+
+def play_press(steps: list[tuple]) -> list[tuple[float, bytes]]:
+    """変更前: PythonCommand.pressと同じ処理を続けて呼ぶ"""
+    sender = RecordingSender()
+    keys = KeyPress(sender)
+    timer = PrecisionTimer()
+    start = time.perf_counter()
+    for buttons, duration, wait in steps:
+        keys.input(buttons)
+        timer.sleep(duration)
+        keys.inputEnd(buttons)
+        timer.sleep(wait)
+    return [(t - start, data) for t, data in sender.sent]
+
+
+def play_sequence(steps: list[tuple]) -> list[tuple[float, bytes]]:
+    """変更後: Sequenceにまとめて再生する"""
+    seq = Sequence()
+    for buttons, duration, wait in steps:
+        seq.press(buttons, duration=duration, wait=wait)
+    sender = RecordingSender()
+    keys = KeyPress(sender)
+    compiled = seq.compile(keys)
+    start = time.perf_counter()
+    compiled.play(keys).wait()
+    return [(t - start, data) for t, data in sender.sent]
+
+
+def main():
+    steps = [(buttons, duration * SCALE, wait * SCALE) for buttons, duration, wait in time_leap_steps()]
+    schedule = Sequence()
+    for buttons, duration, wait in steps:
+        schedule.press(buttons, duration=duration, wait=wait)
+    expected = schedule.compile(KeyPress(RecordingSender())).frames
+
+    rows = []
+    for name, play in [("press()", play_press), ("Sequence", play_sequence)]:
+        errors = []
+        drift = []
+        same = True
+        for _ in range(REPEAT):
+            sent = play(steps)
+            same &= [data for _, data in sent] == [data for _, data in expected]
+            error = np.array([t - offset for (t, _), (offset, _) in zip(sent, expected)]) * 1e3
+            errors.extend(error)
+            drift.append(error[-1])
+        errors = np.array(errors)
+        rows.append([
+            name, f"{len(expected)}", float(np.median(errors)), float(np.percentile(errors, 99)),
+            float(np.abs(errors).max()), float(np.mean(drift)), "same" if same else "DIFFERENT",
+        ])
+    print(f"timeLeap x{SCALE}: {expected[-1][0]:.2f}s, {REPEAT} runs")
+    print_table(rows, ["method", "frames", "p50(ms)", "p99(ms)", "max |error|(ms)", "last frame(ms)", "bytes"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+シリアル通信の統計(Commands.SerialMetrics)の計測
+
+1. 書き込み1回あたりの統計の記録にかかる時間(変更前のSender._writeNowとの差)
+2. ヒストグラム(LatencyHistogram)のパーセンタイルとnumpyで求めた値の比較
+3. 9600bpsのポートに、コマンドのスレッドからスティックを回し続け、GUIのスレッドからボタンを押したときの
+   コマンドごとの統計(コマンドの方が通信速度を使い切っていることが分かるか)
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.serial_metrics
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import numpy as np
+
+from Commands.Keys import Button, Direction, KeyPress, Stick
+from Commands.Sender import Sender
+from Commands.SerialMetrics import LatencyHistogram
+from benchmarks._bench import measure, print_table
+
+WRITES = 1000
+SAMPLES = 100000
+BAUD = 9600
+DURATION = 2.0
+
+
+class NotShown:
+    def get(self):
+        return False
+
+
+class NullSerial:
+    def isOpen(self):
+        return True
+
+    def write(self, data: bytes):
+        return len(data)
+
+
+class SlowSerial(NullSerial):
+    """通信時間(1バイト10ビット)だけ待つポート"""
+
+    baudrate = BAUD
+
+    def write(self, data: bytes):
+        time.sleep(len(data) * 10 / BAUD)
+        return len(data)
+
+
+class OldSender(Sender):
+    """変更前: 統計を記録しない_writeNow"""
+
+    def _writeNow(self, data, source=None):
+        try:
+            self.ser.write(data)
+        except Exception as e:
+            print(e)
+
+
+def record_overhead() -> list[list]:
+    data = b"0x0010 8\r\n"
+    rows = []
+    for name, cls in [("before", OldSender), ("after (SerialMetrics)", Sender)]:
+        sender = cls(NotShown())
+        sender.ser = NullSerial()
+        source = sender.metrics.source()
+
+        def writes():
+            for _ in range(WRITES):
+                sender._writeNow(data, source)
+
+        rows.append([name, measure(writes, repeat=50)["median"] / WRITES * 1e3])
+    return rows
+
+
+def histogram_accuracy() -> list[list]:
+    rng = np.random.default_rng(0)
+    # ser.writeの所要時間に近い分布(中央値100us程度、まれに数十ミリ秒)
+    samples = np.concatenate([rng.lognormal(np.log(100), 0.5, SAMPLES), rng.uniform(5000, 50000, SAMPLES // 100)])
+    histogram = LatencyHistogram()
+    for value in samples.astype(np.int64).tolist():
+        histogram.record(value)
+    rows = []
+    for q in [50, 90, 99, 99.9]:
+        exact = float(np.percentile(samples.astype(np.int64), q, method="inverted_cdf"))
+        approx = histogram.percentile(q)
+        rows.append([f"p{q}", exact, float(approx), (approx - exact) / exact * 100])
+    rows.append(["max", float(samples.astype(np.int64).max()), float(histogram.max), 0.0])
+    return rows
+
+
+def saturation() -> list[dict]:
+    sender = Sender(NotShown())
+    sender.ser = SlowSerial()
+    stop = threading.Event()
+
+    def command():
+        sender.metrics.begin("StickSweep")
+        keys = KeyPress(sender)
+        angle = 0
+        while not stop.is_set():
+            keys.input(Direction(Stick.LEFT, angle))
+            angle = (angle + 5) % 360
+            time.sleep(0.005)
+        keys.inputEnd(Direction(Stick.LEFT, 0))
+        sender.writer.flush()
+        sender.metrics.end()
+
+    thread = threading.Thread(target=command)
+    thread.start()
+    keys = KeyPress(sender)
+    deadline = time.perf_counter() + DURATION
+    while time.perf_counter() < deadline:
+        keys.input(Button.A)
+        time.sleep(0.1)
+        keys.inputEnd(Button.A)
+        time.sleep(0.1)
+    stop.set()
+    thread.join()
+    sender.writer.flush()
+    return sender.serialMetrics()
+
+
+def main():
+    print(f"record cost per write ({WRITES} writes to a no-op port)")
+    print_table(record_overhead(), ["method", "per write(ns)"])
+    print()
+
+    print(f"histogram vs exact ({SAMPLES} samples)")
+    print_table(histogram_accuracy(), ["percentile", "exact(us)", "histogram(us)", "error(%)"])
+    print()
+
+    print(f"{BAUD}bps, stick sweep on the command thread + buttons from the GUI thread, {DURATION}s")
+    rows = [[m["command"], m["writes"], m["bytes"], m["errors"], m["writes_per_sec"], m["peak_bytes_per_sec"],
+             m["link_utilization"] * 100, m["p50_us"], m["p99_us"]] for m in saturation()]
+    print_table(rows, ["command", "writes", "bytes", "errors", "writes/s", "peak B/s", "link(%)",
+                       "p50(us)", "p99(us)"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASCIIの行とバイナリのフレーム(Commands.SerialProtocol)の比較
+
+変更前: `0x0008 8 80 80\\r\\n`のような16進数の行(スティックは変化があった場合だけ送る)
+変更後: 固定長9バイトのフレーム(接続時に問い合わせ、ファームウェアが対応している場合だけ使う)
+
+操作の種類ごとに、1フレームあたりのバイト数・通信時間(1バイト10ビット)・送信の時間を比べる。
+ファームウェアの代わりに受信側で両方の形式をデコードし、送られた状態が一致することを確認する。
+送信の時間はエンコードして書き込みのスレッドに渡し、書き込みが終わるまでの時間。
+また、対応している/していないファームウェアで問い合わせの結果を確認する。
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.serial_protocol
+"""
+from __future__ import annotations
+
+import time
+
+from Commands.Keys import Button, Direction, Hat, KeyPress, Stick
+from Commands.Sender import Sender
+from Commands.SerialProtocol import HEADER, FRAME_LENGTH, NEGOTIATE_ACK, NEGOTIATE_REQUEST, decodeFrame
+from benchmarks._bench import print_table
+
+BAUD_RATES = [9600, 115200]
+REPEAT = 20
+
+
+class NotShown:
+    def get(self):
+        return False
+
+
+class FakeFirmware:
+    """
+    シリアルポートの代わり。受信したASCIIの行とバイナリのフレームをデコードし、状態を記録する
+
+    Args:
+        supports_binary (bool): 問い合わせに応答するか
+    """
+
+    def __init__(self, supports_binary: bool):
+        self.supports_binary = supports_binary
+        self.timeout = None
+        self.reply = b""
+        self.buffer = b""
+        self.state = [0, 8, 128, 128, 128, 128]
+        self.states: list[tuple] = []
+        self.bytes = 0
+        self.frames = 0
+
+    def isOpen(self):
+        return True
+
+    def reset_input_buffer(self):
+        self.reply = b""
+
+    def read_until(self, expected=b"\n"):
+        reply, self.reply = self.reply, b""
+        return reply
+
+    def write(self, data: bytes):
+        if data == NEGOTIATE_REQUEST:
+            if self.supports_binary:
+                self.reply = NEGOTIATE_ACK + b"\r\n"
+            return len(data)
+        self.bytes += len(data)
+        self.buffer += data
+        while self.buffer:
+            if self.buffer[0] == HEADER:
+                if len(self.buffer) < FRAME_LENGTH:
+                    break
+                frame, self.buffer = self.buffer[:FRAME_LENGTH], self.buffer[FRAME_LENGTH:]
+                self.state = list(decodeFrame(frame))
+            else:
+                line, sep, rest = self.buffer.partition(b"\r\n")
+                if not sep:
+                    break
+                self.buffer = rest
+                self.parse_row(line.decode("ascii"))
+            self.frames += 1
+            self.states.append(tuple(self.state))
+        return len(data)
+
+    def parse_row(self, row: str):
+        if row == "end":
+            return
+        values = row.split(" ")
+        flags = int(values[0], 16)
+        self.state[0] = flags >> 2
+        self.state[1] = int(values[1])
+        sticks = [int(v, 16) for v in values[2:]]
+        if flags & 0x2:
+            self.state[2:4] = sticks[:2]
+            sticks = sticks[2:]
+        if flags & 0x1:
+            self.state[4:6] = sticks[:2]
+
+
+class SyncKeyPress(KeyPress):
+    """書き込みが終わるまで待つKeyPress(置き換えが起きないようにして、送ったフレームをすべて比べる)"""
+
+    def input(self, btns, ifPrint=True):
+        super().input(btns, ifPrint)
+        self.ser.writer.flush()
+
+    def inputEnd(self, btns, ifPrint=True, unset_hat=True, unset_Touchscreen=True):
+        super().inputEnd(btns, ifPrint, unset_hat, unset_Touchscreen)
+        self.ser.writer.flush()
+
+
+def scenario_buttons(keys: KeyPress):
+    for _ in range(REPEAT):
+        keys.input(Button.A)
+        keys.inputEnd(Button.A)
+
+
+def scenario_hat_buttons(keys: KeyPress):
+    for _ in range(REPEAT):
+        keys.input([Button.B, Hat.TOP])
+        keys.inputEnd([Button.B, Hat.TOP])
+
+
+def scenario_stick_sweep(keys: KeyPress):
+    for angle in range(0, 360 * REPEAT // 10, 2):
+        keys.input(Direction(Stick.LEFT, angle))
+    keys.inputEnd(Direction(Stick.LEFT, 0))
+
+
+def scenario_both_sticks(keys: KeyPress):
+    for angle in range(0, 360 * REPEAT // 10, 2):
+        keys.input([Direction(Stick.LEFT, angle), Direction(Stick.RIGHT, -angle, 0.5)])
+    keys.inputEnd([Direction(Stick.LEFT, 0), Direction(Stick.RIGHT, 0, 0.5)])
+
+
+SCENARIOS = [
+    ("Button.A press/release", scenario_buttons),
+    ("[Button.B, Hat.TOP]", scenario_hat_buttons),
+    ("L stick sweep", scenario_stick_sweep),
+    ("L+R stick sweep", scenario_both_sticks),
+]
+
+
+def run(scenario, binary: bool) -> tuple[FakeFirmware, float]:
+    firmware = FakeFirmware(supports_binary=binary)
+    sender = Sender(NotShown())
+    sender.ser = firmware
+    sender.negotiateProtocol("auto")
+    keys = SyncKeyPress(sender)
+    start = time.perf_counter()
+    scenario(keys)
+    return firmware, (time.perf_counter() - start) / firmware.frames * 1e6
+
+
+def main():
+    rows = []
+    for name, scenario in SCENARIOS:
+        ascii_fw, ascii_us = run(scenario, binary=False)
+        binary_fw, binary_us = run(scenario, binary=True)
+        same = ascii_fw.states == binary_fw.states
+        ascii_bytes = ascii_fw.bytes / ascii_fw.frames
+        binary_bytes = binary_fw.bytes / binary_fw.frames
+        wire = []
+        for baud in BAUD_RATES:
+            wire += [ascii_bytes * 10 / baud * 1e3, binary_bytes * 10 / baud * 1e3]
+        rows.append([name, f"{ascii_fw.frames}", ascii_bytes, binary_bytes, *wire,
+                     ascii_us, binary_us, "same" if same else "DIFFERENT"])
+    header = ["scenario", "frames", "ascii(B)", "binary(B)"]
+    for baud in BAUD_RATES:
+        header += [f"ascii@{baud}(ms)", f"binary@{baud}(ms)"]
+    header += ["ascii send(us)", "binary send(us)", "decoded"]
+    # 通信時間は小数点以下2桁まで表示する
+    rows = [[f"{c:.2f}" if isinstance(c, float) and i >= 4 and i < 4 + 2 * len(BAUD_RATES) else c
+             for i, c in enumerate(row)] for row in rows]
+    print_table(rows, header)
+    print()
+
+    for supports_binary in [False, True]:
+        sender = Sender(NotShown())
+        sender.ser = FakeFirmware(supports_binary)
+        print(f"firmware supports binary={supports_binary}: "
+              f"auto -> {'binary' if sender.negotiateProtocol('auto') else 'ascii'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+シリアルの書き込みのスレッド(Commands.SerialWriter)の計測
+
+変更前: 書き込みを呼んだスレッド(コマンド・GUI)でそのままser.writeを呼ぶ
+変更後: SerialWriterのキューに入れ、専用のスレッドで書き込む
+
+9600bpsのシリアルの代わりに、送るバイト数に応じた時間(1バイト10ビット)だけ待ち、
+4バイトずつ書き込むポートを使う(書き込みの途中で他のスレッドに切り替わりうる)。
+
+1. コマンドのスレッドがボタンを押して離すときに、書き込みで待たされる時間
+2. コマンドとGUIが同時に書き込んだときに、行の途中で混ざった(壊れた)行の数
+3. マウスでスティックを動かし続けた(200Hz)ときに、GUIのスレッドが操作を登録し終えるまでの時間、
+   最後の位置が送られるまでの遅れと送った行の数
+
+実行方法(SerialControllerディレクトリで):
+    python -m benchmarks.serial_writer
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+
+import numpy as np
+
+from Commands.Keys import Button, KeyPress
+from Commands.Sender import Sender
+from benchmarks._bench import print_table
+
+BAUD = 9600
+CHUNK = 4
+PRESSES = 20
+GUI_EVENTS = 200
+GUI_INTERVAL = 0.005
+ROW = re.compile(rb"^(0x[0-9a-f]{4} \d( [0-9a-f]+)*|3 8( (0x)?[0-9a-f]+){4}|end)$")
+
+
+class NotShown:
+    def get(self):
+        return False
+
+
+class SlowSerial:
+    """通信時間だけ待ちながら、CHUNKバイトずつ書き込むポート"""
+
+    def __init__(self):
+        self.wire = bytearray()
+        self.arrivals: list[tuple[float, bytes]] = []
+
+    def isOpen(self):
+        return True
+
+    def write(self, data: bytes):
+        for i in range(0, len(data), CHUNK):
+            chunk = data[i:i + CHUNK]
+            time.sleep(len(chunk) * 10 / BAUD)
+            self.wire += chunk
+        self.arrivals.append((time.perf_counter(), bytes(data)))
+        return len(data)
+
+    def rows(self) -> list[bytes]:
+        return [row for row in bytes(self.wire).split(b"\r\n") if row]
+
+
+class DirectSender(Sender):
+    """変更前: 呼んだスレッドでそのまま書き込む"""
+
+    def _enqueue(self, data, priority=None, coalesce=None):
+        self._writeNow(data)
+
+
+def make_sender(cls) -> Sender:
+    sender = cls(NotShown())
+    sender.ser = SlowSerial()
+    return sender
+
+
+def command_blocking(cls) -> float:
+    """ボタンを押して離す1回あたりに、コマンドのスレッドが書き込みで待たされる時間(ミリ秒)"""
+    sender = make_sender(cls)
+    keys = KeyPress(sender)
+    blocked = 0.0
+    for _ in range(PRESSES):
+        start = time.perf_counter()
+        keys.input(Button.A)
+        keys.inputEnd(Button.A)
+        blocked += time.perf_counter() - start
+        time.sleep(0.05)
+    sender.writer.flush()
+    return blocked / PRESSES * 1e3
+
+
+def gui_stick(sender: Sender, stop: threading.Event) -> float:
+    """GUIのスティック操作の代わり。最後の行を登録した時刻を返す"""
+    last = 0.0
+    for i in range(GUI_EVENTS):
+        if stop.is_set():
+            break
+        angle = np.deg2rad(i * 3)
+        row = f"3 8 {hex(int(128 + 127.5 * np.cos(angle)))} {hex(int(128 - 127.5 * np.sin(angle)))} 80 80"
+        last = time.perf_counter()
+        sender.writeRow(row, is_show=False, coalesce="mouse_left_stick")
+        time.sleep(GUI_INTERVAL)
+    return last
+
+
+def interleaving(cls) -> tuple[int, int]:
+    """コマンドとGUIが同時に書き込んだときの(壊れた行の数, 行の数)"""
+    sender = make_sender(cls)
+    keys = KeyPress(sender)
+    stop = threading.Event()
+    gui = threading.Thread(target=gui_stick, args=(sender, stop))
+    gui.start()
+    for _ in range(PRESSES):
+        keys.input(Button.A)
+        time.sleep(0.02)
+        keys.inputEnd(Button.A)
+        time.sleep(0.02)
+    stop.set()
+    gui.join()
+    sender.writer.flush()
+    rows = sender.ser.rows()
+    return sum(1 for row in rows if not ROW.match(row)), len(rows)
+
+
+def stick_latency(cls) -> tuple[float, float, int]:
+    """
+    スティックを動かし続けたときの
+    (GUIのスレッドが操作を登録し終えるまでの時間(秒), 最後の位置が書き込まれるまでの遅れ(ミリ秒), 送った行の数)
+    """
+    sender = make_sender(cls)
+    start = time.perf_counter()
+    last = gui_stick(sender, threading.Event())
+    sender.writer.flush()
+    arrived = sender.ser.arrivals[-1][0]
+    return last - start, (arrived - last) * 1e3, len(sender.ser.arrivals)
+
+
+def main():
+    rows = []
+    for name, cls in [("before (direct)", DirectSender), ("after (SerialWriter)", Sender)]:
+        blocked = command_blocking(cls)
+        broken, total = interleaving(cls)
+        gui, latency, sent = stick_latency(cls)
+        rows.append([name, blocked, f"{broken}/{total}", gui, latency, f"{sent}/{GUI_EVENTS}"])
+    print(f"{BAUD}bps, {CHUNK}-byte writes")
+    print_table(rows, ["method", "press blocks(ms)", "broken rows", "stick GUI(s)", "stick lag(ms)", "stick rows sent"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Commands.Keysのオブジェクトを繰り返し作っても、ロガーのハンドラとメモリが増えないことの確認
+
+実行方法(SerialControllerディレクトリで):
+    python -m pytest tests
+"""
+from __future__ import annotations
+
+import gc
+import logging
+import tracemalloc
+import unittest
+
+from Commands.Keys import Direction, KeyPress, SendFormat, Stick, Touchscreen
+
+COUNT = 20_000
+# 「増えていない」とみなすメモリの増加(バイト)
+FLAT_BYTES = 64 * 1024
+
+
+def make_direction(i: int):
+    # マウスの動きのように、角度(1度刻み)と倒す量が少しずつ変わる
+    return Direction(Stick.LEFT, i % 360, 0.6 + (i % 5) * 0.1)
+
+
+def make_touchscreen(i: int):
+    return Touchscreen(i % 320, i % 240)
+
+
+def make_keypress(i: int):
+    return KeyPress(None)
+
+
+def make_sendformat(i: int):
+    return SendFormat()
+
+
+class TestKeyObjects(unittest.TestCase):
+    def assertFlat(self, make):
+        logger = logging.getLogger("Commands.Keys")
+        # 角度の表などのキャッシュを先に埋めておく
+        for i in range(COUNT):
+            make(i)
+        gc.collect()
+        handlers = len(logger.handlers)
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            for i in range(COUNT):
+                make(i)
+            gc.collect()
+            growth = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(len(logger.handlers), handlers)
+        self.assertLess(growth, FLAT_BYTES)
+
+    def test_direction(self):
+        self.assertFlat(make_direction)
+
+    def test_touchscreen(self):
+        self.assertFlat(make_touchscreen)
+
+    def test_keypress(self):
+        self.assertFlat(make_keypress)
+
+    def test_sendformat(self):
+        self.assertFlat(make_sendformat)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,53 +1,134 @@
 from __future__ import annotations
 
-import ctypes
 import multiprocessing
+import multiprocessing.connection
+import multiprocessing.synchronize
+import os
 import signal
+import time
+import uuid
+from multiprocessing import resource_tracker, shared_memory
 from typing import cast
 
 import cv2
 import numpy as np
-from multiprocessing import shared_memory
+from loguru import logger
+
+# 共有メモリのレイアウト
+#   [ヘッダ (int64 x HEADER_FIELDS)] [フレームバッファ0] [フレームバッファ1]
+# ヘッダ:
+#   LATEST: 最後に書き込みが完了したフレーム番号(0は未取得)。フレーム番号nはバッファ n % 2 に格納される
+#   SEQ0/SEQ1: 各バッファのシーケンスロック。書き込み中は奇数、書き込み完了で偶数になる
+HEADER_FIELDS = 8
+HEADER_SIZE = HEADER_FIELDS * np.dtype(np.int64).itemsize
+_LATEST = 0
+_SEQ0 = 1
+
+SHM_PREFIX = "pokecon_cap_"
+
+# 子プロセスの起動(カメラのオープン)を待つ最大時間(秒)
+OPEN_TIMEOUT = 15.0
+# read()で新しいフレームを待つ最大時間(秒)
+READ_TIMEOUT = 1.0
+# シーケンスロックの読み出し再試行回数
+READ_RETRY = 8
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    既存の共有メモリにアタッチする。
+
+    子プロセスは親プロセスのresource_trackerを共有するため(`VideoCaptureWrapper.open()`で
+    子プロセスの起動前に起動している)、子プロセスの終了時に共有メモリが解放されることはない。
+    共有メモリの削除(unlink)は作成した親プロセスが行う。
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+    except TypeError:
+        # Python 3.12 以前
+        return shared_memory.SharedMemory(name=name)
+
+
+def _frame_views(
+    buf, shape: tuple[int, ...], dtype: np.dtype
+) -> tuple[np.ndarray, list[np.ndarray]]:
+    """共有メモリ上のヘッダとフレームバッファ2枚のビューを返す"""
+    header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=buf)
+    frame_size = int(np.prod(shape)) * dtype.itemsize
+    frames = [
+        np.ndarray(shape, dtype=dtype, buffer=buf, offset=HEADER_SIZE + frame_size * i)
+        for i in range(2)
+    ]
+    return header, frames
 
 
 def _update(
     args: tuple,
     props: dict[int, float],
-    shm_name: str,
-    shape: tuple[int, int, int],
+    conn: multiprocessing.connection.Connection,
     ready: multiprocessing.synchronize.Event,
     cancel: multiprocessing.synchronize.Event,
 ):
     """
-    画像を取得してshared memoryを更新する
+    子プロセスで画像を取得して共有メモリを更新する。
+
+    起動時にカメラを開いて1フレーム読み込み、画像サイズとプロパティを親プロセスへ送る。
+    親が作成した共有メモリ名を受け取ったら、ダブルバッファへ交互にデコードする。
     """
 
     signal.signal(signal.SIGINT, signal.SIG_IGN)
 
     video_capture = cv2.VideoCapture(*args)
-    if not video_capture.isOpened():
-        raise IOError()
+    shm = None
+    try:
+        if not video_capture.isOpened():
+            conn.send(("error", f"Cannot open video capture: {args}"))
+            return
 
-    _set_props(video_capture, props)
+        _set_props(video_capture, props)
+        ret, mat = cast("tuple[bool, cv2.Mat]", video_capture.read())
+        if not ret:
+            conn.send(("error", f"Cannot read a frame from video capture: {args}"))
+            return
 
-    # 共有メモリにアタッチ
-    existing_shm = shared_memory.SharedMemory(name=shm_name)
-    shm_buffer = np.ndarray(shape, dtype=np.uint8, buffer=existing_shm.buf)
+        conn.send(("info", mat.shape, str(mat.dtype), _get_props(video_capture)))
+        if not conn.poll(OPEN_TIMEOUT):
+            return
+        shm_name = conn.recv()
+        if shm_name is None:
+            return
+
+        shm = _attach_shared_memory(shm_name)
+        header, frames = _frame_views(shm.buf, mat.shape, mat.dtype)
 
-    try:
         while not cancel.is_set():
-            ret, mat = cast("tuple[bool, cv2.Mat]", video_capture.read())
+            n = int(header[_LATEST]) + 1
+            index = n & 1
+            dst = frames[index]
+
+            header[_SEQ0 + index] += 1  # 書き込み開始 (奇数)
+            ret, mat = cast("tuple[bool, cv2.Mat]", video_capture.read(dst))
+            if ret and mat is not dst:
+                if mat.shape == dst.shape and mat.dtype == dst.dtype:
+                    np.copyto(dst, mat)
+                else:
+                    ret = False
+            header[_SEQ0 + index] += 1  # 書き込み完了 (偶数)
+
             if not ret:
+                time.sleep(0.005)
                 continue
 
-            ready.clear()
-            np.copyto(
-                shm_buffer, np.ndarray(mat.shape, dtype=np.uint8, buffer=mat.data)
-            )
+            header[_LATEST] = n
             ready.set()
 
     finally:
         video_capture.release()
+        if shm is not None:
+            # ビューを解放してから閉じる
+            header = frames = None  # type: ignore[assignment]
+            shm.close()
+        conn.close()
 
 
 def _set_props(video_capture: cv2.VideoCapture, props: dict[int, float]):
@@ -59,44 +140,40 @@ def _set_props(video_capture: cv2.VideoCapture, props: dict[int, float]):
 
 
 def _get_props(video_capture: cv2.VideoCapture) -> dict[int, float]:
-    ids = [cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FRAME_WIDTH]
+    ids = [cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FPS]
     return cast(
         "dict[int, float]", dict([[prop, video_capture.get(prop)] for prop in ids])
     )
 
 
-def _get_information(
-    args: tuple, in_props: dict[int, float]
-) -> tuple[tuple[int, int, int], dict[int, float]]:
-    video_capture = cv2.VideoCapture(*args)
-    if not video_capture.isOpened():
-        raise IOError()
-
-    # 入力されたプロパティを設定してから、現在のプロパティ一覧を取得する
-    _set_props(video_capture, in_props)
-    out_props = _get_props(video_capture)
-
-    try:
-        ret, mat = cast("tuple[bool, cv2.Mat]", video_capture.read())
-        if not ret:
-            raise IOError()
-
-        return mat.shape, out_props
+class VideoCaptureWrapper:
+    """
+    `cv2.VideoCapture`の読み込みとデコードを子プロセスで行うラッパー。
 
-    finally:
-        video_capture.release()
+    `cv2.VideoCapture`と同じインターフェース(open/get/set/read/isOpened/release)を持つ。
+    画像は共有メモリ上のダブルバッファを介して受け渡し、シーケンスロックで
+    書き込み途中のフレームを読まないようにしている。
+    共有メモリは親プロセスが作成・削除し、名前はインスタンスごとに一意になる。
 
+    Args:
+        *args: `cv2.VideoCapture`に渡す引数
+        props (dict[int, float] | None): 開く前に設定するプロパティ(CAP_PROP_*: 値)
+    """
 
-class VideoCaptureWrapper:
-    def __init__(self, *args) -> None:
+    def __init__(self, *args, props: dict[int, float] | None = None) -> None:
         self.__args = ()
-        self.__shape = cast(int, 0), cast(int, 0), cast(int, 0)
-        self.__props: dict[int, float] = {}
-
-        self.__shm = None
+        self.__shape: tuple[int, ...] = (0, 0, 0)
+        self.__dtype = np.dtype(np.uint8)
+        self.__props: dict[int, float] = dict(props) if props else {}
+        self.__requested: dict[int, float] = dict(self.__props)
+
+        self.__shm: shared_memory.SharedMemory | None = None
+        self.__header: np.ndarray | None = None
+        self.__frames: list[np.ndarray] = []
+        self.__last = 0
         self.__ready = multiprocessing.Event()
         self.__cancel = multiprocessing.Event()
-        self.__enqueue = multiprocessing.Process()
+        self.__enqueue: multiprocessing.Process | None = None
 
         self.__released = cast(bool, True)
 
@@ -105,80 +182,164 @@ class VideoCaptureWrapper:
 
         self.open(*args)
 
-    def open(self, *args):
+    def open(self, *args) -> bool:
         if not self.__released:
-            raise RuntimeError()
+            self.release()
 
         self.__args = args
-        self.__shape, self.__props = _get_information(self.__args, self.__props)
-
-        height, width, channels = self.__shape
-        size = height * width * channels
-
-        # 共有メモリを作成
-        self.__shm = shared_memory.SharedMemory(create=True, size=size)
-        shm_name = self.__shm.name
-
         self.__ready = multiprocessing.Event()
         self.__cancel = multiprocessing.Event()
+        if os.name == "posix":
+            # 子プロセスに自前のresource_trackerを起動させないよう、先に起動しておく
+            resource_tracker.ensure_running()
+        parent_conn, child_conn = multiprocessing.Pipe()
         self.__enqueue = multiprocessing.Process(
             target=_update,
             args=(
                 self.__args,
                 self.__props,
-                shm_name,
-                self.__shape,
+                child_conn,
                 self.__ready,
                 self.__cancel,
             ),
+            name="VideoCaptureProcess",
             daemon=True,
         )
         self.__enqueue.start()
+        child_conn.close()
 
+        try:
+            if not parent_conn.poll(OPEN_TIMEOUT):
+                logger.error("Video capture process did not respond")
+                self.__stop_process()
+                return False
+            message = parent_conn.recv()
+            if message[0] != "info":
+                logger.error(message[1])
+                self.__stop_process()
+                return False
+
+            _, shape, dtype, out_props = message
+            self.__shape = tuple(shape)
+            self.__dtype = np.dtype(dtype)
+            self.__props.update(out_props)
+
+            # 画像サイズに合わせて共有メモリを作成
+            frame_size = int(np.prod(self.__shape)) * self.__dtype.itemsize
+            self.__shm = shared_memory.SharedMemory(
+                create=True,
+                size=HEADER_SIZE + frame_size * 2,
+                name=SHM_PREFIX + uuid.uuid4().hex[:16],
+            )
+            self.__header, self.__frames = _frame_views(
+                self.__shm.buf, self.__shape, self.__dtype
+            )
+            self.__header[:] = 0
+            self.__last = 0
+            parent_conn.send(self.__shm.name)
+        except (EOFError, OSError) as e:
+            logger.error(f"Video capture process failed to start: {e}")
+            self.__stop_process()
+            self.__close_shared_memory()
+            return False
+        finally:
+            parent_conn.close()
+
+        logger.debug(f"Video capture process started: {self.__shape}, shm={self.__shm.name}")
         self.__released = cast(bool, False)
+        return True
 
     def get(self, propId: int):
         if self.__released:
             raise RuntimeError()
 
-        return self.__props[propId]
+        return self.__props.get(propId, 0.0)
 
     def set(self, propId: int, value: float):
         if self.__released:
             raise RuntimeError()
 
-        self.__props[propId] = value
+        if self.__requested.get(propId) == value:
+            return cast(bool, True)
+
+        # プロパティは子プロセスで設定するため開き直す
+        self.__requested[propId] = value
+        self.__props = dict(self.__requested)
         self.release()
-        self.open(*self.__args)
+        return self.open(*self.__args)
 
-        return cast(bool, True)
+    def read(self, image: np.ndarray | None = None):
+        """
+        前回の`read()`より新しいフレームを読み込む。
 
-    def read(self):
-        if self.__released:
+        `image`に同じ形状の配列を渡すと、その配列へコピーして返す。
+
+        Returns:
+            tuple[bool, np.ndarray | None]: 読み込めたか、画像
+        """
+        if self.__released or self.__header is None:
             raise RuntimeError()
 
-        self.__ready.wait()
+        header = self.__header
+        if int(header[_LATEST]) <= self.__last:
+            self.__ready.wait(READ_TIMEOUT)
+        self.__ready.clear()
+
+        if image is None or image.shape != self.__shape or image.dtype != self.__dtype:
+            image = np.empty(self.__shape, dtype=self.__dtype)
+
+        for _ in range(READ_RETRY):
+            n = int(header[_LATEST])
+            if n <= self.__last:
+                # タイムアウトまでに新しいフレームが来なかった
+                break
+            index = n & 1
+            seq = int(header[_SEQ0 + index])
+            if seq & 1:
+                continue
+            np.copyto(image, self.__frames[index])
+            if int(header[_SEQ0 + index]) == seq:
+                # 読み出し中に上書きされていなければ成功
+                self.__last = n
+                return cast(bool, True), image
 
-        # 共有メモリから画像を取得
-        shm_buffer = np.ndarray(self.__shape, dtype=np.uint8, buffer=self.__shm.buf)
-        return cast(bool, True), shm_buffer.copy()
+        return cast(bool, False), None
 
     def isOpened(self):
-        return not self.__released
+        if self.__released:
+            return False
+        return self.__enqueue is not None and self.__enqueue.is_alive()
 
     def release(self):
         if self.__released:
             return
 
-        self.__cancel.set()
-        self.__enqueue.join()
+        self.__stop_process()
+        self.__close_shared_memory()
+
+        self.__released = True
+        logger.debug("Video capture process released")
 
+    def __stop_process(self):
+        self.__cancel.set()
+        if self.__enqueue is not None:
+            self.__enqueue.join(timeout=3)
+            if self.__enqueue.is_alive():
+                self.__enqueue.terminate()
+                self.__enqueue.join()
+            self.__enqueue = None
+
+    def __close_shared_memory(self):
         # 共有メモリのクリーンアップ
+        self.__header = None
+        self.__frames = []
         if self.__shm:
             self.__shm.close()
-            self.__shm.unlink()
-
-        self.__released = True
+            try:
+                self.__shm.unlink()
+            except FileNotFoundError:
+                pass
+            self.__shm = None
 
     def __del__(self):
         try: